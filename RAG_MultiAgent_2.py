@@ -1,38 +1,80 @@
+import asyncio
+import time
+import uuid
 from langgraph.graph import StateGraph, START, END
-from openai import OpenAI
-from pydantic import BaseModel
+import operator
+from typing import Annotated
+from typing_extensions import TypedDict
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_chroma import Chroma
+from embedding_cache import CachedEmbeddings
+from llm_gateway import gateway
+from model_router import router
+from semantic_cache import SemanticQuestionCache, conversation_text
+from prefetch import Prefetcher, mood_inputs
+from structured_output import agenerate_questions
+from session_io import ConsoleIO, get_io, session_node, sync_node
+from graph_registry import graphs
+from mood_tracker import MoodTracker, user_text
 
-# Initialize OpenAI client
-client = OpenAI(base_url="http://localhost:1234/v1", api_key="not-needed")
+# Print conclusions and recommendations token by token as they are generated
+STREAM_RESPONSES = True
 
 # --- RAG Setup: Document Retrieval (Chroma + Hugging Face) ---
-embedding_function = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+# Documents added to Chroma are embedded once per text; re-ingestion reuses the cache
+embedding_function = CachedEmbeddings(HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2"))
 vector_db = Chroma(persist_directory="./chroma_db", embedding_function=embedding_function)
 retriever = vector_db.as_retriever()
 
-# Define the state schema
-class ChatState(BaseModel):
-    messages: list = []
-    exit: bool = False
-    mood: str = ""
-    documents: list = []  # Stores retrieved documents
+# Follow-up question sets reused across similar conversations
+question_cache = SemanticQuestionCache(embedding_function)
+
+# Drafts the next question round while the user is still typing
+prefetcher = Prefetcher()
+
+# Define the state schema (plain dict; LangGraph neither validates nor copies it)
+class ChatState(TypedDict, total=False):
+    messages: Annotated[list, operator.add]  # append-only: nodes return just their new messages
+    exit: bool
+    mood: str
+    documents: list  # Stores retrieved documents
+    mood_tracker: dict  # MoodTracker.dump(); catches up on new messages only
+
+def new_chat_state() -> ChatState:
+    return {"messages": [], "exit": False, "mood": "", "documents": [], "mood_tracker": {}}
 
 # --- RAG Document Retriever Agent ---
-def rag_document_retriever_agent(state: ChatState) -> ChatState:
+async def rag_document_retriever_agent(state: ChatState, config=None) -> ChatState:
     """Retrieve relevant documents for the current state."""
-    query = " ".join([msg["content"] for msg in state.messages if msg["role"] == "user"])
-    print(f"\n[RAG Agent]: Retrieving documents for query: '{query}'")
+    io = get_io(config)
+    query = user_text(state["messages"])
+    io.say(f"\n[RAG Agent]: Retrieving documents for query: '{query}'")
     
     # Retrieve documents based on the user's query
-    docs = retriever.invoke(query)  # Assuming retriever is set up to handle the query
-    state.documents = docs
+    docs = await io.amemo(retriever.ainvoke, query)  # Assuming retriever is set up to handle the query
     
-    return state
+    return {"documents": docs}
+
+# --- Follow-up Question Generation ---
+FOLLOWUP_PROMPT = """Based on this conversation and the context, generate 2 relevant follow-up questions 
+        to better understand the user's situation."""
+
+async def generate_followup_questions(messages, round_index):
+    """Return up to 2 follow-up questions for the conversation so far."""
+    # Reuse the questions of a similar earlier conversation when there is one (embedding it is CPU work)
+    questions, context_vector = await asyncio.to_thread(question_cache.lookup, conversation_text(messages), round_index)
+    if questions is not None:
+        return questions
+
+    # Generate questions with context as a validated JSON object
+    start = time.perf_counter()
+    questions = await agenerate_questions(gateway, router.route("questions"), messages, FOLLOWUP_PROMPT)
+    question_cache.add(context_vector, questions, time.perf_counter() - start, bucket=round_index)
+    return questions
 
 # --- Enhanced Analysis Agent (Merged Reception with RAG) ---
-def analysis_agent_node(state: ChatState) -> ChatState:
+@session_node
+async def analysis_agent_node(state: ChatState, config=None) -> ChatState:
     """
     Enhanced Analysis Agent:
       - Greets the user and asks about their day.
@@ -40,54 +82,51 @@ def analysis_agent_node(state: ChatState) -> ChatState:
       - Deduces mood after all responses.
       - Provides AI-powered conclusions with RAG context.
     """
-    print("\n[Analysis Agent]: Hello! Welcome to our mental health chat.")
-    print("[Analysis Agent]: Could you tell me a bit about yourself and how your day has been?")
+    io = get_io(config)
+    # The stored history plus this node's own turns; only the latter are returned
+    history = list(state["messages"])
+    start = len(history)
+    tracker = MoodTracker.load(state.get("mood_tracker"))
+    io.say("\n[Analysis Agent]: Hello! Welcome to our mental health chat.")
+    io.say("[Analysis Agent]: Could you tell me a bit about yourself and how your day has been?")
     
-    user_input = input("You: ")
+    user_input = await io.aask("You: ")
     if user_input.lower() == "exit":
-        state.exit = True
-        return state
+        return {"messages": history[start:], "exit": True}
 
-    state.messages.append({"role": "user", "content": user_input})
+    history.append({"role": "user", "content": user_input})
 
     # Retrieve relevant documents from Chroma DB using RAG
-    state = rag_document_retriever_agent(state)  # Retrieve documents
+    documents = (await rag_document_retriever_agent({"messages": history}, config))["documents"]  # Retrieve documents
     
     # Dynamically generate follow-up questions and include RAG context
+    # One key per session (per run on the console); a freed state's id can be reused
+    prefetch_key = f"questions-{io.session_id or uuid.uuid4().hex}"
     for i in range(2):  # Two rounds of 2 questions each
-        followup_prompt = """Based on this conversation and the context, generate 2 relevant follow-up questions 
-        to better understand the user's situation. Format as:
-        1. [Question 1]
-        2. [Question 2]"""
-        
-        temp_messages = state.messages + [{"role": "user", "content": followup_prompt}]
-        
-        # Generate questions with context
-        response = client.chat.completions.create(
-            model="deepseek-r1-distill-qwen-7b",
-            messages=temp_messages
-        )
-        generated_questions = response.choices[0].message.content
-
-        # Extract and ask questions
-        questions = [line.split('. ', 1)[-1].strip() for line in generated_questions.split('\n') if line.strip().startswith(('1.', '2.', '- '))]
-        
-        for question in questions[:2]:
-            print(f"\n[Analysis Agent]: {question}")
-            answer = input("You: ")
+        questions = None
+        if i > 0:
+            # The round drafted during the last answer is used only if that answer changed
+            # neither the mood nor the emotions mentioned
+            questions = await io.amemo(prefetcher.atake, f"{prefetch_key}-{i}", history,
+                                       inputs=mood_inputs(tracker, history))
+        if questions is None:
+            questions = await io.amemo(generate_followup_questions, history, i)
+
+        for j, question in enumerate(questions):
+            io.say(f"\n[Analysis Agent]: {question}")
+            if i == 0 and j == len(questions) - 1:
+                # Draft the next round while the user types the last answer of this one
+                io.memo(lambda: prefetcher.astart(f"{prefetch_key}-{i + 1}", history,
+                                                  generate_followup_questions(list(history), i + 1),
+                                                  inputs=mood_inputs(tracker, history)))
+            answer = await io.aask("You: ")
             if answer.lower() == "exit":
-                state.exit = True
-                return state
-            state.messages.append({"role": "user", "content": f"{question} {answer}"})
-
-    # Infer mood based on responses
-    full_text = " ".join([msg["content"] for msg in state.messages if msg["role"] == "user"]).lower()
-    detected_mood = None
-    for emotion in ["anxious", "depressed", "suicidal", "happy", "stressed", "overwhelmed"]:
-        if emotion in full_text:
-            detected_mood = emotion
-            break
-    state.mood = detected_mood or "neutral"
+                prefetcher.cancel(f"{prefetch_key}-{i + 1}")
+                return {"messages": history[start:], "documents": documents, "exit": True}
+            history.append({"role": "user", "content": f"{question} {answer}"})
+
+    # Infer mood based on responses (the tracker reads only the messages it has not seen yet)
+    mood = tracker.update(history).mood() or "neutral"
 
     # Generate conclusion with RAG context
     conclusion_prompt = """Based on our conversation and the retrieved documents, provide:
@@ -95,98 +134,138 @@ def analysis_agent_node(state: ChatState) -> ChatState:
     2. Personalized recommendations
     3. Actionable steps"""
     
-    state.messages.append({"role": "user", "content": conclusion_prompt})
+    history.append({"role": "user", "content": conclusion_prompt})
     
     # Include RAG context in the conversation history
-    context = "\n".join([doc.page_content for doc in state.documents])
-    temp_messages = state.messages + [{"role": "assistant", "content": context}]
+    context = "\n".join([doc.page_content for doc in documents])
+    temp_messages = history + [{"role": "assistant", "content": context}]
     
     # Final response generation with context
-    response = client.chat.completions.create(
-        model="deepseek-r1-distill-qwen-7b",
-        messages=temp_messages
-    )
-    conclusion = response.choices[0].message.content
-    print("\n[Analysis Agent Conclusion]:\n", conclusion)
-    state.messages.append({"role": "assistant", "content": conclusion})
+    async def conclude():
+        return (await gateway.astream(
+            router.route("conclusion"),
+            temp_messages,
+            prefix="\n[Analysis Agent Conclusion]:\n ",
+            stream=STREAM_RESPONSES,
+            node="analysis",
+            write=io.write
+        )).content
+
+    conclusion = await io.amemo(conclude)
+    history.append({"role": "assistant", "content": conclusion})
     
-    return state
+    return {"messages": history[start:], "mood": mood, "documents": documents,
+            "mood_tracker": tracker.update(history).dump()}
 
 # --- Support Agent ---
-def support_agent_node(state: ChatState) -> ChatState:
+@session_node
+async def support_agent_node(state: ChatState, config=None) -> ChatState:
     """
     Support Agent:
       - Offers additional support options
       - Provides final recommendations
     """
-    print("\n[Support Agent]: Would you like to explore additional support options or resources? (yes/no)")
-    answer = input("You: ")
+    io = get_io(config)
+    new = []  # messages this node adds; the reducer appends them to the history
+    io.say("\n[Support Agent]: Would you like to explore additional support options or resources? (yes/no)")
+    answer = await io.aask("You: ")
     if answer.lower() == "exit":
-        state.exit = True
-        return state
-    state.messages.append({"role": "user", "content": answer})
+        return {"messages": new, "exit": True}
+    new.append({"role": "user", "content": answer})
 
     if answer.strip().lower() in ["yes", "y"]:
-        print("[Support Agent]: What specific type of support are you looking for?")
-        support_details = input("You: ")
+        io.say("[Support Agent]: What specific type of support are you looking for?")
+        support_details = await io.aask("You: ")
         if support_details.lower() == "exit":
-            state.exit = True
-            return state
-        state.messages.append({"role": "user", "content": support_details})
+            return {"messages": new, "exit": True}
+        new.append({"role": "user", "content": support_details})
 
         support_prompt = f"""Based on the user's request for {support_details}, 
         provide 3-5 specific recommendations with contact information/resources."""
 
-        response = client.chat.completions.create(
-            model="deepseek-r1-distill-qwen-7b",
-            messages=state.messages
-        )
-        recommendations = response.choices[0].message.content
-        print("\n[Support Agent Recommendations]:\n", recommendations)
-        state.messages.append({"role": "assistant", "content": recommendations})
+        async def recommend():
+            return (await gateway.astream(
+                router.route("support"),
+                state["messages"] + new,
+                prefix="\n[Support Agent Recommendations]:\n ",
+                stream=STREAM_RESPONSES,
+                node="support",
+                write=io.write
+            )).content
+
+        recommendations = await io.amemo(recommend)
+        new.append({"role": "assistant", "content": recommendations})
     else:
-        print("[Support Agent]: Remember, help is always available when you need it.")
+        io.say("[Support Agent]: Remember, help is always available when you need it.")
 
-    print("\nThank you for chatting today. Wishing you well!")
-    return state
+    io.say("\nThank you for chatting today. Wishing you well!")
+    return {"messages": new}
 
 # --- Counselor Recommendation ---
-def counselor_recommendation_node(state: ChatState) -> ChatState:
+@session_node
+async def counselor_recommendation_node(state: ChatState, config=None) -> ChatState:
     """
     Counselor Recommendation:
       - Triggers emergency support if needed
     """
-    print("\n[Counselor Recommendation]:")
+    io = get_io(config)
+    new = []  # messages this node adds; the reducer appends them to the history
+    io.say("\n[Counselor Recommendation]:")
     rec = """Urgent Support Resources:
     - National Suicide Prevention Lifeline: 1-800-273-TALK (8255)
     - Crisis Text Line: Text HOME to 741741
     - Immediate local emergency services: 911"""
-    print(rec)
-    state.messages.append({"role": "assistant", "content": rec})
-    return state
+    io.say(rec)
+    new.append({"role": "assistant", "content": rec})
+    return {"messages": new}
 
 # --- Build and Run the StateGraph Workflow with RAG ---
-def run_workflow():
-    state = ChatState()
+def build_graph(use_async: bool = False) -> StateGraph:
+    """
+    Workflow graph:
+      - Uncompiled, so the caller picks the checkpointer (SessionEngine) or none (console).
+      - The agents are async (AsyncOpenAI through the gateway), for app.ainvoke;
+        without use_async each is wrapped to run on its own event loop under app.invoke.
+    """
     graph = StateGraph(ChatState)
-    
-    graph.add_node("analysis", analysis_agent_node)
-    graph.add_node("support", support_agent_node)
-    graph.add_node("counselor", counselor_recommendation_node)
+    wrap = (lambda node: node) if use_async else sync_node
+
+    graph.add_node("analysis", wrap(analysis_agent_node))
+    graph.add_node("support", wrap(support_agent_node))
+    graph.add_node("counselor", wrap(counselor_recommendation_node))
 
     graph.add_edge(START, "analysis")
     graph.add_edge("analysis", "support")
     graph.add_conditional_edges(
         "support",
-        lambda state: "counselor" if state.mood == "suicidal" else END
+        lambda state: "counselor" if state["mood"] == "suicidal" else END
     )
     graph.add_edge("counselor", END)
+    return graph
 
-    app = graph.compile()
-    final_state = app.invoke(state)
+def run_workflow(io=None):
+    io = io or ConsoleIO()
+    # Built and compiled once per process, shared by every session
+    app, state = graphs.session("RAG_MultiAgent_2", build_graph, new_chat_state)
+    final_state = app.invoke(state, {"configurable": {"io": io}})
+
+    if final_state["exit"]:
+        io.say("Ending chat. Goodbye!")
+
+async def run_workflow_async(state: ChatState = None, io=None) -> ChatState:
+    """
+    Async workflow:
+      - Runs one session with app.ainvoke; the agents await the model server and the user.
+      - Many of these can be gathered on one event loop.
+    """
+    io = io or ConsoleIO()
+    app, new_state = graphs.session("RAG_MultiAgent_2.async", lambda: build_graph(use_async=True), new_chat_state)
+    state = state or new_state
+    final_state = await app.ainvoke(state, {"configurable": {"io": io}})
 
-    if final_state.exit:
-        print("Ending chat. Goodbye!")
+    if final_state["exit"]:
+        io.say("Ending chat. Goodbye!")
+    return final_state
 
 if __name__ == "__main__":
     print("Chatbot started! Type 'exit' at any prompt to end the conversation.\n")
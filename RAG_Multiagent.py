@@ -1,16 +1,34 @@
 from langgraph.graph import StateGraph, START, END
-from openai import OpenAI
-from pydantic import BaseModel
-from langchain_community.vectorstores import FAISS
+import operator
+import os
+import uuid
+import numpy as np
+from typing import Annotated
+from typing_extensions import TypedDict
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.embeddings import HuggingFaceEmbeddings
-
-# Initialize OpenAI client
-client = OpenAI(base_url="http://localhost:1234/v1", api_key="not-needed")
+from ann_index import INDEX_TYPE, MEMORY_BUDGET
+from embedding_cache import CachedEmbeddings
+from llm_gateway import gateway
+from model_router import router
+from mood_tracker import MoodTracker, user_text
+from prefetch import Prefetcher, mood_inputs
+from rag_index import EMBEDDING_MODEL, LazyEmbeddings, content_hash, load_or_build_faiss
+from structured_output import generate_questions
+
+# Print conclusions and recommendations token by token as they are generated
+STREAM_RESPONSES = True
 
 # --- RAG Setup ---
+# Saved FAISS index; reloaded while the documents, splitter settings and model
+# are unchanged and the index type still fits. The index type (flat, hnsw, ivf,
+# ivfpq) is picked from the chunk count and memory budget unless RAG_INDEX_TYPE
+# names one; a new pick rebuilds the index from the embedding cache.
+INDEX_DIR = os.environ.get("RAG_INDEX_DIR", "./faiss_index")
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 50
+
 class MentalHealthRAG:
-    def __init__(self):
+    def __init__(self, index_dir=INDEX_DIR):
         # Sample mental health knowledge base (replace with your own data)
         self.documents = [
             "Cognitive Behavioral Therapy (CBT) is effective for anxiety management.",
@@ -23,120 +41,150 @@ class MentalHealthRAG:
             "Breathing exercises can help manage acute anxiety attacks."
         ]
         
-        # Create vector store
-        self.text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-        self.embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-        self.vector_store = self._create_vector_store()
+        # Create vector store (the model loads on the first embedding, not here;
+        # chunks embedded by an earlier build come from the embedding cache)
+        self.index_dir = index_dir
+        self.text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+        self.embeddings = CachedEmbeddings(LazyEmbeddings(EMBEDDING_MODEL))
+        self.vector_store, self.startup = self._create_vector_store()
     
     def _create_vector_store(self):
-        texts = self.text_splitter.create_documents(self.documents)
-        return FAISS.from_documents(texts, self.embeddings)
+        settings = {"chunk_size": CHUNK_SIZE, "chunk_overlap": CHUNK_OVERLAP, "model": EMBEDDING_MODEL}
+        return load_or_build_faiss(
+            self.index_dir,
+            content_hash(self.documents, **settings),
+            lambda: self.text_splitter.create_documents(self.documents),
+            self.embeddings,
+            settings,
+            index_type=INDEX_TYPE,
+            memory_budget=MEMORY_BUDGET,
+        )
     
     def retrieve(self, query: str, k: int = 3):
         docs = self.vector_store.similarity_search(query, k=k)
         return [doc.page_content for doc in docs]
 
+    def retrieve_many(self, queries, k: int = 3):
+        """retrieve() for a batch: one embedding call for the uncached queries, one index search."""
+        if not queries:
+            return []
+        vectors = np.asarray(self.embeddings.embed_queries(list(queries)), dtype=np.float32)
+        _, rows = self.vector_store.index.search(vectors, k)
+        ids = self.vector_store.index_to_docstore_id
+        docstore = self.vector_store.docstore
+        return [[docstore.search(ids[row]).page_content for row in hits if row != -1] for hits in rows]
+
 # Initialize RAG system
 mental_health_rag = MentalHealthRAG()
 
+# Drafts the next follow-up question round while the user is typing
+prefetcher = Prefetcher()
+
 # --- Modified State Class ---
-class ChatState(BaseModel):
-    messages: list = []
-    exit: bool = False
-    mood: str = ""
-    context: list = []  # Store retrieved context for RAG
+class ChatState(TypedDict, total=False):
+    messages: Annotated[list, operator.add]  # append-only: nodes return just their new messages
+    exit: bool
+    mood: str
+    context: list  # Store retrieved context for RAG
+    mood_tracker: dict  # MoodTracker.dump(); catches up on new messages only
+
+def new_chat_state() -> ChatState:
+    return {"messages": [], "exit": False, "mood": "", "context": [], "mood_tracker": {}}
+
+# --- Follow-up Question Generation ---
+def generate_followup_questions(messages, context):
+    """Return up to 2 follow-up questions for the conversation so far."""
+    followup_prompt = f"""Based on this conversation and mental health knowledge: {context}
+        Generate 2 relevant follow-up questions to better understand the user's situation."""
+
+    return generate_questions(gateway, router.route("questions"), messages, followup_prompt)
 
 # --- Enhanced Analysis Agent with RAG ---
 def analysis_agent_node(state: ChatState) -> ChatState:
+    # The stored history plus this node's own turns; only the latter are returned
+    history = list(state["messages"])
+    start = len(history)
+    tracker = MoodTracker.load(state.get("mood_tracker"))
     print("\n[Analysis Agent]: Hello! Welcome to our mental health chat.")
     print("[Analysis Agent]: Could you tell me a bit about yourself and how your day has been?")
 
     user_input = input("You: ")
     if user_input.lower() == "exit":
-        state.exit = True
-        return state
+        return {"messages": history[start:], "exit": True}
 
     # Retrieve relevant mental health information
-    state.context = mental_health_rag.retrieve(user_input)
-    state.messages.append({"role": "user", "content": user_input})
+    context = mental_health_rag.retrieve(user_input)
+    history.append({"role": "user", "content": user_input})
 
     # Generate dynamic follow-up questions with RAG context
+    # One key per run; keys built from id(state) collide once a freed state's id is reused
+    prefetch_key = f"analysis-{uuid.uuid4().hex}"
     for i in range(2):
-        followup_prompt = f"""Based on this conversation and mental health knowledge: {state.context}
-        Generate 2 relevant follow-up questions to better understand the user's situation.
-        Format as:
-        1. [Question 1]
-        2. [Question 2]"""
-
-        temp_messages = state.messages + [{"role": "user", "content": followup_prompt}]
-        
-        response = client.chat.completions.create(
-            model="deepseek-r1-distill-qwen-7b",
-            messages=temp_messages
-        )
-        generated_questions = response.choices[0].message.content
-
-        questions = [line.split('. ', 1)[-1].strip() 
-                     for line in generated_questions.split('\n') 
-                     if line.strip().startswith(('1.', '2.', '- '))]
-
-        for question in questions[:2]:
+        questions = None
+        if i > 0:
+            # The round drafted during the last answer is used only if that answer changed
+            # neither the mood nor the emotions mentioned
+            questions = prefetcher.take(f"{prefetch_key}-questions", history, inputs=mood_inputs(tracker, history))
+        if questions is None:
+            questions = generate_followup_questions(history, context)
+
+        for j, question in enumerate(questions):
             print(f"\n[Analysis Agent]: {question}")
+            if i == 0 and j == len(questions) - 1:
+                # While the user types the last answer of the round, draft the next one
+                prefetcher.start(f"{prefetch_key}-questions", history, generate_followup_questions,
+                                 list(history), list(context), inputs=mood_inputs(tracker, history))
             answer = input("You: ")
             if answer.lower() == "exit":
-                state.exit = True
-                return state
-            state.messages.append({"role": "user", "content": f"{question} {answer}"})
+                prefetcher.cancel(f"{prefetch_key}-questions")
+                return {"messages": history[start:], "context": context, "exit": True}
+            history.append({"role": "user", "content": f"{question} {answer}"})
 
-    # Mood detection with RAG-enhanced context
-    full_text = " ".join([msg["content"] for msg in state.messages if msg["role"] == "user"]).lower()
-    state.context += mental_health_rag.retrieve(full_text)  # Additional context
-    
-    detected_mood = None
-    for emotion in ["anxious", "depressed", "suicidal", "happy", "stressed", "overwhelmed"]:
-        if emotion in full_text:
-            detected_mood = emotion
-            break
-    state.mood = detected_mood or "neutral"
+    # Mood detection with RAG-enhanced context (retrieved for the final text, answers included;
+    # only the answers the tracker has not seen yet are scanned)
+    tracker.update(history)
+    context = context + mental_health_rag.retrieve(user_text(history))  # Additional context
+    mood = tracker.mood() or "neutral"
 
     # Generate conclusion with RAG context
-    conclusion_prompt = f"""Based on our conversation and mental health knowledge: {state.context}
+    conclusion_prompt = f"""Based on our conversation and mental health knowledge: {context}
     Provide:
     1. Key insights
     2. Personalized recommendations
     3. Actionable steps"""
 
-    state.messages.append({"role": "user", "content": conclusion_prompt})
+    history.append({"role": "user", "content": conclusion_prompt})
     
-    response = client.chat.completions.create(
-        model="deepseek-r1-distill-qwen-7b",
-        messages=state.messages
-    )
-    conclusion = response.choices[0].message.content
-    print("\n[Analysis Agent Conclusion]:\n", conclusion)
-    state.messages.append({"role": "assistant", "content": conclusion})
+    conclusion = gateway.stream(
+        router.route("conclusion"),
+        history,
+        prefix="\n[Analysis Agent Conclusion]:\n ",
+        stream=STREAM_RESPONSES,
+        node="analysis"
+    ).content
+    history.append({"role": "assistant", "content": conclusion})
     
-    return state
+    return {"messages": history[start:], "mood": mood, "context": context,
+            "mood_tracker": tracker.update(history).dump()}
 
 # --- Enhanced Support Agent with RAG ---
 def support_agent_node(state: ChatState) -> ChatState:
+    new = []  # messages this node adds; the reducer appends them to the history
     print("\n[Support Agent]: Would you like to explore additional support options or resources? (yes/no)")
     answer = input("You: ")
     if answer.lower() == "exit":
-        state.exit = True
-        return state
-    state.messages.append({"role": "user", "content": answer})
+        return {"messages": new, "exit": True}
+    new.append({"role": "user", "content": answer})
 
     if answer.strip().lower() in ["yes", "y"]:
         print("[Support Agent]: What specific type of support are you looking for?")
         support_details = input("You: ")
         if support_details.lower() == "exit":
-            state.exit = True
-            return state
+            return {"messages": new, "exit": True}
         
         # Retrieve relevant resources
         resources = mental_health_rag.retrieve(support_details)
-        state.messages.append({
+        new.append({
             "role": "user", 
             "content": f"{support_details} Available resources: {resources}"
         })
@@ -145,17 +193,18 @@ def support_agent_node(state: ChatState) -> ChatState:
         and available resources: {resources}
         Provide 3-5 specific recommendations with contact information/resources."""
 
-        response = client.chat.completions.create(
-            model="deepseek-r1-distill-qwen-7b",
-            messages=state.messages
-        )
-        recommendations = response.choices[0].message.content
-        print("\n[Support Agent Recommendations]:\n", recommendations)
-        state.messages.append({"role": "assistant", "content": recommendations})
+        recommendations = gateway.stream(
+            router.route("support"),
+            state["messages"] + new,
+            prefix="\n[Support Agent Recommendations]:\n ",
+            stream=STREAM_RESPONSES,
+            node="support"
+        ).content
+        new.append({"role": "assistant", "content": recommendations})
     else:
         print("[Support Agent]: Remember, help is always available when you need it.")
 
     print("\nThank you for chatting today. Wishing you well!")
-    return state
+    return {"messages": new}
 
 # ... (rest of the original code remains the same) ...
\ No newline at end of file
@@ -0,0 +1,183 @@
+import math
+import os
+import warnings
+
+import faiss
+import numpy as np
+
+# FAISS index types for MentalHealthRAG, picked from the corpus size and a
+# memory budget. Every type uses L2 distance, like FAISS.from_documents, so
+# scores and rankings match the exact index up to the approximation.
+#   flat  - exact search; query time grows linearly with the corpus
+#   hnsw  - graph search; full vectors plus the graph, no training
+#   ivf   - inverted lists over k-means cells; full vectors, trained on a sample
+#   ivfpq - inverted lists with product-quantized codes; m bytes per vector,
+#           plus (refine) a float16 or 8-bit copy of every vector that re-ranks
+#           the REFINE_K_FACTOR * k PQ candidates, since PQ distances alone
+#           miss about half the true top 10 at 1M vectors
+
+INDEX_TYPES = ("auto", "flat", "hnsw", "ivf", "ivfpq")
+
+INDEX_TYPE = os.environ.get("RAG_INDEX_TYPE", "auto")
+MEMORY_BUDGET = int(float(os.environ.get("RAG_INDEX_MEMORY_MB", "1024")) * 2**20)
+
+# Below this many vectors an exact scan is fast enough, so auto keeps flat
+EXACT_MAX = 20_000
+
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 80
+HNSW_EF_SEARCH = int(os.environ.get("RAG_INDEX_EF_SEARCH", "64"))
+
+# Search-time settings are not part of the saved index's content hash, so they
+# can be changed without a rebuild
+NPROBE = int(os.environ.get("RAG_INDEX_NPROBE", "16"))
+
+TRAIN_PER_LIST = 64       # training sample size per IVF cell
+MIN_PER_LIST = 39         # fewer training points per cell than this and k-means is unreliable
+PQ_BITS = 8
+PQ_SUBQUANTIZERS = (96, 64, 48, 32, 24, 16, 8)  # bytes per vector, tried largest first
+
+# Re-ranking stores for ivfpq, most accurate first; None is PQ distances only.
+# At 1M vectors, 8 candidates per result re-ranked from SQ8 find 0.96 of the
+# true top 10 against 0.92 with 4, at the same query time
+REFINES = ("SQfp16", "SQ8", None)
+REFINE_K_FACTOR = int(os.environ.get("RAG_INDEX_REFINE_K_FACTOR", "8"))
+
+# Lowest recall@10 bench_ann_index.py measured for each kind of index between
+# 10k and 1M vectors at the default search settings; auto passes over any
+# below MIN_RECALL. ivfpq is keyed by (refine store, bytes per vector), and a
+# size that was not measured takes the figure of the next smaller one. The
+# 24-byte figures were taken with 4 candidates per result, so they understate;
+# SQfp16 re-ranks at least as well as SQ8 (0.93 against 0.92 with 4 at 1M).
+EXPECTED_RECALL = {"flat": 1.0, "hnsw": 0.94, "ivf": 0.93}
+IVFPQ_RECALL = {
+    ("SQfp16", 96): 0.95, ("SQ8", 96): 0.95, (None, 96): 0.56,
+    ("SQfp16", 24): 0.76, ("SQ8", 24): 0.76, (None, 24): 0.32,
+}
+MIN_RECALL = float(os.environ.get("RAG_INDEX_MIN_RECALL", "0.85"))
+
+def expected_recall(spec) -> float:
+    if spec["type"] != "ivfpq":
+        return EXPECTED_RECALL[spec["type"]]
+    measured = [m for refine, m in IVFPQ_RECALL if refine == spec.get("refine") and m <= spec["m"]]
+    return IVFPQ_RECALL[spec.get("refine"), max(measured)] if measured else 0.0
+
+def ivf_lists(n: int) -> int:
+    """About 4 * sqrt(n) cells, a power of two, with enough vectors per cell to train."""
+    lists = 2 ** round(math.log2(max(1.0, 4 * math.sqrt(n))))
+    while lists > 1 and n < lists * MIN_PER_LIST:
+        lists //= 2
+    return lists
+
+def estimate_bytes(spec, n: int, dim: int) -> int:
+    """Approximate resident size of an index described by spec holding n vectors."""
+    kind = spec["type"]
+    if kind == "flat":
+        return n * dim * 4
+    if kind == "hnsw":
+        # Level 0 has 2 * M links per vector; upper levels add about 1/M of that again
+        return n * (dim * 4 + int(2 * spec["m"] * 4 * (1 + 1 / spec["m"])))
+    centroids = spec["nlist"] * dim * 4
+    if kind == "ivf":
+        return centroids + n * (dim * 4 + 8)
+    codebooks = 2 ** PQ_BITS * dim * 4
+    refine = {"SQfp16": 2 * dim, "SQ8": dim, None: 0}[spec.get("refine")]
+    return centroids + codebooks + n * (spec["m"] + 8 + refine)
+
+def _spec(kind, n, dim):
+    if kind == "flat":
+        return {"type": "flat"}
+    if kind == "hnsw":
+        return {"type": "hnsw", "m": HNSW_M}
+    nlist = ivf_lists(n)
+    if kind == "ivf":
+        return {"type": "ivf", "nlist": nlist}
+    m = next((m for m in PQ_SUBQUANTIZERS if dim % m == 0), None)
+    if m is None:
+        raise ValueError(f"no PQ size in {PQ_SUBQUANTIZERS} divides dimension {dim}")
+    return {"type": "ivfpq", "nlist": nlist, "m": m, "refine": REFINES[0]}
+
+def _trainable(spec, n):
+    if spec["type"] == "ivf":
+        return n >= MIN_PER_LIST
+    if spec["type"] == "ivfpq":
+        return n >= MIN_PER_LIST * 2 ** PQ_BITS
+    return True
+
+def choose_index(n: int, dim: int, memory_budget: int = MEMORY_BUDGET, index_type: str = INDEX_TYPE,
+                 min_recall: float = MIN_RECALL) -> dict:
+    """
+    The index spec for n dim-dimensional vectors. auto takes, in order, the
+    first that fits memory_budget and whose expected_recall is at least
+    min_recall: flat (only up to EXACT_MAX vectors), hnsw, ivf, then the
+    ivfpq refine store and size with the best expected recall. A type that
+    cannot be trained on n vectors falls back to flat. When nothing fits, or
+    nothing that fits is expected to reach min_recall, auto warns and takes
+    flat (exact, though over budget), so a module that builds its index at
+    import still loads.
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"unknown index type {index_type!r}; expected one of {', '.join(INDEX_TYPES)}")
+    if index_type != "auto":
+        spec = _spec(index_type, n, dim)
+        return spec if _trainable(spec, n) else {"type": "flat"}
+
+    if n <= EXACT_MAX and estimate_bytes({"type": "flat"}, n, dim) <= memory_budget:
+        return {"type": "flat"}
+    nlist = ivf_lists(n)
+    pq = [{"type": "ivfpq", "nlist": nlist, "m": m, "refine": refine}
+          for refine in REFINES for m in PQ_SUBQUANTIZERS if dim % m == 0]
+    # sorted() is stable, so equal recalls keep the more bytes per vector first
+    candidates = [_spec("hnsw", n, dim), _spec("ivf", n, dim)] + sorted(pq, key=expected_recall, reverse=True)
+    fitting = [spec for spec in candidates if estimate_bytes(spec, n, dim) <= memory_budget]
+    for spec in fitting:
+        if expected_recall(spec) >= min_recall:
+            return spec if _trainable(spec, n) else {"type": "flat"}
+    if fitting:
+        best = max(fitting, key=expected_recall)
+        reason = (f"the best index that fits, {factory_string(best)}, has an expected recall@10 of "
+                  f"{expected_recall(best):.2f}, below RAG_INDEX_MIN_RECALL={min_recall}")
+    else:
+        reason = "no index type fits"
+    warnings.warn(f"{n} vectors of dimension {dim} in {memory_budget / 2**20:.0f} MB: {reason}; using an exact "
+                  f"Flat index ({estimate_bytes({'type': 'flat'}, n, dim) / 2**20:.0f} MB) instead. Raise "
+                  f"RAG_INDEX_MEMORY_MB or pick RAG_INDEX_TYPE explicitly", RuntimeWarning, stacklevel=2)
+    return {"type": "flat"}
+
+def factory_string(spec) -> str:
+    kind = spec["type"]
+    if kind == "flat":
+        return "Flat"
+    if kind == "hnsw":
+        return f"HNSW{spec['m']},Flat"
+    if kind == "ivf":
+        return f"IVF{spec['nlist']},Flat"
+    refine = spec.get("refine")
+    return f"IVF{spec['nlist']},PQ{spec['m']}x{PQ_BITS}" + (f",Refine({refine})" if refine else "")
+
+def tune(index, spec, nprobe=NPROBE, ef_search=HNSW_EF_SEARCH, k_factor=REFINE_K_FACTOR):
+    """Apply the search-time settings; call again after loading a saved index."""
+    if spec["type"] == "hnsw":
+        faiss.downcast_index(index).hnsw.efSearch = ef_search
+    elif spec["type"] in ("ivf", "ivfpq"):
+        faiss.extract_index_ivf(index).nprobe = min(nprobe, spec["nlist"])
+        if spec.get("refine"):
+            faiss.downcast_index(index).k_factor = k_factor
+    return index
+
+def build_index(vectors, spec, seed=0):
+    """A FAISS index for spec holding vectors (rows added in order), trained on a random sample."""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    index = faiss.index_factory(vectors.shape[1], factory_string(spec), faiss.METRIC_L2)
+    if spec["type"] == "hnsw":
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    elif spec["type"] == "ivfpq":
+        # On by default in the factory; only Hamming-filtered search uses it, and it
+        # is most of the PQ training time
+        faiss.downcast_index(faiss.extract_index_ivf(index)).do_polysemous_training = False
+    if not index.is_trained:
+        size = min(len(vectors), max(TRAIN_PER_LIST * spec["nlist"], MIN_PER_LIST * 2 ** PQ_BITS))
+        rows = np.sort(np.random.default_rng(seed).choice(len(vectors), size, replace=False))
+        index.train(vectors[rows])
+    index.add(vectors)
+    return tune(index, spec)
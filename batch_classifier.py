@@ -0,0 +1,127 @@
+from itertools import chain
+
+import numpy as np
+from scipy import sparse
+
+# Texts tokenized at a time; small chunks keep the live token lists short, which
+# keeps the garbage collector's passes over them cheap
+CHUNK_SIZE = 4096
+
+# Distinct raw tokens remembered between batches before the vocabulary starts over
+MAX_VOCABULARY = 1 << 20
+
+# Without a normalizer, `kw in text` per keyword is a fast C scan that stops at
+# the first hit, and beats building the sparse matrix up to about this many
+# keywords (bench_classify_many.py --sweep: ~40-50 on synthetic logs). With a
+# normalizer the sparse path always wins: it normalizes each distinct token
+# once per vocabulary instead of every token of every text.
+SCALAR_MAX_KEYWORDS = 40
+
+class KeywordClassifier:
+    """
+    Keyword Classifier (ordered rules, scalar and batch paths):
+      - rules are (label, keywords) pairs; the first rule with a keyword in the
+        lowered text wins, default otherwise.
+      - Keywords with a space are phrases, always matched as substrings. Other
+        keywords are matched as substrings too (`"sad" in text`), or, when
+        normalize is given, against normalize(token) for each whitespace token
+        (workflow_1's lemmatized words).
+      - classify_many() builds a sparse document x token matrix for the batch and
+        multiplies it by the token x rule incidence of every token seen so far;
+        phrases are one vectorized substring search each. Results are identical to
+        classify(): a word keyword can only occur inside a single whitespace token.
+        Rules without a normalizer and with at most SCALAR_MAX_KEYWORDS keywords
+        are faster one text at a time, so there it just loops over classify().
+    """
+
+    def __init__(self, rules, default, normalize=None, max_vocabulary=MAX_VOCABULARY):
+        self.rules = [(label, tuple(keywords)) for label, keywords in rules]
+        self.labels = [label for label, _ in self.rules]
+        self.default = default
+        self.normalize = normalize
+        self.max_vocabulary = max_vocabulary
+        self.phrases = [(rule, kw) for rule, (_, keywords) in enumerate(self.rules) for kw in keywords if ' ' in kw]
+        self.words = [(rule, kw) for rule, (_, keywords) in enumerate(self.rules) for kw in keywords if ' ' not in kw]
+        self._word_rules = {}
+        for rule, kw in self.words:
+            self._word_rules.setdefault(kw, set()).add(rule)
+        self._vocab = {}
+        self._incidence = np.zeros((1024, len(self.rules)), dtype=np.int32)
+        self._outcomes = np.array(self.labels + [default], dtype=object)
+
+    def classify(self, text: str):
+        """Scalar path: one text, rules in order."""
+        text = text.lower()
+        words = {self.normalize(token) for token in text.split()} if self.normalize else None
+        for label, keywords in self.rules:
+            for kw in keywords:
+                if words is not None and ' ' not in kw:
+                    found = kw in words
+                else:
+                    found = kw in text
+                if found:
+                    return label
+        return self.default
+
+    def _token_rules(self, token):
+        if self.normalize is None:
+            return {rule for rule, kw in self.words if kw in token}
+        return self._word_rules.get(self.normalize(token), ())
+
+    def _column(self, token) -> int:
+        column = self._vocab.get(token)
+        if column is not None:
+            return column
+        column = len(self._vocab)
+        if column == len(self._incidence):
+            self._incidence = np.concatenate([self._incidence, np.zeros_like(self._incidence)])
+        for rule in self._token_rules(token):
+            self._incidence[column, rule] = 1
+        self._vocab[token] = column
+        return column
+
+    @property
+    def sparse(self) -> bool:
+        """Whether classify_many() takes the sparse-matrix path by default."""
+        return self.normalize is not None or len(self.phrases) + len(self.words) > SCALAR_MAX_KEYWORDS
+
+    def classify_many(self, texts, sparse=None) -> list:
+        """
+        Batch path: labels for texts, in order, identical to [classify(t) for t in texts].
+        sparse forces (True) or skips (False) the sparse-matrix path; None picks the faster one.
+        """
+        texts = list(texts)
+        if not (self.sparse if sparse is None else sparse):
+            return [self.classify(text) for text in texts]
+        labels = []
+        for start in range(0, len(texts), CHUNK_SIZE):
+            labels.extend(self._classify_chunk(texts[start:start + CHUNK_SIZE]))
+        return labels
+
+    def _classify_chunk(self, texts) -> list:
+        if len(self._vocab) > self.max_vocabulary:
+            self._vocab.clear()
+            self._incidence[:] = 0
+
+        lowered = [text.lower() for text in texts]
+        split = [text.split() for text in lowered]
+        indptr = np.zeros(len(split) + 1, dtype=np.int64)
+        np.cumsum(np.fromiter(map(len, split), dtype=np.int64, count=len(split)), out=indptr[1:])
+        tokens = list(chain.from_iterable(split))
+        columns = list(map(self._vocab.get, tokens))
+        if None in columns:
+            columns = [self._column(token) if column is None else column for column, token in zip(columns, tokens)]
+
+        bag = sparse.csr_matrix(
+            (np.ones(len(columns), dtype=np.int32), np.asarray(columns, dtype=np.int64), indptr),
+            shape=(len(split), len(self._vocab)),
+        )
+        scores = bag @ self._incidence[:len(self._vocab)]
+        if self.phrases:
+            batch = np.array(lowered)
+            for rule, phrase in self.phrases:
+                scores[:, rule] += np.strings.find(batch, phrase) >= 0
+
+        matched = scores > 0
+        first = np.where(matched.any(axis=1), matched.argmax(axis=1), len(self.labels))
+        return self._outcomes[first].tolist()
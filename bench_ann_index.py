@@ -0,0 +1,109 @@
+import argparse
+import time
+
+import faiss
+import numpy as np
+
+from ann_index import (HNSW_EF_SEARCH, MEMORY_BUDGET, NPROBE, REFINE_K_FACTOR, REFINES, build_index, choose_index,
+                       estimate_bytes, expected_recall, tune)
+
+# ann_index types against the exact flat index on synthetic corpora of
+# 384-dimensional unit vectors (the all-MiniLM-L6-v2 shape), drawn around
+# topic centres so that neighbours cluster the way chunk embeddings do.
+# For each corpus size: build time, estimated memory, recall@k against the
+# flat index's top k (next to ann_index.expected_recall, which auto checks
+# against MIN_RECALL), and p50/p99 latency of one-query searches (retrieve()
+# searches one query at a time). ivfpq runs once per refine store.
+
+DIM = 384
+
+def synthetic(n, dim=DIM, topics=1000, spread=0.6, seed=0, block=100_000):
+    """n unit vectors around `topics` random centres; the same seed gives the same centres."""
+    centres = np.random.default_rng(1234).standard_normal((topics, dim), dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    out = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, block):
+        rows = min(block, n - start)
+        part = centres[rng.integers(topics, size=rows)]
+        part += spread * rng.standard_normal((rows, dim), dtype=np.float32)
+        part /= np.linalg.norm(part, axis=1, keepdims=True)
+        out[start:start + rows] = part
+    return out
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+def latencies(index, queries, k):
+    times = []
+    for i in range(len(queries)):
+        began = time.perf_counter()
+        index.search(queries[i:i + 1], k)
+        times.append(time.perf_counter() - began)
+    return percentile(times, 0.5), percentile(times, 0.99)
+
+def recall(found, truth):
+    k = truth.shape[1]
+    return sum(len(set(row) & set(expected)) for row, expected in zip(found, truth)) / (k * len(truth))
+
+def row(name, spec, build_seconds, size_bytes, recall_at_k, expected, p50, p99):
+    print(f"{name:<7} {spec:<31} {build_seconds:>8.1f}s {size_bytes / 2**20:>8.0f}MB {recall_at_k:>8.3f} {expected:>8.2f} "
+          f"{p50 * 1000:>8.3f}ms {p99 * 1000:>8.3f}ms")
+
+def _specs(n, kind, budget, refines):
+    spec = choose_index(n, DIM, budget, kind)
+    if spec["type"] != "ivfpq":
+        return [spec]
+    return [{**spec, "refine": refine} for refine in refines]
+
+def run(n, types, queries, k, budget, nprobe, ef_search, k_factor, refines):
+    vectors = synthetic(n)
+    print(f"\n{n:,} chunks; auto picks {choose_index(n, DIM, budget, 'auto')} for {budget / 2**20:.0f} MB")
+    print(f"{'type':<7} {'index':<31} {'build':>9} {'memory':>10} {f'recall@{k}':>8} {'expected':>8} {'p50':>10} {'p99':>10}")
+
+    began = time.perf_counter()
+    flat = faiss.IndexFlatL2(DIM)
+    flat.add(vectors)
+    build_seconds = time.perf_counter() - began
+    _, truth = flat.search(queries, k)
+    flat_spec = {"type": "flat"}
+    row("flat", "exact", build_seconds, estimate_bytes(flat_spec, n, DIM), 1.0, expected_recall(flat_spec),
+        *latencies(flat, queries, k))
+    del flat
+
+    for kind in types:
+        for spec in _specs(n, kind, budget, refines):
+            if spec["type"] == "flat":
+                print(f"{kind:<7} too few vectors to train; would fall back to flat")
+                continue
+            began = time.perf_counter()
+            index = tune(build_index(vectors, spec), spec, nprobe=nprobe, ef_search=ef_search, k_factor=k_factor)
+            build_seconds = time.perf_counter() - began
+            _, found = index.search(queries, k)
+            label = ",".join(f"{key}={value}" for key, value in spec.items() if key != "type")
+            row(kind, label, build_seconds, estimate_bytes(spec, n, DIM), recall(found, truth), expected_recall(spec),
+                *latencies(index, queries, k))
+            del index
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@k and query latency of ann_index types against the flat index")
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="comma-separated corpus sizes")
+    parser.add_argument("--types", default="hnsw,ivf,ivfpq", help="comma-separated index types besides flat")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--budget-mb", type=float, default=MEMORY_BUDGET / 2**20, help="memory budget for the auto pick")
+    parser.add_argument("--nprobe", type=int, default=NPROBE)
+    parser.add_argument("--ef-search", type=int, default=HNSW_EF_SEARCH)
+    parser.add_argument("--k-factor", type=int, default=REFINE_K_FACTOR, help="ivfpq candidates re-ranked per result")
+    parser.add_argument("--refines", default=",".join(str(refine) for refine in REFINES),
+                        help="comma-separated ivfpq refine stores (None: PQ distances only)")
+    args = parser.parse_args()
+
+    refines = [None if refine == "None" else refine for refine in args.refines.split(",")]
+    queries = synthetic(args.queries, seed=99)
+    for n in (int(size) for size in args.sizes.split(",")):
+        run(n, args.types.split(","), queries, args.k, int(args.budget_mb * 2**20), args.nprobe, args.ef_search,
+            args.k_factor, refines)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import argparse
+import asyncio
+import json
+import os
+import socket
+import threading
+import time
+
+import httpx
+import uvicorn
+
+# Scripted user: enough answers for a full RAG_MultiAgent_2 / test_2 conversation
+ANSWERS = [
+    "I had a stressful day at work and I'm feeling anxious",
+    "deadlines",
+    "not really",
+    "I have been sleeping badly",
+    "a little",
+    "yes",
+    "someone to talk to",
+]
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _serve(app, port):
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+async def _sse_turn(client, url, body):
+    """POST one turn as SSE; return (seconds to first output, turn seconds, turn payload)."""
+    start = time.perf_counter()
+    first = None
+    event = None
+    async with client.stream("POST", url, json=body, headers={"Accept": "text/event-stream"}) as response:
+        if response.status_code != 200:
+            return None, time.perf_counter() - start, {"error": response.status_code}
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                event = line[7:]
+            elif line.startswith("data: "):
+                if first is None:
+                    first = time.perf_counter() - start
+                if event in ("turn", "error"):
+                    return first, time.perf_counter() - start, json.loads(line[6:])
+    return first, time.perf_counter() - start, {"error": "stream ended without a turn"}
+
+async def run_session(client, base_url, think_time, delay, results):
+    await asyncio.sleep(delay)
+    first, seconds, turn = await _sse_turn(client, f"{base_url}/sessions", {})
+    answers = iter(ANSWERS * 2)
+    while True:
+        if "error" in turn:
+            results["errors"] += 1
+            return
+        results["turns"].append(seconds)
+        if first is not None:
+            results["first_output"].append(first)
+        if turn["done"]:
+            results["sessions"] += 1
+            return
+        await asyncio.sleep(think_time)
+        first, seconds, turn = await _sse_turn(
+            client, f"{base_url}/sessions/{turn['session_id']}/messages", {"message": next(answers)}
+        )
+
+async def run_level(base_url, sessions, think_time, ramp):
+    results = {"turns": [], "first_output": [], "sessions": 0, "errors": 0}
+    limits = httpx.Limits(max_connections=sessions + 10, max_keepalive_connections=sessions + 10)
+    async with httpx.AsyncClient(timeout=300, limits=limits) as client:
+        start = time.perf_counter()
+        # Sessions arrive spread over the ramp instead of all at once
+        await asyncio.gather(*(run_session(client, base_url, think_time, ramp * i / sessions, results)
+                               for i in range(sessions)))
+        elapsed = time.perf_counter() - start
+    return {
+        "sessions": sessions,
+        "completed": results["sessions"],
+        "errors": results["errors"],
+        "turns_per_second": len(results["turns"]) / elapsed,
+        "p50_turn": percentile(results["turns"], 0.5),
+        "p95_turn": percentile(results["turns"], 0.95),
+        "p95_first_output": percentile(results["first_output"], 0.95),
+        "elapsed": elapsed,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test chat_service against fake_llm_server")
+    parser.add_argument("--workflow", default="RAG_MultiAgent_2")
+    parser.add_argument("--levels", default="10,25,50,100,200")
+    parser.add_argument("--think-time", type=float, default=5.0, help="seconds a user takes to answer")
+    parser.add_argument("--ramp", type=float, default=10.0, help="seconds over which the sessions arrive")
+    parser.add_argument("--target-p95", type=float, default=2.0, help="p95 turn latency (s) a level must meet")
+    parser.add_argument("--tokens", type=int, default=60)
+    parser.add_argument("--first-token-delay", type=float, default=0.2)
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    args = parser.parse_args()
+
+    import fake_llm_server
+
+    llm_port = _free_port()
+    _serve(fake_llm_server.create_app(args.tokens, args.first_token_delay, args.token_delay), llm_port)
+    # The gateway reads its settings at import time
+    os.environ["LLM_BASE_URL"] = f"http://127.0.0.1:{llm_port}/v1"
+    os.environ["LLM_CACHE_NODES"] = ""
+
+    import chat_service
+
+    levels = [int(level) for level in args.levels.split(",")]
+    service = chat_service.ChatService(args.workflow, max_sessions=max(levels))
+    port = _free_port()
+    _serve(chat_service.create_app(service), port)
+    base_url = f"http://127.0.0.1:{port}"
+
+    print(f"{'sessions':>8} {'done':>5} {'errors':>6} {'turns/s':>8} {'p50 turn':>9} {'p95 turn':>9} {'p95 first':>10}")
+    target = 0
+    for level in levels:
+        row = asyncio.run(run_level(base_url, level, args.think_time, args.ramp))
+        print(f"{row['sessions']:>8} {row['completed']:>5} {row['errors']:>6} {row['turns_per_second']:>8.1f} "
+              f"{row['p50_turn']:>8.2f}s {row['p95_turn']:>8.2f}s {row['p95_first_output']:>9.2f}s")
+        if row["errors"] == 0 and row["p95_turn"] <= args.target_p95:
+            target = level
+    print(f"\nConcurrency target (p95 turn <= {args.target_p95}s, no errors): {target} sessions")
+
+if __name__ == "__main__":
+    main()
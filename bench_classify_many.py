@@ -0,0 +1,87 @@
+import argparse
+import importlib
+import random
+import string
+import time
+
+from batch_classifier import SCALAR_MAX_KEYWORDS, KeywordClassifier
+
+# Messages/sec of a workflow's keyword router one message at a time (the path
+# the graph takes) against classify_many()'s sparse-matrix path and its default
+# (whichever of the two it picks) on the same corpus, and a check that all give
+# the same label for every message. --sweep runs synthetic rule sets of growing
+# size, with and without a normalizer, to show where the sparse path wins
+# (SCALAR_MAX_KEYWORDS).
+
+FILLER = ("i", "have", "been", "feeling", "really", "today", "work", "my", "family", "sleep", "again",
+          "the", "week", "and", "it", "is", "hard", "to", "focus", "on", "anything", "lately", "friends")
+
+def corpus(classifier, size, seed=0):
+    """Synthetic chat-log lines: mostly filler, some carrying one keyword of a random rule."""
+    rng = random.Random(seed)
+    keywords = [kw for _, kws in classifier.rules for kw in kws]
+    messages = []
+    for _ in range(size):
+        words = [rng.choice(FILLER) for _ in range(rng.randint(4, 30))]
+        if rng.random() < 0.6:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(keywords).upper() if rng.random() < 0.1 else rng.choice(keywords))
+        messages.append(" ".join(words) + rng.choice(("", ".", "!", "?")))
+    return messages
+
+def _rate(fn, messages):
+    start = time.perf_counter()
+    labels = fn(messages)
+    return labels, len(messages) / (time.perf_counter() - start)
+
+def run(classifier, messages):
+    scalar, scalar_rate = _rate(lambda batch: [classifier.classify(message) for message in batch], messages)
+    classifier.classify_many(messages[:1000], sparse=True)  # warm the token vocabulary like a long-running triage job
+    sparse, sparse_rate = _rate(lambda batch: classifier.classify_many(batch, sparse=True), messages)
+    default, default_rate = _rate(classifier.classify_many, messages)
+    return {
+        "messages": len(messages),
+        "keywords": len(classifier.phrases) + len(classifier.words),
+        "path": "sparse" if classifier.sparse else "scalar",
+        "scalar": scalar_rate,
+        "sparse": sparse_rate,
+        "default": default_rate,
+        "mismatches": sum(a != b or a != c for a, b, c in zip(scalar, sparse, default)),
+    }
+
+def sweep(messages, sizes=(10, 20, 40, 80, 160, 320), seed=0):
+    """Synthetic 4-rule sets of growing keyword count, without and with a normalizer."""
+    rng = random.Random(seed)
+    letters = string.ascii_lowercase
+    print(f"{'keywords':>8}  {'normalize':>9}  {'scalar':>10}  {'sparse':>10}  default path")
+    for size in sizes:
+        keywords = ["".join(rng.choice(letters) for _ in range(rng.randint(4, 9))) for _ in range(size)]
+        rules = [(f"rule{i}", keywords[i::4]) for i in range(4)]
+        for normalize in (None, lambda word: word.strip(string.punctuation)):
+            classifier = KeywordClassifier(rules, default="none", normalize=normalize)
+            row = run(classifier, corpus(classifier, messages))
+            differ = f"  ({row['mismatches']} labels differ)" if row["mismatches"] else ""
+            print(f"{size:>8}  {normalize is not None!s:>9}  {row['scalar']:>10,.0f}  {row['sparse']:>10,.0f}  "
+                  f"{row['path']}{differ}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark classify_many() against the scalar keyword router")
+    parser.add_argument("--workflow", default="workflow_2", help="module exposing CLASSIFIER")
+    parser.add_argument("--messages", type=int, default=500000)
+    parser.add_argument("--sweep", action="store_true", help="synthetic rule sets instead of a workflow's")
+    args = parser.parse_args()
+
+    if args.sweep:
+        print(f"{args.messages} messages per row; scalar below {SCALAR_MAX_KEYWORDS + 1} keywords without a normalizer")
+        sweep(args.messages)
+        return
+
+    module = importlib.import_module(args.workflow)
+    row = run(module.CLASSIFIER, corpus(module.CLASSIFIER, args.messages))
+    print(f"{args.workflow}: {row['messages']} messages, {row['keywords']} keywords, default path {row['path']}")
+    print(f"scalar:                 {row['scalar']:>10,.0f} messages/s")
+    print(f"classify_many (sparse): {row['sparse']:>10,.0f} messages/s  ({row['sparse'] / row['scalar']:.1f}x)")
+    print(f"classify_many:          {row['default']:>10,.0f} messages/s  ({row['default'] / row['scalar']:.1f}x)")
+    print(f"labels that differ: {row['mismatches']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import argparse
+import random
+import string
+import time
+
+from keyword_matcher import KeywordMatcher
+
+# Messages/sec of workflow_1's category decision before (per-call phrase/word
+# lists, one substring search per phrase, `word in list` per token) and after
+# (KeywordMatcher compiled once). Both sides get the same lowered text and
+# lemmatized tokens, so the numbers isolate the matching itself.
+
+FILLER = ("i", "have", "been", "feeling", "really", "today", "work", "my", "family", "sleep", "again",
+          "the", "week", "and", "it", "is", "hard", "to", "focus", "on", "anything", "lately", "friends")
+
+def legacy_classify(category_keywords, user_input, words):
+    """decide_category's matching as it was: crisis, anxiety, depression; phrases before words."""
+    for category in ("crisis_intervention", "anxiety_support", "depression_support"):
+        phrases = [p for p in category_keywords[category] if ' ' in p]
+        for phrase in phrases:
+            if phrase in user_input:
+                return category
+        category_words = [w for w in category_keywords[category] if ' ' not in w]
+        if any(word in category_words for word in words):
+            return category
+    return None
+
+def corpus(category_keywords, size, seed=0):
+    """Synthetic messages: mostly filler, some with one keyword of a random category."""
+    rng = random.Random(seed)
+    keywords = [kw for kws in category_keywords.values() for kw in kws]
+    messages = []
+    for _ in range(size):
+        words = [rng.choice(FILLER) for _ in range(rng.randint(4, 30))]
+        if rng.random() < 0.6:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(keywords))
+        messages.append(" ".join(words) + rng.choice(("", ".", "!", "?")))
+    return messages
+
+def tokens(message):
+    # Lemmatization is shared by both sides; it is left out of the timing
+    return [word.strip(string.punctuation) for word in message.split()]
+
+def rate(classify, inputs, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for user_input, words in inputs:
+            classify(user_input, words)
+    return rounds * len(inputs) / (time.perf_counter() - start)
+
+def run(category_keywords, messages=2000, rounds=5):
+    inputs = [(message, tokens(message)) for message in corpus(category_keywords, messages)]
+    start = time.perf_counter()
+    matcher = KeywordMatcher(category_keywords, ("crisis_intervention", "anxiety_support", "depression_support"))
+    compile_seconds = time.perf_counter() - start
+
+    mismatches = sum(legacy_classify(category_keywords, *item) != matcher.classify(*item) for item in inputs)
+    before = rate(lambda text, words: legacy_classify(category_keywords, text, words), inputs, rounds)
+    after = rate(matcher.classify, inputs, rounds)
+    return {
+        "keywords": sum(len(kws) for kws in category_keywords.values()),
+        "automaton_states": matcher.phrases.states,
+        "compile_seconds": compile_seconds,
+        "before": before,
+        "after": after,
+        "mismatches": mismatches,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark workflow_1's keyword matching before/after KeywordMatcher")
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    from workflow_1 import CATEGORY_KEYWORDS
+
+    row = run(CATEGORY_KEYWORDS, args.messages, args.rounds)
+    print(f"lexicon: {row['keywords']} keywords, {row['automaton_states']} automaton states, "
+          f"compiled in {row['compile_seconds'] * 1000:.2f} ms")
+    print(f"before: {row['before']:>10,.0f} messages/s")
+    print(f"after:  {row['after']:>10,.0f} messages/s  ({row['after'] / row['before']:.1f}x)")
+    print(f"decisions that differ: {row['mismatches']}")
+
+if __name__ == "__main__":
+    main()
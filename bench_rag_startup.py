@@ -0,0 +1,41 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+# Cold start of RAG_Multiagent: a fresh interpreter imports the module (which
+# builds MentalHealthRAG), once with no saved index (split + embed + build +
+# save) and then with the index it just saved (reload only).
+
+PROBE = """
+import json, time
+start = time.perf_counter()
+import RAG_Multiagent
+print(json.dumps({"import_seconds": time.perf_counter() - start, **RAG_Multiagent.mental_health_rag.startup}))
+"""
+
+def cold_start(index_dir):
+    env = dict(os.environ, RAG_INDEX_DIR=index_dir)
+    out = subprocess.run([sys.executable, "-c", PROBE], env=env, capture_output=True, text=True, check=True,
+                         cwd=os.path.dirname(os.path.abspath(__file__)))
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Report RAG_Multiagent cold-start time with and without a saved index")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'index':>6} {'import':>9} {'index step':>11} {'chunks':>7}")
+    for _ in range(args.runs):
+        index_dir = tempfile.mkdtemp(prefix="faiss_index_")
+        try:
+            for row in (cold_start(index_dir), cold_start(index_dir)):
+                print(f"{row['source']:>6} {row['import_seconds']:>8.3f}s {row['seconds'] * 1000:>9.1f}ms {row['chunks']:>7}")
+        finally:
+            shutil.rmtree(index_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
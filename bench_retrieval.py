@@ -0,0 +1,69 @@
+import argparse
+import random
+import time
+
+# MentalHealthRAG retrieval: one query at a time through retrieve() (with the
+# query LRU cold, then warm) against retrieve_many() on the same query stream.
+# The stream mixes a few short support requests that many sessions repeat with
+# one-off messages, like concurrent sessions do.
+
+COMMON = [
+    "someone to talk to", "anxiety", "help with sleep", "breathing exercises", "therapy",
+    "I feel anxious", "stress at work", "feeling depressed", "hotline", "exercise",
+]
+
+def query_stream(size, repeat=0.7, seed=0):
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(COMMON))]
+    return [rng.choices(COMMON, weights)[0] if rng.random() < repeat else f"support request {i} about my week"
+            for i in range(size)]
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+def single(rag, queries, k):
+    latencies = []
+    start = time.perf_counter()
+    for query in queries:
+        began = time.perf_counter()
+        rag.retrieve(query, k)
+        latencies.append(time.perf_counter() - began)
+    return len(queries) / (time.perf_counter() - start), percentile(latencies, 0.5), percentile(latencies, 0.99)
+
+def batched(rag, queries, k, batch_size):
+    latencies = []
+    start = time.perf_counter()
+    for i in range(0, len(queries), batch_size):
+        began = time.perf_counter()
+        rag.retrieve_many(queries[i:i + batch_size], k)
+        latencies.append(time.perf_counter() - began)
+    return len(queries) / (time.perf_counter() - start), percentile(latencies, 0.5), percentile(latencies, 0.99)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MentalHealthRAG retrieve() against retrieve_many()")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--k", type=int, default=3)
+    args = parser.parse_args()
+
+    from RAG_Multiagent import mental_health_rag as rag
+
+    queries = query_stream(args.queries)
+    rag.retrieve("warm up the model", args.k)
+
+    print(f"{'path':<28} {'queries/s':>10} {'p50':>9} {'p99':>9}")
+    rows = []
+    rag.embeddings.clear_queries()
+    rows.append(("retrieve, no repeats", *single(rag, [f"unique query {i}" for i in range(len(queries))], args.k)))
+    rag.embeddings.clear_queries()
+    rows.append(("retrieve, LRU", *single(rag, queries, args.k)))
+    rag.embeddings.clear_queries()
+    rows.append((f"retrieve_many x{args.batch_size}, LRU", *batched(rag, queries, args.k, args.batch_size)))
+    for name, rate, p50, p99 in rows:
+        print(f"{name:<28} {rate:>10,.0f} {p50 * 1000:>7.2f}ms {p99 * 1000:>7.2f}ms")
+    stats = rag.embeddings.stats()
+    print(f"query LRU: {stats['query_hits']} hits, {stats['query_misses']} misses")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import argparse
+import operator
+import time
+from typing import Annotated
+
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import StateGraph, START, END
+from pydantic import BaseModel
+from typing_extensions import TypedDict
+
+# Per-node-step cost of the old Pydantic ChatState (nodes mutate the history and
+# return the whole state) against the TypedDict schema with an append-only
+# messages reducer (nodes return only their delta), with no checkpointer (console
+# runs) and with MemorySaver (SessionEngine / chat_service).
+
+STEPS = 4  # nodes per run, like test_2's reception -> analysis -> assignment -> support
+
+class PydanticState(BaseModel):
+    messages: list = []
+    exit: bool = False
+    mood: str = ""
+
+class DeltaState(TypedDict, total=False):
+    messages: Annotated[list, operator.add]
+    exit: bool
+    mood: str
+
+def pydantic_step(state: PydanticState) -> PydanticState:
+    state.messages.append({"role": "user", "content": "fine"})
+    return state
+
+def delta_step(state: DeltaState) -> DeltaState:
+    return {"messages": [{"role": "user", "content": "fine"}]}
+
+def build(schema, step, checkpointer=None):
+    graph = StateGraph(schema)
+    names = [f"step{i}" for i in range(STEPS)]
+    for name in names:
+        graph.add_node(name, step)
+    graph.add_edge(START, names[0])
+    for a, b in zip(names, names[1:]):
+        graph.add_edge(a, b)
+    graph.add_edge(names[-1], END)
+    return graph.compile(checkpointer=checkpointer)
+
+def history(size):
+    return [{"role": "user" if i % 2 == 0 else "assistant", "content": f"message {i} " * 8} for i in range(size)]
+
+def per_step(app, make_state, runs):
+    # A new thread per run, so checkpointed runs do not pile up history
+    app.invoke(make_state(), {"configurable": {"thread_id": "warm-up"}})
+    start = time.perf_counter()
+    for run in range(runs):
+        app.invoke(make_state(), {"configurable": {"thread_id": str(run)}})
+    return (time.perf_counter() - start) / (runs * STEPS)
+
+def main():
+    parser = argparse.ArgumentParser(description="Pydantic vs append-only state: cost per node step")
+    parser.add_argument("--sizes", default="10,100,1000")
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'checkpointer':>12} {'messages':>8} {'pydantic':>12} {'append-only':>12} {'speed-up':>9}")
+    for label, checkpointer in (("none", None), ("MemorySaver", MemorySaver)):
+        pydantic_app = build(PydanticState, pydantic_step, checkpointer and checkpointer())
+        delta_app = build(DeltaState, delta_step, checkpointer and checkpointer())
+        for size in (int(s) for s in args.sizes.split(",")):
+            messages = history(size)
+            old = per_step(pydantic_app, lambda: PydanticState(messages=list(messages)), args.runs)
+            new = per_step(delta_app, lambda: {"messages": list(messages), "exit": False, "mood": ""}, args.runs)
+            print(f"{label:>12} {size:>8} {old * 1e6:>10.1f}us {new * 1e6:>10.1f}us {old / new:>8.1f}x")
+
+if __name__ == "__main__":
+    main()
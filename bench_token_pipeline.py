@@ -0,0 +1,65 @@
+import argparse
+import random
+import string
+import time
+
+# Per-turn token work in workflow_1 before (decide_category and the vocabulary
+# report each split, strip and lemmatize the input) and after (tokenize() once
+# per turn, lemmas memoized in a bounded LRU). The corpus draws words from a
+# Zipf-like vocabulary, which is how chat messages repeat words.
+
+def corpus(size, vocabulary=5000, seed=0):
+    rng = random.Random(seed)
+    words = [f"w{i}ing" if i % 3 else f"w{i}ed" for i in range(vocabulary)]
+    weights = [1 / (rank + 1) for rank in range(vocabulary)]
+    messages = []
+    for _ in range(size):
+        picked = rng.choices(words, weights, k=rng.randint(4, 30))
+        messages.append(" ".join(picked) + rng.choice(("", ".", "!", "?")))
+    return messages
+
+def before_turn(lemmatize, user_input):
+    """Two uncached passes, as decide_category and the main loop used to do."""
+    user_input = user_input.lower()
+    words = [lemmatize(word.strip(string.punctuation), pos='v') for word in user_input.split()]
+    input_words = [lemmatize(word.strip(string.punctuation), pos='v') for word in user_input.split()]
+    return words, input_words
+
+def after_turn(tokenize, user_input):
+    words = tokenize(user_input)
+    return words, words
+
+def rate(turn, fn, messages):
+    start = time.perf_counter()
+    for message in messages:
+        turn(fn, message)
+    return len(messages) / (time.perf_counter() - start)
+
+def run(lemmatize, tokenize, messages):
+    """lemmatize: the raw WordNet call; tokenize: the cached per-turn pipeline."""
+    assert all(before_turn(lemmatize, m)[0] == tokenize(m) for m in messages[:200])
+    before = rate(before_turn, lemmatize, messages)
+    after = rate(after_turn, tokenize, messages)
+    return {"messages": len(messages), "before": before, "after": after}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark workflow_1's per-turn token pipeline")
+    parser.add_argument("--messages", type=int, default=50000)
+    parser.add_argument("--vocabulary", type=int, default=5000)
+    args = parser.parse_args()
+
+    import workflow_1
+
+    messages = corpus(args.messages, args.vocabulary)
+    # Load WordNet before timing either side
+    workflow_1.lemmatizer.lemmatize("warming", pos='v')
+    workflow_1.lemmatize.cache_clear()
+    row = run(workflow_1.lemmatizer.lemmatize, workflow_1.tokenize, messages)
+    info = workflow_1.lemmatize.cache_info()
+    print(f"corpus: {row['messages']} messages, {args.vocabulary}-word vocabulary")
+    print(f"before: {row['before']:>10,.0f} turns/s")
+    print(f"after:  {row['after']:>10,.0f} turns/s  ({row['after'] / row['before']:.1f}x)")
+    print(f"lemma cache: {info.hits / max(1, info.hits + info.misses):.1%} hits, {info.currsize}/{info.maxsize} entries")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+import asyncio
+import importlib
+import json
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route, WebSocketRoute
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+from graph_registry import graphs
+from session_io import SessionEngine
+
+# --- Service Settings (override with environment variables) ---
+# Module whose build_graph(use_async=True) / new_chat_state() the service runs
+WORKFLOW = os.environ.get("CHAT_WORKFLOW", "RAG_MultiAgent_2")
+
+# Concurrency target: open sessions one process accepts before answering 503.
+# Measured with bench_chat_service.py against fake_llm_server.py (60 tokens,
+# 0.2 s to first token, 10 ms per token; users answer after 5 s): with the
+# gateway's default model slots p95 turn latency stayed under 2 s up to 25
+# concurrent sessions and reached ~5 s at 100; the model slots, not the service,
+# are the limit (with 32 slots per model one core served ~75 turns/s).
+MAX_SESSIONS = int(os.environ.get("CHAT_MAX_SESSIONS", 100))
+
+# Sessions idle for longer than this are dropped (checkpoint included)
+SESSION_IDLE_SECONDS = float(os.environ.get("CHAT_SESSION_IDLE_SECONDS", 30 * 60))
+
+# How often (seconds) the app looks for idle sessions, besides on every open()
+EXPIRE_INTERVAL = float(os.environ.get("CHAT_EXPIRE_INTERVAL", 60))
+
+class ServiceFull(Exception):
+    """Raised when a new session would exceed max_sessions."""
+
+class ChatService:
+    """
+    Chat Service:
+      - Runs one workflow graph on a SessionEngine; each session is a stored
+        checkpoint, so thousands can wait on their users without holding a thread.
+      - Takes one turn per session at a time and streams its output (tokens
+        included) to the caller while the turn runs.
+      - Caps open sessions at max_sessions and drops idle ones (on open() and
+        every EXPIRE_INTERVAL seconds while the app runs; see expire_idle).
+    """
+
+    def __init__(self, workflow=WORKFLOW, max_sessions=MAX_SESSIONS, idle_seconds=SESSION_IDLE_SECONDS):
+        module = importlib.import_module(workflow)
+        self.workflow = workflow
+        self.new_state = module.new_chat_state
+        self.engine = SessionEngine(module.build_graph(use_async=True))
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self.sessions = {}  # session_id -> (lock, last activity)
+        self.turns = 0
+        self.turn_seconds = 0.0
+        self.rejected = 0
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.idle_seconds
+        for session_id, (lock, last) in list(self.sessions.items()):
+            if last < cutoff and not lock.locked():
+                self.close(session_id)
+
+    async def expire_idle(self, interval=EXPIRE_INTERVAL):
+        """Drop idle sessions every interval seconds, until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            self._expire()
+
+    def open(self) -> str:
+        """Reserve a new session id (raises ServiceFull at max_sessions)."""
+        self._expire()
+        if len(self.sessions) >= self.max_sessions:
+            self.rejected += 1
+            raise ServiceFull(f"{len(self.sessions)} sessions open")
+        session_id = uuid.uuid4().hex
+        self.sessions[session_id] = (asyncio.Lock(), time.monotonic())
+        return session_id
+
+    def close(self, session_id):
+        if self.sessions.pop(session_id, None) is not None:
+            self.engine.close(session_id)
+
+    async def turn(self, session_id, message=None, on_output=None):
+        """
+        Run the session up to its next question: start it when message is None,
+        otherwise resume it with message. on_output receives output as it is produced.
+        Raises KeyError for an unknown (or meanwhile closed) session.
+        """
+        entry = self.sessions.get(session_id)
+        if entry is None:
+            raise KeyError(session_id)
+        lock = entry[0]
+        async with lock:
+            if session_id not in self.sessions:
+                raise KeyError(session_id)  # closed while this turn waited for the lock
+            start = time.perf_counter()
+            session = self.engine.listen(session_id, on_output)
+            try:
+                if message is None:
+                    turn = await self.engine.astart(self.new_state(), session_id=session_id)
+                else:
+                    turn = await self.engine.asend(session_id, message)
+            finally:
+                session.listener = None
+            self.turns += 1
+            self.turn_seconds += time.perf_counter() - start
+            if session_id in self.sessions:
+                self.sessions[session_id] = (lock, time.monotonic())
+            else:
+                # Closed mid-turn: drop the checkpoint the turn wrote after the close
+                self.engine.close(session_id)
+        if turn.done:
+            self.close(session_id)
+        return turn
+
+    async def stream(self, session_id, message=None):
+        """Async iterator of ("output", text) events followed by one ("turn", Turn)."""
+        queue = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+
+        def on_output(text):
+            # Sync nodes run on worker threads; hand their output to the loop
+            loop.call_soon_threadsafe(queue.put_nowait, text)
+
+        task = asyncio.ensure_future(self.turn(session_id, message, on_output))
+        task.add_done_callback(lambda _: loop.call_soon_threadsafe(queue.put_nowait, None))
+        while (text := await queue.get()) is not None:
+            yield "output", text
+        yield "turn", task.result()
+
+    def stats(self) -> dict:
+        return {
+            "workflow": self.workflow,
+            "open_sessions": len(self.sessions),
+            "max_sessions": self.max_sessions,
+            "turns": self.turns,
+            "mean_turn_seconds": self.turn_seconds / self.turns if self.turns else 0.0,
+            "rejected": self.rejected,
+        }
+
+def turn_payload(turn) -> dict:
+    payload = {"session_id": turn.session_id, "output": turn.output, "prompt": turn.prompt, "done": turn.done}
+    if turn.done:
+        payload["mood"] = turn.state.get("mood")
+        payload["exit"] = turn.state.get("exit")
+    return payload
+
+def _sse(event, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _wants_stream(request: Request) -> bool:
+    return "text/event-stream" in request.headers.get("accept", "") or request.query_params.get("stream") in ("1", "true")
+
+# --- ASGI App ---
+
+def create_app(service: ChatService = None) -> Starlette:
+    """
+    HTTP / WebSocket API:
+      POST /sessions                        start a session, run it to its first question
+      POST /sessions/{id}/messages          {"message": "..."}; run to the next question
+      GET  /sessions/{id}                   is the session waiting for a message
+      DELETE /sessions/{id}                 drop the session
+      GET  /stats                           service, gateway and model-router counters
+      WS   /ws                              one session per socket; send {"message": "..."}
+    Both POSTs answer JSON, or server-sent events ("output" chunks, then "turn")
+    with Accept: text/event-stream or ?stream=1.
+    """
+    service = service or ChatService()
+
+    async def respond(request, session_id, message):
+        if not _wants_stream(request):
+            try:
+                turn = await service.turn(session_id, message)
+            except KeyError:
+                return JSONResponse({"error": "unknown session"}, status_code=404)
+            return JSONResponse(turn_payload(turn))
+
+        async def events():
+            try:
+                async for kind, value in service.stream(session_id, message):
+                    if kind == "output":
+                        yield _sse("output", {"text": value})
+                    else:
+                        yield _sse("turn", turn_payload(value))
+            except Exception as exc:
+                # Headers are already sent; report the failure in-band
+                yield _sse("error", {"error": str(exc)})
+
+        return StreamingResponse(events(), media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    async def start_session(request: Request):
+        try:
+            session_id = service.open()
+        except ServiceFull as exc:
+            return JSONResponse({"error": f"service full: {exc}"}, status_code=503)
+        return await respond(request, session_id, None)
+
+    async def send_message(request: Request):
+        session_id = request.path_params["session_id"]
+        body = await request.json()
+        message = body.get("message")
+        if not isinstance(message, str):
+            return JSONResponse({"error": "'message' must be a string"}, status_code=400)
+        # Checked after reading the body, which may give a DELETE time to close the session
+        if service.sessions.get(session_id) is None:
+            return JSONResponse({"error": "unknown session"}, status_code=404)
+        return await respond(request, session_id, message)
+
+    async def session_status(request: Request):
+        session_id = request.path_params["session_id"]
+        if session_id not in service.sessions:
+            return JSONResponse({"error": "unknown session"}, status_code=404)
+        return JSONResponse({"session_id": session_id, "waiting": service.engine.waiting(session_id)})
+
+    async def delete_session(request: Request):
+        service.close(request.path_params["session_id"])
+        return JSONResponse({"deleted": True})
+
+    async def stats(request: Request):
+        from llm_gateway import gateway
+        from model_router import router
+
+        return JSONResponse({
+            "service": service.stats(),
+            "graphs": graphs.metrics(),
+            "gateway": {"in_flight": gateway.in_flight, "queued": gateway.queued, "latency": gateway.latency,
+                        "prefill": gateway.prefill},
+            "router": {f"{task}->{model}": count for (task, model), count in router.decisions.items()},
+        })
+
+    async def chat_socket(websocket: WebSocket):
+        await websocket.accept()
+        try:
+            session_id = service.open()
+        except ServiceFull as exc:
+            await websocket.send_json({"type": "error", "error": f"service full: {exc}"})
+            await websocket.close(code=1013)
+            return
+
+        message = None
+        turn = None
+        try:
+            while True:
+                async for kind, value in service.stream(session_id, message):
+                    if kind == "output":
+                        await websocket.send_json({"type": "output", "text": value})
+                    else:
+                        await websocket.send_json({"type": "turn", **turn_payload(value)})
+                        turn = value
+                if turn is None or turn.done:
+                    break
+                message = (await websocket.receive_json()).get("message", "")
+            await websocket.close()
+        except WebSocketDisconnect:
+            pass
+        finally:
+            # The socket is the session's only handle; whatever ended it, drop the session
+            service.close(session_id)
+
+    @asynccontextmanager
+    async def lifespan(app):
+        # Sessions whose clients vanish without a DELETE would otherwise wait for the next open()
+        reaper = asyncio.ensure_future(service.expire_idle())
+        try:
+            yield
+        finally:
+            reaper.cancel()
+
+    app = Starlette(routes=[
+        Route("/sessions", start_session, methods=["POST"]),
+        Route("/sessions/{session_id}/messages", send_message, methods=["POST"]),
+        Route("/sessions/{session_id}", session_status, methods=["GET"]),
+        Route("/sessions/{session_id}", delete_session, methods=["DELETE"]),
+        Route("/stats", stats),
+        WebSocketRoute("/ws", chat_socket),
+    ], lifespan=lifespan)
+    app.state.service = service
+    return app
+
+if __name__ == "__main__":
+    import uvicorn
+
+    # uvicorn chat_service:create_app --factory  works as well
+    uvicorn.run(create_app(), host=os.environ.get("CHAT_HOST", "127.0.0.1"),
+                port=int(os.environ.get("CHAT_PORT", 8000)), log_level="info")
@@ -0,0 +1,131 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+# Prompt-token budget for a model without its own entry in budgets (see
+# llm_gateway.MODEL_BUDGETS): a 4096-token context less room for the answer.
+DEFAULT_BUDGET = 3072
+SUMMARY_TOKENS = 400
+SUMMARY_HEADER = "Summary of the earlier conversation:\n"
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+@lru_cache(maxsize=4096)
+def count_tokens(text: str) -> int:
+    """Fast local estimate of BPE tokens: words and punctuation, with long words split."""
+    return sum(1 + len(piece) // 6 for piece in _TOKEN_PATTERN.findall(text))
+
+def message_tokens(msg) -> int:
+    # A few tokens of chat-template overhead per message
+    return count_tokens(msg.get("content") or "") + 4
+
+def summary_line(msg, max_chars=160) -> str:
+    """Default summarizer: the start of a turn, cut at a word boundary."""
+    text = " ".join((msg.get("content") or "").split())
+    if len(text) > max_chars:
+        text = text[:max_chars].rsplit(" ", 1)[0] + "..."
+    return f"{msg['role']}: {text}"
+
+class ContextWindow:
+    """
+    Context Window:
+      - Keeps the prompt for each model under its token budget.
+      - Sends the most recent turns verbatim (the sliding window).
+      - Folds older turns into a running summary inside the leading system
+        message (chat templates expect system text only at the start). Each turn
+        is summarized once, and each folded prefix's summary is built once.
+    """
+
+    def __init__(self, budgets=None, summary_tokens=SUMMARY_TOKENS, summarizer=summary_line, max_cached=4096,
+                 max_summaries=256):
+        self.budgets = dict(budgets or {})
+        self.summary_tokens = summary_tokens
+        self.summarizer = summarizer
+        self.max_cached = max_cached
+        self.max_summaries = max_summaries
+        self._lines = OrderedDict()
+        self._summaries = OrderedDict()  # digest of the folded prefix -> summary
+        self._lock = threading.Lock()
+
+    def budget(self, model) -> int:
+        return self.budgets.get(model, DEFAULT_BUDGET)
+
+    def _summary_for(self, msg) -> str:
+        key = hashlib.sha1(f"{msg['role']}\0{msg.get('content') or ''}".encode("utf-8")).hexdigest()
+        with self._lock:
+            line = self._lines.get(key)
+            if line is not None:
+                self._lines.move_to_end(key)
+                return line
+        line = self.summarizer(msg)
+        with self._lock:
+            self._lines[key] = line
+            while len(self._lines) > self.max_cached:
+                self._lines.popitem(last=False)
+        return line
+
+    def summarize(self, messages) -> str:
+        """Running summary of the folded turns, newest lines kept if it gets too long."""
+        digest = hashlib.sha1()
+        for msg in messages:
+            digest.update(f"{msg['role']}\0{msg.get('content') or ''}\0".encode("utf-8"))
+        key = digest.hexdigest()
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is not None:
+                self._summaries.move_to_end(key)
+                return summary
+        summary = self._build_summary(messages)
+        with self._lock:
+            self._summaries[key] = summary
+            while len(self._summaries) > self.max_summaries:
+                self._summaries.popitem(last=False)
+        return summary
+
+    def _build_summary(self, messages) -> str:
+        lines = []
+        for msg in messages:
+            line = self._summary_for(msg)
+            if line not in lines:  # repeated prompt templates only need to appear once
+                lines.append(line)
+        kept, used = [], 0
+        for line in reversed(lines):
+            used += count_tokens(line) + 1
+            if used > self.summary_tokens:
+                break
+            kept.append(line)
+        return "\n".join(reversed(kept))
+
+    def fit(self, messages, model):
+        """Return the messages to send to the model, within its budget."""
+        budget = self.budget(model)
+        if sum(message_tokens(msg) for msg in messages) <= budget:
+            return messages
+
+        # Leading system prompts always stay
+        head = 0
+        while head < len(messages) and messages[head]["role"] == "system":
+            head += 1
+        system = messages[:head]
+        remaining = budget - self.summary_tokens - sum(message_tokens(msg) for msg in system)
+
+        # The newest turns that fit, always at least the last one (the current prompt)
+        start, used = len(messages), 0
+        while start > head:
+            cost = message_tokens(messages[start - 1])
+            if start < len(messages) and used + cost > remaining:
+                break
+            used += cost
+            start -= 1
+
+        summary = self.summarize(messages[head:start])
+        if not summary:
+            return system + messages[start:]
+        if not system:
+            return [{"role": "system", "content": SUMMARY_HEADER + summary}] + messages[start:]
+        # Appended to the last leading system message, so there is still one system block
+        last = system[-1]
+        folded = dict(last, content=f"{last.get('content') or ''}\n\n{SUMMARY_HEADER}{summary}")
+        return system[:-1] + [folded] + messages[start:]
@@ -0,0 +1,278 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, so keep to one writer process per directory
+    fcntl = None
+
+# Bump when the on-disk layout changes; older caches are then ignored
+CACHE_VERSION = 1
+
+CACHE_DIR = os.environ.get("EMBEDDING_CACHE_DIR", "./embedding_cache")
+
+KEY_BYTES = 16  # leading bytes of the SHA-256 of a text
+
+# Query vectors kept in memory; sessions repeat short queries ("someone to talk to")
+QUERY_CACHE_SIZE = 1024
+
+# Models known to embed a query exactly like a document (no query prompt or
+# instruction prefix), so a batch of queries can share one embed_documents call.
+# Any other model (e5, bge, instructor, ...) gets one embed_query call per query.
+SYMMETRIC_MODELS = {
+    "sentence-transformers/all-MiniLM-L6-v2",
+    "sentence-transformers/all-MiniLM-L12-v2",
+    "sentence-transformers/all-mpnet-base-v2",
+}
+
+def text_key(text: str) -> bytes:
+    return hashlib.sha256(text.encode()).digest()[:KEY_BYTES]
+
+class EmbeddingCache:
+    """
+    Embedding Cache (one directory per model):
+      - vectors.f16 holds the vectors as float16 rows, read through a memory map;
+        keys.bin holds the text hash of each row, in the same order (the offset
+        index). Both are append-only.
+      - The key -> row dict is rebuilt from keys.bin on open. Vectors are written
+        before their keys, so a crash between the two only leaves a partial last
+        row, which readers ignore.
+      - Writers (any number of processes, e.g. ingest.py next to a running
+        service) append under an exclusive flock on the directory; only they cut
+        partial rows off the files, and they first pick up rows other writers
+        appended. Threads share an instance safely.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.dim = None
+        self._lock = threading.Lock()
+        self._rows = {}
+        self._count = 0  # rows in the files this instance knows (keys may repeat across writers)
+        self._matrix = None
+        meta = self._read_meta()
+        if meta and meta.get("version") == CACHE_VERSION:
+            self.dim = meta["dim"]
+            try:
+                self._load()
+            except OSError:
+                self.dim = None  # started over on the first write
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _read_meta(self):
+        try:
+            with open(self._file("meta.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _complete_rows(self):
+        """Rows whose vector and key are both fully written."""
+        return min(os.path.getsize(self._file("keys.bin")) // KEY_BYTES,
+                   os.path.getsize(self._file("vectors.f16")) // (self.dim * 2))
+
+    def _read_keys(self, start, stop):
+        with open(self._file("keys.bin"), "rb") as f:
+            f.seek(start * KEY_BYTES)
+            keys = f.read((stop - start) * KEY_BYTES)
+        for i in range(stop - start):
+            self._rows[keys[i * KEY_BYTES:(i + 1) * KEY_BYTES]] = start + i
+        self._count = stop
+
+    def _load(self):
+        # Whatever an interrupted or concurrent write left past the last complete
+        # row is ignored here, not cut off: it may be another process's append
+        self._read_keys(0, self._complete_rows())
+        self._remap()
+
+    def _remap(self):
+        rows = self._count
+        self._matrix = np.memmap(self._file("vectors.f16"), dtype=np.float16, mode="r", shape=(rows, self.dim)) if rows else None
+
+    @contextmanager
+    def _writer(self):
+        """Exclusive flock on the cache directory, held by one writing process at a time."""
+        os.makedirs(self.path, exist_ok=True)
+        if fcntl is None:
+            yield
+            return
+        fd = os.open(self.path, os.O_RDONLY)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)  # releases the lock
+
+    def _sync(self):
+        """Under the writer lock: cut partial rows off the files and read rows other writers appended."""
+        rows = self._complete_rows()
+        os.truncate(self._file("vectors.f16"), rows * self.dim * 2)
+        os.truncate(self._file("keys.bin"), rows * KEY_BYTES)
+        if rows < self._count:  # the files were started over
+            self._rows, self._count = {}, 0
+        self._read_keys(self._count, rows)
+
+    def _start(self, dim):
+        """First write: fix the dimension and start empty files."""
+        self.dim = dim
+        os.makedirs(self.path, exist_ok=True)
+        for name in ("vectors.f16", "keys.bin"):
+            open(self._file(name), "wb").close()
+        with open(self._file("meta.json"), "w") as f:
+            json.dump({"version": CACHE_VERSION, "dim": dim}, f)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def get_many(self, keys):
+        """float32 vectors for keys (None where missing)."""
+        with self._lock:
+            rows = [self._rows.get(key) for key in keys]
+            matrix = self._matrix
+        hits = [i for i, row in enumerate(rows) if row is not None]
+        vectors = [None] * len(keys)
+        if hits:
+            found = np.asarray(matrix[[rows[i] for i in hits]], dtype=np.float32)
+            for i, vector in zip(hits, found):
+                vectors[i] = vector
+        return vectors
+
+    def put_many(self, keys, vectors):
+        """Append vectors (stored as float16) for keys not cached yet."""
+        vectors = np.asarray(vectors, dtype=np.float16)
+        with self._lock, self._writer():
+            if self.dim is None:
+                meta = self._read_meta()
+                if (meta and meta.get("version") == CACHE_VERSION
+                        and all(os.path.exists(self._file(name)) for name in ("vectors.f16", "keys.bin"))):
+                    self.dim = meta["dim"]  # another process started the cache after this one opened it
+                else:
+                    self._start(vectors.shape[1])
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"{vectors.shape[1]}-dim vectors for a {self.dim}-dim cache at {self.path}")
+            self._sync()
+            new = {}
+            for key, vector in zip(keys, vectors):
+                if key not in self._rows and key not in new:
+                    new[key] = vector
+            if new:
+                with open(self._file("vectors.f16"), "ab") as f:
+                    f.write(np.stack(list(new.values())).tobytes())
+                with open(self._file("keys.bin"), "ab") as f:
+                    f.write(b"".join(new))
+                for offset, key in enumerate(new):
+                    self._rows[key] = self._count + offset
+                self._count += len(new)
+            self._remap()
+
+class CachedEmbeddings(Embeddings):
+    """
+    Cached Embeddings (wraps any LangChain Embeddings):
+      - embed_documents() embeds only texts whose (model, text hash) is not in
+        the cache, in one call, and stores them; FAISS builds and Chroma upserts
+        both go through it, so re-ingestion only embeds new or changed chunks.
+      - Every document vector is returned float16-rounded, cached or not, so an
+        index comes out the same whether or not the cache was warm.
+      - Queries are not written to disk; the last query_cache_size query
+        vectors are kept in an in-memory LRU. embed_queries() embeds a batch's
+        misses in one model call when the model is symmetric (see
+        SYMMETRIC_MODELS), otherwise through embed_query one by one.
+    """
+
+    def __init__(self, embeddings, model_name=None, cache_dir=CACHE_DIR, query_cache_size=QUERY_CACHE_SIZE,
+                 symmetric=None):
+        self.embeddings = embeddings
+        self.model_name = model_name or getattr(embeddings, "model_name", type(embeddings).__name__)
+        if symmetric is None:
+            # A HuggingFaceEmbeddings with its own query settings (e.g. a prompt) is not symmetric
+            query_kwargs = getattr(embeddings, "query_encode_kwargs", None)
+            symmetric = self.model_name in SYMMETRIC_MODELS and (
+                not query_kwargs or query_kwargs == getattr(embeddings, "encode_kwargs", None))
+        self.symmetric = symmetric
+        self.cache = EmbeddingCache(os.path.join(cache_dir, re.sub(r"[^\w.-]+", "_", self.model_name)))
+        self.query_cache_size = query_cache_size
+        self._queries = OrderedDict()
+        self._query_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.query_hits = 0
+        self.query_misses = 0
+
+    def embed_documents(self, texts):
+        keys = [text_key(text) for text in texts]
+        vectors = self.cache.get_many(keys)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            fresh = np.asarray(self.embeddings.embed_documents([texts[i] for i in missing]), dtype=np.float32)
+            self.cache.put_many([keys[i] for i in missing], fresh)
+            for i, vector in zip(missing, fresh.astype(np.float16).astype(np.float32)):
+                vectors[i] = vector
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        return [vector.tolist() for vector in vectors]
+
+    def _cached_query(self, text):
+        with self._query_lock:
+            vector = self._queries.get(text)
+            if vector is not None:
+                self._queries.move_to_end(text)
+                self.query_hits += 1
+            return vector
+
+    def _remember_query(self, text, vector):
+        with self._query_lock:
+            self.query_misses += 1
+            self._queries[text] = vector
+            if len(self._queries) > self.query_cache_size:
+                self._queries.popitem(last=False)
+
+    def clear_queries(self):
+        with self._query_lock:
+            self._queries.clear()
+
+    def embed_query(self, text):
+        vector = self._cached_query(text)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self._remember_query(text, vector)
+        return list(vector)
+
+    def _embed_new_queries(self, texts):
+        if self.symmetric:
+            return self.embeddings.embed_documents(texts)  # one forward pass for the batch
+        return [self.embeddings.embed_query(text) for text in texts]
+
+    def embed_queries(self, texts):
+        """Query vectors for a batch; the LRU's misses are embedded together (see symmetric)."""
+        vectors = [self._cached_query(text) for text in texts]
+        missing = {}
+        for i, vector in enumerate(vectors):
+            if vector is None:
+                missing.setdefault(texts[i], []).append(i)
+        if missing:
+            for text, vector in zip(missing, self._embed_new_queries(list(missing))):
+                self._remember_query(text, vector)
+                for i in missing[text]:
+                    vectors[i] = vector
+        return [list(vector) for vector in vectors]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "cached_vectors": len(self.cache),
+            "query_hits": self.query_hits,
+            "query_misses": self.query_misses,
+        }
@@ -0,0 +1,105 @@
+import argparse
+import asyncio
+import json
+import time
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+from reasoning import THINK_CLOSE, opens_think
+
+# Stand-in for LM Studio's OpenAI-compatible server: answers every chat
+# completion with canned tokens at a fixed pace, so the chat service can be
+# load-tested without loading a model.
+TOKENS = 60              # tokens per answer
+FIRST_TOKEN_DELAY = 0.2  # seconds before the first token (prompt processing)
+TOKEN_DELAY = 0.01       # seconds between tokens
+
+ANSWER_WORDS = "Thank you for sharing that . It sounds like a lot to carry , and it is okay to take things one step at a time .".split()
+
+# What a model that opens_think() writes before its answer: the chat template
+# opened the <think> block, so only the close tag appears
+REASONING_WORDS = "Okay , the user seems stressed ; I should answer gently .".split()
+
+QUESTIONS = ["What has been on your mind the most today?", "How have you been sleeping lately?"]
+
+def answer_tokens(body, count):
+    if body.get("response_format"):
+        # Schema-constrained request (follow-up questions)
+        return [json.dumps({"questions": QUESTIONS})]
+    count = min(count, body.get("max_tokens") or count)
+    pieces = [ANSWER_WORDS[i % len(ANSWER_WORDS)] + " " for i in range(count)]
+    if opens_think(body.get("model")):
+        pieces = [word + " " for word in REASONING_WORDS] + [THINK_CLOSE + "\n\n"] + pieces
+    return pieces
+
+def _chunk(model, text):
+    return "data: " + json.dumps({
+        "id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+        "choices": [{"index": 0, "delta": {"content": text}, "finish_reason": None}],
+    }) + "\n\n"
+
+def create_app(tokens=TOKENS, first_token_delay=FIRST_TOKEN_DELAY, token_delay=TOKEN_DELAY):
+    stats = {"requests": 0, "streams": 0, "active": 0, "peak_active": 0}
+
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats["requests"] += 1
+        pieces = answer_tokens(body, tokens)
+        model = body.get("model", "fake")
+
+        if not body.get("stream"):
+            stats["active"] += 1
+            stats["peak_active"] = max(stats["peak_active"], stats["active"])
+            try:
+                await asyncio.sleep(first_token_delay + token_delay * len(pieces))
+            finally:
+                stats["active"] -= 1
+            return JSONResponse({
+                "id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(pieces)}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(pieces), "total_tokens": len(pieces)},
+            })
+
+        async def events():
+            stats["streams"] += 1
+            stats["active"] += 1
+            stats["peak_active"] = max(stats["peak_active"], stats["active"])
+            try:
+                await asyncio.sleep(first_token_delay)
+                for piece in pieces:
+                    yield _chunk(model, piece)
+                    await asyncio.sleep(token_delay)
+                yield "data: [DONE]\n\n"
+            finally:
+                stats["active"] -= 1
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    async def models(request: Request):
+        return JSONResponse({"object": "list", "data": [{"id": "fake", "object": "model"}]})
+
+    async def server_stats(request: Request):
+        return JSONResponse(stats)
+
+    app = Starlette(routes=[
+        Route("/v1/chat/completions", chat_completions, methods=["POST"]),
+        Route("/v1/models", models),
+        Route("/stats", server_stats),
+    ])
+    app.state.stats = stats
+    return app
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Stand-in OpenAI-compatible server for load tests")
+    parser.add_argument("--port", type=int, default=1234)
+    parser.add_argument("--tokens", type=int, default=TOKENS)
+    parser.add_argument("--first-token-delay", type=float, default=FIRST_TOKEN_DELAY)
+    parser.add_argument("--token-delay", type=float, default=TOKEN_DELAY)
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.tokens, args.first_token_delay, args.token_delay),
+                host="127.0.0.1", port=args.port, log_level="warning")
@@ -0,0 +1,284 @@
+import argparse
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from html.parser import HTMLParser
+
+# Bulk ingestion of mental-health articles into the Chroma knowledge base that
+# RAG_MultiAgent_2 reads (./chroma_db, LangChain's default collection):
+#   walk files -> parse (worker processes) -> split into chunks -> embed in
+#   batches -> upsert in batches (on its own thread, overlapping the next embed)
+# Every stage is a generator with a bounded window, so memory does not grow with
+# the corpus. A file is recorded in the progress log once all its chunks are
+# stored; a rerun skips recorded files that have not changed since (and were
+# split with the same chunk size and overlap). Files are keyed by their real
+# path, so ./articles and /abs/path/to/articles name the same chunks.
+
+PERSIST_DIRECTORY = "./chroma_db"
+COLLECTION = "langchain"  # what Chroma(persist_directory=...) opens by default
+
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 50
+BATCH_SIZE = 256       # chunks per embedding call / upsert
+PARSE_WINDOW = 4       # parsed files in flight per worker
+UPSERT_QUEUE = 2       # embedded batches waiting for the upsert thread
+
+EXTENSIONS = (".txt", ".md", ".html", ".htm")
+
+# --- Stage 1: file walk ---
+
+def walk_files(root, extensions=EXTENSIONS):
+    """Real paths of the files under root with a known extension, in a stable order."""
+    for directory, subdirs, files in os.walk(os.path.realpath(root)):
+        subdirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(extensions):
+                yield os.path.join(directory, name)
+
+# --- Stage 2: parse ---
+
+class _TextExtractor(HTMLParser):
+    SKIP = {"script", "style", "nav", "header", "footer"}
+
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+        self._skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP:
+            self._skipping += 1
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP and self._skipping:
+            self._skipping -= 1
+        elif tag in ("p", "div", "li", "br", "h1", "h2", "h3", "h4", "tr"):
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self._skipping:
+            self.parts.append(data)
+
+def parse_file(path):
+    """(path, plain text); runs in a worker process."""
+    with open(path, encoding="utf-8", errors="replace") as f:
+        text = f.read()
+    if path.lower().endswith((".html", ".htm")):
+        extractor = _TextExtractor()
+        extractor.feed(text)
+        text = "".join(extractor.parts)
+    lines = (line.strip() for line in text.splitlines())
+    return path, "\n".join(line for line in lines if line)
+
+def parse_files(paths, workers):
+    """parse_file over paths in worker processes, in order, with at most workers * PARSE_WINDOW in flight."""
+    if workers <= 1:
+        yield from map(parse_file, paths)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for path in paths:
+            pending.append(pool.submit(parse_file, path))
+            if len(pending) >= workers * PARSE_WINDOW:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+# --- Stage 3: chunk ---
+
+def chunk_id(path, index) -> str:
+    return f"{hashlib.sha1(path.encode()).hexdigest()[:16]}-{index}"
+
+def split_documents(parsed, splitter):
+    """Yield (path, chunk count) markers after each file's chunks, and (id, text, metadata) chunks."""
+    for path, text in parsed:
+        chunks = splitter.split_text(text) if text else []
+        for index, chunk in enumerate(chunks):
+            yield chunk_id(path, index), chunk, {"source": path, "chunk": index}
+        yield path, len(chunks)
+
+# --- Progress log (resume) ---
+
+def splitter_settings(splitter):
+    """What else decides a file's chunks: the splitter's chunk size and overlap."""
+    return [getattr(splitter, "_chunk_size", None), getattr(splitter, "_chunk_overlap", None)]
+
+def file_signature(path, settings=()):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns, *settings]
+
+def load_progress(progress_path):
+    """
+    Real path -> {"path", "signature", "chunks"} for every file stored by an
+    earlier run. "path" is the path its chunk ids were made from, which logs
+    written before files were keyed by real path may spell differently.
+    """
+    progress = {}
+    try:
+        with open(progress_path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # a line cut short by an interruption
+                progress[os.path.realpath(entry["path"])] = entry
+    except OSError:
+        pass
+    return progress
+
+# --- Stages 4 and 5: embed and upsert ---
+
+class Ingestor:
+    """
+    Ingestor:
+      - Runs the pipeline over a directory into one collection.
+      - Skips files the progress log already has with the same size, mtime and
+        splitter settings; a changed file is re-chunked under the same ids, and
+        ids past its new chunk count (or, for a log entry under another spelling
+        of the path, all its old ids) are deleted.
+      - stats() reports files, chunks and chunks/sec.
+    """
+
+    def __init__(self, collection, embeddings, progress_path, splitter, batch_size=BATCH_SIZE, workers=None):
+        self.collection = collection
+        self.embeddings = embeddings
+        self.progress_path = progress_path
+        self.splitter = splitter
+        self.batch_size = batch_size
+        self.workers = workers or os.cpu_count() or 1
+        self.settings = splitter_settings(splitter)
+        self.progress = load_progress(progress_path)
+        self._signatures = {}  # signature taken when a file was queued, until it is stored
+        self.files = 0
+        self.skipped = 0
+        self.chunks = 0
+        self.seconds = 0.0
+
+    def _pending_files(self, root):
+        for path in walk_files(root):
+            signature = file_signature(path, self.settings)
+            entry = self.progress.get(path)
+            if entry and entry["signature"] == signature:
+                self.skipped += 1
+                continue
+            self._signatures[path] = signature
+            yield path
+
+    def _batches(self, root):
+        """Yield (chunk batch, files completed by the end of the batch)."""
+        batch, done = [], []
+        parsed = parse_files(self._pending_files(root), self.workers)
+        for item in split_documents(parsed, self.splitter):
+            if len(item) == 2:
+                done.append(item)
+                continue
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                yield batch, done
+                batch, done = [], []
+        if batch or done:
+            yield batch, done
+
+    def _store(self, batch, vectors, done, log):
+        if batch:
+            ids, texts, metadatas = zip(*batch)
+            self.collection.upsert(ids=list(ids), embeddings=vectors, documents=list(texts), metadatas=list(metadatas))
+        for path, count in done:
+            entry = self.progress.get(path, {})
+            previous, stored_as = entry.get("chunks", 0), entry.get("path", path)
+            stale = range(count if stored_as == path else 0, previous)
+            if stale:
+                self.collection.delete(ids=[chunk_id(stored_as, index) for index in stale])
+            entry = {"path": path, "signature": self._signatures.pop(path), "chunks": count}
+            self.progress[path] = entry
+            log.write(json.dumps(entry) + "\n")
+        log.flush()
+        self.files += len(done)
+        self.chunks += len(batch)
+
+    def run(self, root, report_every=10.0, report=print):
+        os.makedirs(os.path.dirname(self.progress_path) or ".", exist_ok=True)
+        start = time.perf_counter()
+        batches = queue.Queue(maxsize=UPSERT_QUEUE)
+        failure = []
+
+        def upserter():
+            with open(self.progress_path, "a") as log:
+                while (item := batches.get()) is not None:
+                    if failure:
+                        continue  # drain so the producer never blocks
+                    try:
+                        self._store(*item, log)
+                    except Exception as exc:
+                        failure.append(exc)
+
+        thread = threading.Thread(target=upserter, name="chroma-upsert", daemon=True)
+        thread.start()
+        last_report = start
+        try:
+            for batch, done in self._batches(root):
+                if failure:
+                    break
+                vectors = self.embeddings.embed_documents([text for _, text, _ in batch]) if batch else []
+                batches.put((batch, vectors, done))
+                if time.perf_counter() - last_report >= report_every:
+                    last_report = time.perf_counter()
+                    report(self._line(last_report - start))
+        finally:
+            batches.put(None)
+            thread.join()
+            self.seconds += time.perf_counter() - start
+        if failure:
+            raise failure[0]
+        report(self._line(self.seconds))
+        return self.stats()
+
+    def _line(self, seconds):
+        return (f"{self.files} files, {self.chunks} chunks in {seconds:.1f}s "
+                f"({self.chunks / seconds if seconds else 0.0:,.0f} chunks/s), {self.skipped} unchanged files skipped")
+
+    def stats(self) -> dict:
+        return {
+            "files": self.files,
+            "skipped": self.skipped,
+            "chunks": self.chunks,
+            "seconds": self.seconds,
+            "chunks_per_second": self.chunks / self.seconds if self.seconds else 0.0,
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest a directory of articles into the Chroma knowledge base")
+    parser.add_argument("root", help="directory of .txt / .md / .html articles")
+    parser.add_argument("--persist-directory", default=PERSIST_DIRECTORY)
+    parser.add_argument("--collection", default=COLLECTION)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--chunk-overlap", type=int, default=CHUNK_OVERLAP)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=None, help="parse processes (default: CPU count)")
+    args = parser.parse_args()
+
+    import chromadb
+    from langchain_huggingface import HuggingFaceEmbeddings
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    from embedding_cache import CachedEmbeddings
+    from semantic_cache import EMBEDDING_MODEL
+
+    client = chromadb.PersistentClient(path=args.persist_directory)
+    ingestor = Ingestor(
+        client.get_or_create_collection(args.collection),
+        CachedEmbeddings(HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)),
+        os.path.join(args.persist_directory, f"ingest_progress_{args.collection}.jsonl"),
+        RecursiveCharacterTextSplitter(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap),
+        batch_size=args.batch_size,
+        workers=args.workers,
+    )
+    ingestor.run(args.root)
+
+if __name__ == "__main__":
+    main()
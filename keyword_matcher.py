@@ -0,0 +1,93 @@
+from collections import deque
+
+class PhraseAutomaton:
+    """
+    Phrase Automaton (Aho-Corasick):
+      - Compiles every phrase into one trie with failure links, then folds the
+        failure links into the transitions, so search() reads each character of
+        the text exactly once with a single dict lookup.
+      - Each phrase carries an integer bitmask; search() returns the OR of the
+        masks of every phrase found anywhere in the text (plain substring
+        semantics, like `phrase in text`).
+    """
+
+    def __init__(self, phrases):
+        """phrases: mapping of phrase -> bitmask."""
+        goto = [{}]
+        out = [0]
+        for phrase, mask in phrases.items():
+            state = 0
+            for char in phrase:
+                nxt = goto[state].get(char)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto.append({})
+                    out.append(0)
+                    goto[state][char] = nxt
+                state = nxt
+            out[state] |= mask
+
+        # Breadth-first: a state's failure target is always resolved before it
+        fail = [0] * len(goto)
+        delta = [dict(edges) for edges in goto]
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            # Inherit the failure target's transitions that this state lacks
+            for char, target in delta[fail[state]].items():
+                delta[state].setdefault(char, target)
+            for char, nxt in goto[state].items():
+                fail[nxt] = delta[fail[state]].get(char, 0)
+                out[nxt] |= out[fail[nxt]]
+                queue.append(nxt)
+
+        self._delta = delta
+        self._out = out
+        self.states = len(goto)
+
+    def search(self, text: str) -> int:
+        delta, out = self._delta, self._out
+        state = found = 0
+        for char in text:
+            state = delta[state].get(char, 0)
+            found |= out[state]
+        return found
+
+class KeywordMatcher:
+    """
+    Keyword Matcher (compiled once per lexicon):
+      - Keywords with a space are phrases, matched as substrings of the text by
+        one PhraseAutomaton; all other keywords are words, matched against the
+        caller's (lemmatized) tokens through one hash lookup per token.
+      - Categories are bits, lowest bit = highest priority, so one pass yields
+        every matched category and the winner is the lowest set bit.
+    """
+
+    def __init__(self, category_keywords, priority=None):
+        """category_keywords: category -> keywords; priority: categories, most urgent first (default: dict order)."""
+        self.categories = tuple(priority or category_keywords)
+        phrases = {}
+        self.word_masks = {}
+        for bit, category in enumerate(self.categories):
+            mask = 1 << bit
+            for keyword in category_keywords[category]:
+                table = phrases if ' ' in keyword else self.word_masks
+                table[keyword] = table.get(keyword, 0) | mask
+        self.phrases = PhraseAutomaton(phrases)
+
+    def mask(self, text: str, words) -> int:
+        found = self.phrases.search(text)
+        word_masks = self.word_masks
+        for word in words:
+            found |= word_masks.get(word, 0)
+        return found
+
+    def match(self, text: str, words) -> list:
+        """Every category matched by text (phrases) or words, in priority order."""
+        found = self.mask(text, words)
+        return [category for bit, category in enumerate(self.categories) if found >> bit & 1]
+
+    def classify(self, text: str, words):
+        """The highest-priority matched category, or None."""
+        found = self.mask(text, words)
+        return self.categories[(found & -found).bit_length() - 1] if found else None
@@ -0,0 +1,156 @@
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import time
+
+# Versioned keyword lexicon for workflow_1: WordNet expands the seeds once, offline
+# (python lexicon.py), into a pickled artifact; importing workflow_1 only unpickles
+# it. The artifact records a hash of the seeds and enhancements, so it is rebuilt
+# only when they (or LEXICON_VERSION) change.
+
+# Bump when the expansion or the artifact layout changes
+LEXICON_VERSION = 1
+
+LEXICON_PATH = os.environ.get("LEXICON_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "lexicon.pkl"))
+
+# Seed words with multi-word support
+CATEGORY_SEEDS = {
+    "crisis_intervention": ["suicide", "self-harm"],
+    "anxiety_support": ["anxiety", "panic attack"],
+    "depression_support": ["depression", "hopelessness"]
+}
+
+# Manual enhancements
+CATEGORY_ENHANCEMENTS = {
+    "crisis_intervention": [
+        "kill myself", "end it all", "suicidal", "self harm",
+        "kill", "myself", "die", "want to die", "cutting"
+    ],
+    "anxiety_support": [
+        "stressed", "worried", "overwhelmed", "nervous",
+        "panic", "racing thoughts", "anxious"
+    ],
+    "depression_support": [
+        "sad", "empty", "numb", "lonely", "can't go on",
+        "worthless", "depressed"
+    ],
+}
+
+def seed_hash(seeds=CATEGORY_SEEDS, enhancements=CATEGORY_ENHANCEMENTS) -> str:
+    payload = json.dumps({"version": LEXICON_VERSION, "seeds": seeds, "enhancements": enhancements}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def _wordnet():
+    """WordNet and a lemmatizer, downloading the corpus only if it is not installed yet."""
+    import nltk
+    from nltk.corpus import wordnet
+    from nltk.stem import WordNetLemmatizer
+
+    try:
+        nltk.data.find("corpora/wordnet")
+    except LookupError:
+        nltk.download("wordnet")
+    return wordnet, WordNetLemmatizer()
+
+def build_lexicon(seeds=CATEGORY_SEEDS, enhancements=CATEGORY_ENHANCEMENTS):
+    """Expand the seeds through WordNet: (category -> sorted keywords, all keywords)."""
+    wordnet, lemmatizer = _wordnet()
+
+    # Enhanced synonym generator with phrase support
+    def get_synonyms(word):
+        synonyms = set()
+        for syn in wordnet.synsets(word):
+            for lemma in syn.lemmas():
+                synonym = lemma.name().lower().replace('_', ' ')
+                synonyms.add(synonym)
+        return list(synonyms)
+
+    category_keywords = {}
+    all_keywords = set()
+    for category, category_seeds in seeds.items():
+        keywords = []
+        for seed in category_seeds:
+            # Get synonyms and add as both phrases and individual words
+            keywords.extend(get_synonyms(seed))
+
+            # Split multi-word seeds into components
+            if ' ' in seed:
+                keywords.extend(seed.split())
+
+        keywords += enhancements.get(category, [])
+
+        # Normalize and deduplicate
+        normalized_keywords = set()
+        for kw in keywords:
+            # Handle multi-word phrases
+            if ' ' in kw:
+                normalized_keywords.add(kw)
+            # Add lemmatized versions for single words
+            else:
+                normalized_keywords.add(kw)  # Keep original word
+                normalized_keywords.add(lemmatizer.lemmatize(kw, pos='v'))  # Verb form
+                normalized_keywords.add(lemmatizer.lemmatize(kw, pos='n'))  # Noun form
+
+        category_keywords[category] = sorted(normalized_keywords)
+        all_keywords.update(normalized_keywords)
+    return category_keywords, all_keywords
+
+def save_lexicon(category_keywords, all_keywords, path=LEXICON_PATH, digest=None):
+    artifact = {
+        "version": LEXICON_VERSION,
+        "seed_hash": digest or seed_hash(),
+        "category_keywords": category_keywords,
+        "all_keywords": frozenset(all_keywords),
+    }
+    # Write then rename, so a concurrent reader never sees half an artifact
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(artifact, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+def read_lexicon(path=LEXICON_PATH, digest=None):
+    """The artifact's (category_keywords, all_keywords), or None if it is missing or stale."""
+    try:
+        with open(path, "rb") as f:
+            artifact = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+    if artifact.get("version") != LEXICON_VERSION or artifact.get("seed_hash") != (digest or seed_hash()):
+        return None
+    return artifact["category_keywords"], artifact["all_keywords"]
+
+def load_lexicon(seeds=CATEGORY_SEEDS, enhancements=CATEGORY_ENHANCEMENTS, path=LEXICON_PATH):
+    """
+    (category_keywords, all_keywords) from the artifact; expands the seeds
+    through WordNet and rewrites the artifact only when it is missing or stale.
+    """
+    digest = seed_hash(seeds, enhancements)
+    lexicon = read_lexicon(path, digest)
+    if lexicon is None:
+        lexicon = build_lexicon(seeds, enhancements)
+        save_lexicon(*lexicon, path=path, digest=digest)
+    return lexicon
+
+def main():
+    parser = argparse.ArgumentParser(description="Build workflow_1's keyword lexicon artifact")
+    parser.add_argument("--path", default=LEXICON_PATH)
+    parser.add_argument("--force", action="store_true", help="rebuild even if the artifact is current")
+    args = parser.parse_args()
+
+    if args.force or read_lexicon(args.path) is None:
+        start = time.perf_counter()
+        category_keywords, all_keywords = build_lexicon()
+        save_lexicon(category_keywords, all_keywords, path=args.path)
+        print(f"built {args.path} in {time.perf_counter() - start:.2f}s (WordNet expansion)")
+    else:
+        print(f"{args.path} is current")
+
+    start = time.perf_counter()
+    category_keywords, all_keywords = read_lexicon(args.path)
+    print(f"cold load: {(time.perf_counter() - start) * 1000:.2f} ms, {len(all_keywords)} keywords, "
+          f"{os.path.getsize(args.path)} bytes, seed hash {seed_hash()[:12]}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+import asyncio
+import os
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+
+import httpx
+from openai import OpenAI, AsyncOpenAI
+
+from context_window import ContextWindow, count_tokens
+from llm_streaming import (
+    STREAM_STATS,
+    StreamResult,
+    acollect_chat_completion,
+    aprint_chat_completion,
+    collect_chat_completion,
+    print_chat_completion,
+)
+from reasoning import NODE_TOKEN_BUDGETS, reasoning_traces
+from response_cache import ResponseCache
+
+# --- Gateway Settings (override with environment variables) ---
+BASE_URL = os.environ.get("LLM_BASE_URL", "http://localhost:1234/v1")
+API_KEY = os.environ.get("LLM_API_KEY", "not-needed")
+
+# The two local models served by LM Studio
+LARGE_MODEL = os.environ.get("LLM_LARGE_MODEL", "deepseek-r1-distill-qwen-7b")
+SMALL_MODEL = os.environ.get("LLM_SMALL_MODEL", "llama-3.2-1b-instruct")
+
+# How many requests may be in flight per model at once; LM Studio queues the rest
+# on its side anyway, so going higher only adds memory pressure and latency.
+MODEL_CONCURRENCY = {
+    LARGE_MODEL: int(os.environ.get("LLM_LARGE_CONCURRENCY", 2)),
+    SMALL_MODEL: int(os.environ.get("LLM_SMALL_CONCURRENCY", 4)),
+}
+DEFAULT_CONCURRENCY = 4
+
+# Context length each model is loaded with in LM Studio (set these to match its
+# "Context Length" setting). A prompt gets what is left after the longest answer
+# a node may request (max_tokens in reasoning.NODE_TOKEN_BUDGETS, which for the
+# 7B model includes its <think> span).
+MODEL_CONTEXT = {
+    LARGE_MODEL: int(os.environ.get("LLM_LARGE_CONTEXT", 4096)),
+    SMALL_MODEL: int(os.environ.get("LLM_SMALL_CONTEXT", 4096)),
+}
+ANSWER_RESERVE = max(budget["max_tokens"] for budget in NODE_TOKEN_BUDGETS.values())
+MODEL_BUDGETS = {model: context - ANSWER_RESERVE for model, context in MODEL_CONTEXT.items()}
+
+# Keep-alive pool shared by every call, so sessions reuse warm connections
+POOL_LIMITS = httpx.Limits(max_connections=32, max_keepalive_connections=16, keepalive_expiry=120.0)
+
+# Local generation is slow; the read timeout covers a whole non-streamed answer
+DEFAULT_TIMEOUT = httpx.Timeout(120.0, connect=5.0)
+
+# Weight of the newest call in the smoothed latencies the router reads
+LATENCY_SMOOTHING = 0.3
+
+# Nodes whose calls are served from the response cache (opt-in, e.g. "analysis,support")
+CACHED_NODES = {n.strip() for n in os.environ.get("LLM_CACHE_NODES", "").split(",") if n.strip()}
+
+# Seed pinned on a cached node's calls that leave temperature at the server's
+# (sampled) default, so a cached answer is one the server would give again.
+# Calls with an explicit temperature > 0 and no seed are never cached.
+CACHE_SEED = int(os.environ.get("LLM_CACHE_SEED", 0))
+
+class LLMGateway:
+    """
+    LLM Gateway:
+      - Owns one pooled sync OpenAI-compatible client, and one pooled async
+        client per event loop (an httpx pool cannot be shared between loops).
+      - Caps concurrent requests per model so many sessions cannot overload the server.
+      - Applies a per-call timeout (default DEFAULT_TIMEOUT).
+      - Serves calls from nodes in cached_nodes through a ResponseCache (only
+        deterministic ones: temperature 0 or a fixed seed; see CACHE_SEED). The
+        async calls read and write it on a worker thread, off the event loop.
+      - Fits every prompt into the model's token budget with a ContextWindow.
+      - Strips <think> reasoning from answers into reasoning_traces and applies
+        the node's max_tokens / reasoning budget (NODE_TOKEN_BUDGETS).
+    """
+
+    def __init__(self, base_url=BASE_URL, api_key=API_KEY, limits=POOL_LIMITS,
+                 timeout=DEFAULT_TIMEOUT, model_concurrency=None, cached_nodes=None, response_cache=None,
+                 context_window=None, node_budgets=None):
+        self.timeout = timeout
+        self.node_budgets = dict(NODE_TOKEN_BUDGETS if node_budgets is None else node_budgets)
+        self.context_window = context_window or ContextWindow(MODEL_BUDGETS)
+        self.cached_nodes = set(CACHED_NODES if cached_nodes is None else cached_nodes)
+        self._response_cache = response_cache
+        self.model_concurrency = dict(MODEL_CONCURRENCY if model_concurrency is None else model_concurrency)
+        self.base_url = base_url
+        self.api_key = api_key
+        self.limits = limits
+        self.client = OpenAI(
+            base_url=base_url,
+            api_key=api_key,
+            timeout=timeout,
+            http_client=httpx.Client(limits=limits, timeout=timeout),
+        )
+        self._lock = threading.Lock()
+        self._sync_slots = {}
+        # event loop -> (async client, model -> semaphore); keyed by the loop itself
+        self._loops = weakref.WeakKeyDictionary()
+        self.in_flight = {}   # model -> requests holding a slot
+        self.queued = {}      # model -> requests waiting for a slot
+        self.latency = {}     # model -> smoothed decode seconds per generated token (prefill excluded)
+        self.prefill = {}     # model -> smoothed seconds until the first streamed token
+        self.observed_at = {} # model -> time.monotonic() of the last observe()
+
+    def _concurrency(self, model):
+        return self.model_concurrency.get(model, DEFAULT_CONCURRENCY)
+
+    def _track(self, model, delta, counter=None):
+        counter = self.in_flight if counter is None else counter
+        with self._lock:
+            counter[model] = counter.get(model, 0) + delta
+
+    @staticmethod
+    def _smooth(table, model, value):
+        previous = table.get(model)
+        table[model] = value if previous is None else previous + LATENCY_SMOOTHING * (value - previous)
+
+    def observe(self, model, prefill_seconds, decode_seconds, tokens):
+        """Fold one call into the model's smoothed prefill time and decode seconds-per-token."""
+        with self._lock:
+            self._smooth(self.prefill, model, prefill_seconds)
+            self._smooth(self.latency, model, decode_seconds / max(1, tokens))
+            self.observed_at[model] = time.monotonic()
+
+    @contextmanager
+    def slot(self, model):
+        """Hold one of the model's concurrency slots for the duration of a call."""
+        with self._lock:
+            semaphore = self._sync_slots.get(model)
+            if semaphore is None:
+                semaphore = self._sync_slots[model] = threading.BoundedSemaphore(self._concurrency(model))
+        self._track(model, 1, self.queued)
+        try:
+            semaphore.acquire()
+        finally:
+            self._track(model, -1, self.queued)
+        self._track(model, 1)
+        try:
+            yield
+        finally:
+            self._track(model, -1)
+            semaphore.release()
+
+    def _loop_state(self):
+        """The running loop's async client and semaphores, created on its first call."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            state = self._loops.get(loop)
+            if state is None:
+                # Loops closed since (every asyncio.run ends with one) are dropped here:
+                # their semaphores hold a reference to the loop, so it is never collected
+                for closed in [other for other in self._loops if other.is_closed()]:
+                    del self._loops[closed]
+                aclient = AsyncOpenAI(
+                    base_url=self.base_url,
+                    api_key=self.api_key,
+                    timeout=self.timeout,
+                    http_client=httpx.AsyncClient(limits=self.limits, timeout=self.timeout),
+                )
+                state = self._loops[loop] = (aclient, {})
+        return state
+
+    @property
+    def aclient(self):
+        """The async client of the running event loop."""
+        return self._loop_state()[0]
+
+    @asynccontextmanager
+    async def aslot(self, model):
+        """Async variant of slot(); semaphores are kept per event loop."""
+        semaphores = self._loop_state()[1]
+        with self._lock:
+            semaphore = semaphores.get(model)
+            if semaphore is None:
+                semaphore = semaphores[model] = asyncio.Semaphore(self._concurrency(model))
+        self._track(model, 1, self.queued)
+        try:
+            await semaphore.acquire()
+        finally:
+            self._track(model, -1, self.queued)
+        self._track(model, 1)
+        try:
+            yield
+        finally:
+            self._track(model, -1)
+            semaphore.release()
+
+    @property
+    def response_cache(self):
+        # Opened on first use so scripts without cached nodes never touch the disk
+        if self._response_cache is None:
+            self._response_cache = ResponseCache()
+        return self._response_cache
+
+    def _cache_for(self, node, params):
+        """(cache or None, params); a cached node's sampled calls get CACHE_SEED."""
+        if node is None or node not in self.cached_nodes:
+            return None, params
+        if "seed" not in params and params.get("temperature") is None:
+            params = {**params, "seed": CACHE_SEED}
+        if params.get("temperature") != 0 and params.get("seed") is None:
+            return None, params  # sampled without a fixed seed: every answer may differ
+        return self.response_cache, params
+
+    def _cached_stream_result(self, model, content, prefix, start, write=None):
+        if write is None:
+            print(prefix, end="")
+            print(content)
+        else:
+            write(prefix + content + "\n")
+        elapsed = time.perf_counter() - start
+        result = StreamResult(content, model, elapsed, elapsed, streamed=False)
+        STREAM_STATS.append(result)
+        return result
+
+    def _client(self, timeout):
+        return self.client if timeout is None else self.client.with_options(timeout=timeout)
+
+    def _aclient(self, timeout):
+        return self.aclient if timeout is None else self.aclient.with_options(timeout=timeout)
+
+    def _budget(self, node, params):
+        """Apply the node's max_tokens default; return (params, reasoning budget)."""
+        budget = self.node_budgets.get(node, {})
+        if "max_tokens" in budget:
+            params = {"max_tokens": budget["max_tokens"], **params}
+        return params, budget.get("reasoning_tokens")
+
+    def _record(self, node, result):
+        # A non-streamed call cannot be split; assume the usual prefill for the model
+        prefill = result.prefill_time if result.prefill_time is not None else self.prefill.get(result.model, 0.0)
+        tokens = count_tokens(result.content) + count_tokens(result.reasoning)
+        self.observe(result.model, prefill, max(0.0, result.total_time - prefill), tokens)
+        reasoning_traces.add(node, result.model, result.reasoning, truncated=result.reasoning_truncated)
+
+    def chat(self, model, messages, timeout=None, node=None, **params) -> str:
+        """Return the assistant answer (reasoning stripped) for one chat completion."""
+        messages = self.context_window.fit(messages, model)
+        params, reasoning_budget = self._budget(node, params)
+        cache, params = self._cache_for(node, params)
+        if cache is not None:
+            cached = cache.get(model, messages, params)
+            if cached is not None:
+                return cached
+
+        with self.slot(model):
+            result = collect_chat_completion(
+                self._client(timeout), model, messages, reasoning_budget=reasoning_budget, **params
+            )
+        self._record(node, result)
+
+        if cache is not None:
+            cache.put(model, messages, result.content, params)
+        return result.content
+
+    def stream(self, model, messages, prefix="", stream=True, timeout=None, node=None, write=None, **params):
+        """Print a completion to the console as it streams (see print_chat_completion)."""
+        start = time.perf_counter()
+        messages = self.context_window.fit(messages, model)
+        params, reasoning_budget = self._budget(node, params)
+        cache, params = self._cache_for(node, params)
+        if cache is not None:
+            cached = cache.get(model, messages, params)
+            if cached is not None:
+                return self._cached_stream_result(model, cached, prefix, start, write)
+
+        with self.slot(model):
+            result = print_chat_completion(
+                self._client(timeout), model, messages, prefix=prefix, stream=stream,
+                write=write, reasoning_budget=reasoning_budget, **params
+            )
+        self._record(node, result)
+
+        if cache is not None:
+            cache.put(model, messages, result.content, params)
+        return result
+
+    async def achat(self, model, messages, timeout=None, node=None, **params) -> str:
+        """Async variant of chat()."""
+        messages = self.context_window.fit(messages, model)
+        params, reasoning_budget = self._budget(node, params)
+        cache, params = self._cache_for(node, params)
+        if cache is not None:
+            cached = await asyncio.to_thread(cache.get, model, messages, params)
+            if cached is not None:
+                return cached
+
+        async with self.aslot(model):
+            result = await acollect_chat_completion(
+                self._aclient(timeout), model, messages, reasoning_budget=reasoning_budget, **params
+            )
+        self._record(node, result)
+
+        if cache is not None:
+            await asyncio.to_thread(cache.put, model, messages, result.content, params)
+        return result.content
+
+    async def astream(self, model, messages, prefix="", stream=True, timeout=None, node=None, write=None, **params):
+        """Async variant of stream()."""
+        start = time.perf_counter()
+        messages = self.context_window.fit(messages, model)
+        params, reasoning_budget = self._budget(node, params)
+        cache, params = self._cache_for(node, params)
+        if cache is not None:
+            cached = await asyncio.to_thread(cache.get, model, messages, params)
+            if cached is not None:
+                return self._cached_stream_result(model, cached, prefix, start, write)
+
+        async with self.aslot(model):
+            result = await aprint_chat_completion(
+                self._aclient(timeout), model, messages, prefix=prefix, stream=stream,
+                write=write, reasoning_budget=reasoning_budget, **params
+            )
+        self._record(node, result)
+
+        if cache is not None:
+            await asyncio.to_thread(cache.put, model, messages, result.content, params)
+        return result
+
+# Shared gateway used by every agent
+gateway = LLMGateway()
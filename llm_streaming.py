@@ -0,0 +1,212 @@
+import time
+from collections import deque
+from dataclasses import dataclass
+
+from reasoning import THINK_CLOSE, THINK_OPEN, ThinkFilter, opens_think
+
+# Timing for the most recent completions printed through this module (newest
+# last); bounded so a long-running service does not keep every call
+STREAM_STATS_SIZE = 1000
+STREAM_STATS = deque(maxlen=STREAM_STATS_SIZE)
+
+@dataclass
+class StreamResult:
+    content: str
+    model: str
+    time_to_first_token: float  # seconds until the first visible answer token arrived
+    total_time: float           # seconds until the stream ended
+    prefill_time: float = None  # seconds until the first streamed chunk (reasoning included); None if not streamed
+    streamed: bool = True
+    reasoning: str = ""         # <think> span, kept out of content
+    reasoning_truncated: bool = False
+
+# Plain instruction for servers that start a new reply instead of continuing a
+# trailing assistant message (LM Studio among them), where the template opens a
+# fresh <think> block
+ANSWER_NOW = ("Your reasoning so far:\n{reasoning}\n\n"
+              "Answer now, based on it. Do not reason any further and do not write a <think> section.")
+
+def _forced_answer_messages(messages, reasoning):
+    # Close the think block for the model and ask it to continue with the answer
+    return messages + [{"role": "assistant", "content": f"{THINK_OPEN}\n{reasoning}\n{THINK_CLOSE}\n\n"}]
+
+def _answer_now_messages(messages, reasoning):
+    return messages + [{"role": "user", "content": ANSWER_NOW.format(reasoning=reasoning)}]
+
+# Tried in order once the reasoning budget is spent; each with a budget of 0.
+# The flag says whether the reply starts a new assistant turn, which a model
+# that opens_think() begins inside a think block (a continuation does not).
+FORCED_ANSWER_PROMPTS = ((_forced_answer_messages, False), (_answer_now_messages, True))
+
+def _print_token(token):
+    print(token, end="", flush=True)
+
+def _stream_completion(client, model, messages, on_token, reasoning_budget, params, implicit_open=False):
+    """
+    One streamed call; returns (ThinkFilter, first answer token time, first
+    chunk time, whether the budget was hit).
+    """
+    think = ThinkFilter(implicit_open)
+    first_token_at = first_chunk_at = None
+    truncated = False
+    response = client.chat.completions.create(model=model, messages=messages, stream=True, **params)
+    for chunk in response:
+        if not chunk.choices:
+            continue
+        if first_chunk_at is None:
+            first_chunk_at = time.perf_counter()
+        text = think.feed(chunk.choices[0].delta.content or "")
+        if text:
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+            if on_token:
+                on_token(text)
+        if reasoning_budget is not None and think.in_think and think.reasoning_tokens > reasoning_budget:
+            truncated = True
+            response.close()
+            break
+    text = think.flush(complete=not truncated)
+    if text and on_token:
+        on_token(text)
+    return think, first_token_at, first_chunk_at, truncated
+
+def collect_chat_completion(client, model, messages, on_token=None, stream=True, reasoning_budget=None, **params) -> StreamResult:
+    """
+    Completion Collector:
+      - Streams a chat completion and strips <think> spans as they arrive.
+      - Calls on_token with each visible answer token.
+      - Stops the reasoning once it passes reasoning_budget tokens and asks the
+        model to answer from what it has thought so far, first by continuing the
+        closed think block, then (if it starts thinking again) with a plain
+        instruction. Neither retry may reason; a second overrun ends the call.
+    """
+    start = time.perf_counter()
+
+    if not stream:
+        think = ThinkFilter(opens_think(model))
+        response = client.chat.completions.create(model=model, messages=messages, **params)
+        text = think.feed(response.choices[0].message.content or "") + think.flush()
+        if on_token and text:
+            on_token(text)
+        elapsed = time.perf_counter() - start
+        return StreamResult(think.visible, model, elapsed, elapsed, streamed=False, reasoning=think.reasoning)
+
+    think, first_token_at, first_chunk_at, truncated = _stream_completion(
+        client, model, messages, on_token, reasoning_budget, params, opens_think(model)
+    )
+    content = think.visible
+    if truncated:
+        for prompt, new_turn in FORCED_ANSWER_PROMPTS:
+            forced, forced_first, _, overrun = _stream_completion(
+                client, model, prompt(messages, think.reasoning), on_token, 0, params, new_turn and opens_think(model)
+            )
+            content = forced.visible
+            first_token_at = first_token_at or forced_first
+            if not overrun:
+                break
+
+    end = time.perf_counter()
+    return StreamResult(
+        content=content,
+        model=model,
+        time_to_first_token=(first_token_at or end) - start,
+        total_time=end - start,
+        prefill_time=(first_chunk_at or end) - start,
+        reasoning=think.reasoning,
+        reasoning_truncated=truncated,
+    )
+
+def print_chat_completion(client, model, messages, prefix="", stream=True, write=None, **params) -> StreamResult:
+    """
+    Console Completion:
+      - Prints the prefix, then the assistant's tokens as they arrive from the server.
+      - Records time-to-first-token and total time in STREAM_STATS (last
+        STREAM_STATS_SIZE calls).
+      - Returns the full assistant message once the stream ends, so the caller
+        can append it to the conversation history.
+      - With stream=False the whole completion is awaited and printed at once.
+      - write replaces the console (e.g. a session's turn adapter).
+    """
+    write = write or _print_token
+    write(prefix)
+    result = collect_chat_completion(client, model, messages, on_token=write, stream=stream, **params)
+    write("\n")
+    STREAM_STATS.append(result)
+    return result
+
+async def _astream_completion(aclient, model, messages, on_token, reasoning_budget, params, implicit_open=False):
+    """Async variant of _stream_completion."""
+    think = ThinkFilter(implicit_open)
+    first_token_at = first_chunk_at = None
+    truncated = False
+    response = await aclient.chat.completions.create(model=model, messages=messages, stream=True, **params)
+    async for chunk in response:
+        if not chunk.choices:
+            continue
+        if first_chunk_at is None:
+            first_chunk_at = time.perf_counter()
+        text = think.feed(chunk.choices[0].delta.content or "")
+        if text:
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+            if on_token:
+                on_token(text)
+        if reasoning_budget is not None and think.in_think and think.reasoning_tokens > reasoning_budget:
+            truncated = True
+            await response.close()
+            break
+    text = think.flush(complete=not truncated)
+    if text and on_token:
+        on_token(text)
+    return think, first_token_at, first_chunk_at, truncated
+
+async def acollect_chat_completion(aclient, model, messages, on_token=None, stream=True, reasoning_budget=None, **params) -> StreamResult:
+    """Async variant of collect_chat_completion for an AsyncOpenAI client."""
+    start = time.perf_counter()
+
+    if not stream:
+        think = ThinkFilter(opens_think(model))
+        response = await aclient.chat.completions.create(model=model, messages=messages, **params)
+        text = think.feed(response.choices[0].message.content or "") + think.flush()
+        if on_token and text:
+            on_token(text)
+        elapsed = time.perf_counter() - start
+        return StreamResult(think.visible, model, elapsed, elapsed, streamed=False, reasoning=think.reasoning)
+
+    think, first_token_at, first_chunk_at, truncated = await _astream_completion(
+        aclient, model, messages, on_token, reasoning_budget, params, opens_think(model)
+    )
+    content = think.visible
+    if truncated:
+        for prompt, new_turn in FORCED_ANSWER_PROMPTS:
+            forced, forced_first, _, overrun = await _astream_completion(
+                aclient, model, prompt(messages, think.reasoning), on_token, 0, params, new_turn and opens_think(model)
+            )
+            content = forced.visible
+            first_token_at = first_token_at or forced_first
+            if not overrun:
+                break
+
+    end = time.perf_counter()
+    return StreamResult(
+        content=content,
+        model=model,
+        time_to_first_token=(first_token_at or end) - start,
+        total_time=end - start,
+        prefill_time=(first_chunk_at or end) - start,
+        reasoning=think.reasoning,
+        reasoning_truncated=truncated,
+    )
+
+async def aprint_chat_completion(aclient, model, messages, prefix="", stream=True, write=None, **params) -> StreamResult:
+    """
+    Async Console Completion:
+      - Same as print_chat_completion, but for an AsyncOpenAI client, so the
+        event loop can serve other sessions while this one waits on the model.
+    """
+    write = write or _print_token
+    write(prefix)
+    result = await acollect_chat_completion(aclient, model, messages, on_token=write, stream=stream, **params)
+    write("\n")
+    STREAM_STATS.append(result)
+    return result
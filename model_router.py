@@ -0,0 +1,85 @@
+import os
+import threading
+import time
+
+from llm_gateway import gateway, LARGE_MODEL, SMALL_MODEL
+
+# Which model each task prefers, roughly how many tokens it generates, and how
+# long (seconds) it may take before the router moves it to the small model.
+# The small model is always the fallback.
+ROUTES = {
+    "questions": {"model": SMALL_MODEL, "expected_tokens": 80, "target_latency": 5.0},
+    "conclusion": {"model": LARGE_MODEL, "expected_tokens": 700, "target_latency": 45.0},
+    "support": {"model": LARGE_MODEL, "expected_tokens": 500, "target_latency": 30.0},
+}
+
+# A model counts as saturated once this many requests per slot are waiting
+SATURATION_QUEUE_PER_SLOT = 2
+
+# A model skipped for being slow gets no traffic, so its latency estimate would
+# never recover; once it has gone this long (seconds) without a measurement, one
+# call is sent to it anyway to measure it again
+PROBE_INTERVAL = float(os.environ.get("LLM_ROUTER_PROBE_INTERVAL", 60.0))
+
+class ModelRouter:
+    """
+    Model Router:
+      - Sends each task to its preferred model (cheap tasks to the 1B model,
+        conclusions to the 7B model).
+      - Estimates the wait from the gateway's live prefill time, decode rate
+        and queue depth.
+      - Falls back to the small model when the preferred one would miss the
+        task's latency target or is saturated.
+      - Lets one probe call through to a model skipped for latency once its
+        estimate is PROBE_INTERVAL seconds old, so the estimate can recover.
+    """
+
+    def __init__(self, gateway, routes=None, fallback=SMALL_MODEL, probe_interval=PROBE_INTERVAL):
+        self.gateway = gateway
+        self.routes = {task: dict(route) for task, route in (routes or ROUTES).items()}
+        self.fallback = fallback
+        self.probe_interval = probe_interval
+        self.decisions = {}  # (task, model) -> count
+        self.probes = {}     # model -> time.monotonic() of the last probe
+        self._lock = threading.Lock()
+
+    def estimated_latency(self, model, expected_tokens):
+        """Expected seconds for a new call: prefill plus decode time, scaled by the queue ahead of it."""
+        per_token = self.gateway.latency.get(model)
+        if per_token is None:
+            return 0.0  # no measurements yet; assume it is fine
+        slots = self.gateway.model_concurrency.get(model, 1)
+        busy = self.gateway.in_flight.get(model, 0) + self.gateway.queued.get(model, 0)
+        generation = self.gateway.prefill.get(model, 0.0) + per_token * expected_tokens
+        return generation * (1 + max(0, busy - slots + 1) / slots)
+
+    def _probe(self, model):
+        """True (and the probe clock restarted) if a slow model is due a measuring call."""
+        now = time.monotonic()
+        with self._lock:
+            last = max(self.gateway.observed_at.get(model, now), self.probes.get(model, 0.0))
+            if now - last < self.probe_interval:
+                return False
+            self.probes[model] = now
+            return True
+
+    def saturated(self, model):
+        slots = self.gateway.model_concurrency.get(model, 1)
+        return self.gateway.queued.get(model, 0) >= SATURATION_QUEUE_PER_SLOT * slots
+
+    def route(self, task):
+        """Return the model to use for task."""
+        route = self.routes.get(task, {"model": self.fallback})
+        model = route["model"]
+        target = route.get("target_latency")
+        if model != self.fallback:
+            if self.saturated(model):
+                model = self.fallback
+            elif (target is not None and self.estimated_latency(model, route.get("expected_tokens", 1)) > target
+                  and not self._probe(model)):
+                model = self.fallback
+        self.decisions[(task, model)] = self.decisions.get((task, model), 0) + 1
+        return model
+
+# Shared router over the shared gateway
+router = ModelRouter(gateway)
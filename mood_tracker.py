@@ -0,0 +1,84 @@
+EMOTIONS = ("anxious", "depressed", "suicidal", "happy", "stressed", "overwhelmed")
+
+# Emotions that decide the mood as soon as they are mentioned once, however
+# long ago (the counselor route must never be decayed away)
+CRITICAL = ("suicidal",)
+
+# Weight kept by older scores at every new user message
+RECENCY_DECAY = 0.8
+
+class MoodTracker:
+    """
+    Mood Tracker (one per session):
+      - update(messages) reads only the messages it has not seen yet, so each
+        message is processed exactly once however often it is called.
+      - Keeps a recency-weighted score per emotion and the message each
+        emotion was first mentioned in; mood() and first_mood() are O(1) reads.
+      - dump()/load() turn it into a small plain dict that can live in graph
+        state (no message text, so checkpoints do not grow with the conversation).
+    """
+
+    def __init__(self, emotions=EMOTIONS, decay=RECENCY_DECAY):
+        self.emotions = tuple(emotions)
+        self.decay = decay
+        self.scores = dict.fromkeys(self.emotions, 0.0)
+        self.seen = 0        # messages processed so far
+        self.first_seen = {}  # emotion -> index of the message that first mentioned it
+
+    def observe(self, text: str, index: int):
+        """Score one user message, the index-th of the conversation."""
+        lowered = text.lower()
+        for emotion in self.emotions:
+            mentioned = emotion in lowered
+            self.scores[emotion] = self.scores[emotion] * self.decay + mentioned
+            if mentioned:
+                self.first_seen.setdefault(emotion, index)
+
+    def update(self, messages):
+        """Process the messages appended since the last call."""
+        for index in range(self.seen, len(messages)):
+            if messages[index]["role"] == "user":
+                self.observe(messages[index]["content"], index)
+        self.seen = max(self.seen, len(messages))
+        return self
+
+    def mood(self, candidates=None):
+        """
+        The current mood among candidates (default: all emotions): a critical
+        emotion if one was ever mentioned, otherwise the highest recency-weighted
+        score (ties go to the earlier emotion). None when nothing was mentioned.
+        """
+        candidates = candidates or self.emotions
+        for emotion in CRITICAL:
+            if emotion in candidates and self.scores.get(emotion):
+                return emotion
+        best = max(candidates, key=lambda emotion: self.scores.get(emotion, 0.0))
+        return best if self.scores.get(best) else None
+
+    def first_mood(self, candidates=None):
+        """
+        The emotion of the earliest user message that mentions any candidate
+        (several in that message: the earlier candidate). None when nothing was mentioned.
+        """
+        candidates = candidates or self.emotions
+        mentioned = [emotion for emotion in candidates if emotion in self.first_seen]
+        if not mentioned:
+            return None
+        earliest = min(self.first_seen[emotion] for emotion in mentioned)
+        return next(emotion for emotion in mentioned if self.first_seen[emotion] == earliest)
+
+    def dump(self) -> dict:
+        return {"scores": dict(self.scores), "seen": self.seen, "first_seen": dict(self.first_seen)}
+
+    @classmethod
+    def load(cls, data=None, **kwargs):
+        tracker = cls(**kwargs)
+        if data:
+            tracker.scores.update(data["scores"])
+            tracker.seen = data["seen"]
+            tracker.first_seen.update(data.get("first_seen", {}))
+        return tracker
+
+def user_text(messages) -> str:
+    """The user's messages, space-joined (the retrieval query)."""
+    return " ".join(msg["content"] for msg in messages if msg["role"] == "user")
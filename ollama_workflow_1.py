@@ -1,6 +1,7 @@
-from openai import OpenAI
+from llm_gateway import gateway, SMALL_MODEL
 
-client = OpenAI(base_url="http://localhost:1234/v1", api_key="not-needed")
+# Print the AI's reply token by token as it is generated
+STREAM_RESPONSES = True
 
 # Store conversation history
 messages = []
@@ -18,13 +19,13 @@ while True:
     messages.append({"role": "user", "content": user_message})
 
     # Get AI response
-    response = client.chat.completions.create(
-        model="llama-3.2-1b-instruct",
-        messages=messages
-    )
-
-    ai_message = response.choices[0].message.content
-    print("AI:", ai_message)
+    ai_message = gateway.stream(
+        SMALL_MODEL,
+        messages,
+        prefix="AI: ",
+        stream=STREAM_RESPONSES,
+        node="chat"
+    ).content
 
     # Add AI response to conversation history
     messages.append({"role": "assistant", "content": ai_message})
@@ -0,0 +1,142 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from semantic_router import CRISIS_KEYWORDS
+
+# Drafts nobody took are dropped after this many seconds, and the oldest go
+# first beyond MAX_PENDING: a session closed or expired mid-conversation
+# never takes or cancels its draft
+PREFETCH_TTL = float(os.environ.get("PREFETCH_TTL_SECONDS", 30 * 60))
+MAX_PENDING = int(os.environ.get("PREFETCH_MAX_PENDING", 1000))
+
+def mentions_crisis(messages) -> bool:
+    """True if any of the messages contains a crisis phrase."""
+    return any(keyword in (msg.get("content") or "").lower() for msg in messages for keyword in CRISIS_KEYWORDS)
+
+def mood_inputs(tracker, history):
+    """
+    Fingerprint for a draft built on the conversation (see Prefetcher.take):
+    the tracker's mood and the emotions mentioned so far, so an answer that
+    shifts either invalidates it. Costs only the tracker's catch-up.
+    """
+    tracker.update(history)
+    return tracker.mood(), tuple(sorted(tracker.first_seen))
+
+class Prefetcher:
+    """
+    Prefetcher:
+      - Starts a likely next call in the background while the user is typing.
+      - Remembers the history the call was built on (its snapshot) and,
+        optionally, a fingerprint of the call's other inputs (e.g. mood_inputs).
+      - take() hands the result back only if it is still valid: the history is
+        unchanged, or it grew by turns that leave the fingerprint unchanged and
+        mention no crisis phrase. Otherwise the result is dropped and the caller
+        computes it again.
+      - Drafts left untaken are dropped after ttl seconds, or oldest first
+        beyond max_pending.
+    """
+
+    def __init__(self, max_workers=4, ttl=PREFETCH_TTL, max_pending=MAX_PENDING):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self.ttl = ttl
+        self.max_pending = max_pending
+        self._pending = {}  # key -> (snapshot, inputs, future, started); oldest first
+        self._lock = threading.Lock()
+        self.started = 0
+        self.used = 0
+        self.dropped = 0
+
+    def _register(self, key, snapshot, inputs, future):
+        now = time.monotonic()
+        with self._lock:
+            stale = [self._pending.pop(key)] if key in self._pending else []
+            for old_key, entry in list(self._pending.items()):
+                if now - entry[3] < self.ttl and len(self._pending) < self.max_pending:
+                    break
+                stale.append(self._pending.pop(old_key))
+            self._pending[key] = (list(snapshot), inputs, future, now)
+            self.started += 1
+        for entry in stale:
+            self._drop(entry[2])
+
+    def _drop(self, future):
+        future.cancel()
+        with self._lock:
+            self.dropped += 1
+
+    def start(self, key, snapshot, fn, *args, inputs=None, **kwargs):
+        """Run fn(*args, **kwargs) on a worker thread, speculating on snapshot (and inputs)."""
+        self._register(key, snapshot, inputs, self._executor.submit(fn, *args, **kwargs))
+
+    def astart(self, key, snapshot, coro, inputs=None):
+        """Async variant of start(): run the coroutine as a task on the current loop."""
+        self._register(key, snapshot, inputs, asyncio.ensure_future(coro))
+
+    def _claim(self, key, history, inputs):
+        with self._lock:
+            entry = self._pending.pop(key, None)
+        if entry is None:
+            return None
+        snapshot, drafted_on, future, _ = entry
+        extra = history[len(snapshot):]
+        valid = history[:len(snapshot)] == snapshot and (
+            not extra or (drafted_on is not None and inputs == drafted_on and not mentions_crisis(extra))
+        )
+        if not valid:
+            self._drop(future)
+            return None
+        return future
+
+    def take(self, key, history, inputs=None):
+        """
+        Return the prefetched result for key, or None if there is none or it is
+        stale. inputs is the fingerprint for the current history, compared with
+        the one given to start().
+        """
+        future = self._claim(key, history, inputs)
+        if future is None:
+            return None
+        try:
+            result = future.result()
+        except Exception:
+            # A failed speculation is not an error; the caller just does the work itself
+            with self._lock:
+                self.dropped += 1
+            return None
+        with self._lock:
+            self.used += 1
+        return result
+
+    async def atake(self, key, history, inputs=None):
+        """Async variant of take()."""
+        future = self._claim(key, history, inputs)
+        if future is None:
+            return None
+        try:
+            result = await future
+        except Exception:
+            with self._lock:
+                self.dropped += 1
+            return None
+        with self._lock:
+            self.used += 1
+        return result
+
+    def cancel(self, key):
+        with self._lock:
+            entry = self._pending.pop(key, None)
+        if entry is not None:
+            self._drop(entry[2])
+
+    def cancel_all(self):
+        with self._lock:
+            pending = list(self._pending.values())
+            self._pending.clear()
+        for entry in pending:
+            self._drop(entry[2])
+
+    def stats(self) -> dict:
+        return {"started": self.started, "used": self.used, "dropped": self.dropped, "pending": len(self._pending)}
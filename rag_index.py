@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+import time
+import uuid
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from ann_index import INDEX_TYPE, MEMORY_BUDGET, build_index, choose_index, tune
+from semantic_cache import EMBEDDING_MODEL
+
+# Bump when the index layout or the way chunks are built changes
+INDEX_VERSION = 2
+
+MANIFEST = "manifest.json"
+
+class LazyEmbeddings(Embeddings):
+    """
+    Lazy Embeddings:
+      - Stands in for HuggingFaceEmbeddings and loads the model on the first
+        embed call, so reloading a saved index does not wait for the model.
+    """
+
+    def __init__(self, model_name=EMBEDDING_MODEL):
+        self.model_name = model_name
+        self._model = None
+
+    @property
+    def model(self):
+        if self._model is None:
+            from langchain_community.embeddings import HuggingFaceEmbeddings
+            self._model = HuggingFaceEmbeddings(model_name=self.model_name)
+        return self._model
+
+    def embed_documents(self, texts):
+        return self.model.embed_documents(texts)
+
+    def embed_query(self, text):
+        return self.model.embed_query(text)
+
+def content_hash(documents, **settings) -> str:
+    """
+    Hash of everything the indexed vectors come from: the documents, splitter
+    settings and model. The index type is not part of it; load_or_build_faiss
+    compares the saved one with what choose_index() now picks.
+    """
+    digest = hashlib.sha256(json.dumps({"version": INDEX_VERSION, **settings}, sort_keys=True).encode())
+    for document in documents:
+        encoded = document.encode()
+        digest.update(len(encoded).to_bytes(8, "little"))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+def read_manifest(index_dir):
+    try:
+        with open(os.path.join(index_dir, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_manifest(index_dir, manifest):
+    path = os.path.join(index_dir, MANIFEST)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+
+def load_or_build_faiss(index_dir, digest, make_chunks, embeddings, settings=None,
+                        index_type=INDEX_TYPE, memory_budget=MEMORY_BUDGET):
+    """
+    Reload the FAISS index saved in index_dir if its manifest matches digest
+    and its index type is still what ann_index.choose_index() picks for the
+    chunk count, index_type and memory_budget; otherwise build it from
+    make_chunks() (LangChain Documents), save it and write the manifest. A
+    rebuild for a new index type only re-embeds what the embeddings (e.g.
+    CachedEmbeddings) do not already hold. Returns (vector store, startup report).
+    """
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+
+    start = time.perf_counter()
+    manifest = read_manifest(index_dir)
+    saved = manifest.get("index", {"type": "flat"}) if manifest else None
+    if (manifest and manifest.get("content_hash") == digest and "dim" in manifest
+            and choose_index(manifest["chunks"], manifest["dim"], memory_budget, index_type) == saved):
+        # Our own pickle of the docstore, written below
+        store = FAISS.load_local(index_dir, embeddings, allow_dangerous_deserialization=True)
+        spec = saved
+        tune(store.index, spec)
+        return store, {"source": "disk", "seconds": time.perf_counter() - start, "chunks": manifest["chunks"], "index": spec}
+
+    chunks = make_chunks()
+    vectors = np.asarray(embeddings.embed_documents([chunk.page_content for chunk in chunks]), dtype=np.float32)
+    spec = choose_index(len(chunks), vectors.shape[1], memory_budget, index_type)
+    ids = [str(uuid.uuid4()) for _ in chunks]
+    store = FAISS(embeddings, build_index(vectors, spec), InMemoryDocstore(dict(zip(ids, chunks))), dict(enumerate(ids)))
+    os.makedirs(index_dir, exist_ok=True)
+    # No manifest while the files are replaced, so a crash mid-save means a rebuild
+    if manifest is not None:
+        os.remove(os.path.join(index_dir, MANIFEST))
+    store.save_local(index_dir)
+    _write_manifest(index_dir, {
+        "version": INDEX_VERSION,
+        "content_hash": digest,
+        "chunks": len(chunks),
+        "dim": int(vectors.shape[1]),
+        "index": spec,
+        "built": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        **(settings or {}),
+    })
+    return store, {"source": "built", "seconds": time.perf_counter() - start, "chunks": len(chunks), "index": spec}
@@ -0,0 +1,173 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from context_window import count_tokens
+
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+
+# Per-node generation caps. max_tokens bounds the whole answer; reasoning_tokens
+# bounds the <think> span before the model is made to answer.
+NODE_TOKEN_BUDGETS = {
+    "analysis": {"max_tokens": 1024, "reasoning_tokens": 384},
+    "assignment": {"max_tokens": 1024, "reasoning_tokens": 512},
+    "support": {"max_tokens": 768, "reasoning_tokens": 384},
+    "chat": {"max_tokens": 512, "reasoning_tokens": 256},
+}
+
+# Models whose chat template opens the <think> block itself, so the completion
+# starts inside it and only the close tag shows up (deepseek-r1 and its distills)
+IMPLICIT_THINK_MODELS = ("deepseek-r1", "r1-distill")
+
+# Optional JSONL file that every stored trace is also appended to
+TRACE_PATH = os.environ.get("LLM_REASONING_TRACE_PATH")
+
+def opens_think(model) -> bool:
+    """True if model's completions start inside a <think> block the template opened."""
+    return any(name in (model or "").lower() for name in IMPLICIT_THINK_MODELS)
+
+def _partial_tag(text, tag) -> int:
+    """Length of the longest suffix of text that could be the start of tag."""
+    for size in range(min(len(tag) - 1, len(text)), 0, -1):
+        if text.endswith(tag[:size]):
+            return size
+    return 0
+
+class ThinkFilter:
+    """
+    Think Filter:
+      - Fed the raw completion chunk by chunk; returns only the visible answer text.
+      - Collects <think> spans (even when a tag is split across chunks) as reasoning.
+      - Counts reasoning tokens so callers can enforce a budget mid-stream.
+      - implicit_open (see opens_think) starts inside the think block: nothing is
+        shown until </think>. A completion that ends without one never used
+        the block, and flush() releases it as the answer.
+    """
+
+    def __init__(self, implicit_open=False):
+        self.in_think = implicit_open
+        self.reasoning_tokens = 0
+        self._implicit = implicit_open
+        self._closed = False
+        self._pending = ""
+        self._reasoning = []
+        self._visible = []
+        self._seen_open = implicit_open
+
+    @property
+    def reasoning(self) -> str:
+        text = "".join(self._reasoning).strip()
+        if self._implicit and text.startswith(THINK_OPEN):
+            # The model wrote the open tag the template had already added
+            text = text[len(THINK_OPEN):].lstrip()
+        return text
+
+    @property
+    def visible(self) -> str:
+        return "".join(self._visible).strip()
+
+    def _emit(self, text, out):
+        if not text:
+            return
+        if self.in_think:
+            self._reasoning.append(text)
+            if text.strip():
+                self.reasoning_tokens += count_tokens(text)
+            return
+        if not self._visible:
+            text = text.lstrip()
+            if not text:
+                return
+        self._visible.append(text)
+        out.append(text)
+
+    def feed(self, text) -> str:
+        out = []
+        self._pending += text
+        while True:
+            if not self.in_think and not self._seen_open:
+                # Some chat templates open the think block themselves, so only the close tag shows up
+                close = self._pending.find(THINK_CLOSE)
+                opening = self._pending.find(THINK_OPEN)
+                if close >= 0 and (opening < 0 or close < opening):
+                    self._reasoning.extend(self._visible)
+                    self._reasoning.append(self._pending[:close])
+                    self._visible = []
+                    self._pending = self._pending[close + len(THINK_CLOSE):]
+                    self._seen_open = True
+                    continue
+
+            tag = THINK_CLOSE if self.in_think else THINK_OPEN
+            index = self._pending.find(tag)
+            if index >= 0:
+                self._emit(self._pending[:index], out)
+                self._pending = self._pending[index + len(tag):]
+                self._closed = self._closed or self.in_think
+                self.in_think = not self.in_think
+                self._seen_open = True
+                continue
+
+            keep = max(_partial_tag(self._pending, tag), _partial_tag(self._pending, THINK_CLOSE))
+            self._emit(self._pending[:len(self._pending) - keep], out)
+            self._pending = self._pending[len(self._pending) - keep:]
+            return "".join(out)
+
+    def flush(self, complete=True) -> str:
+        """
+        Emit what is held back. complete=False for a stream that was cut short,
+        whose open implicit block is reasoning however it ends.
+        """
+        out = []
+        self._emit(self._pending, out)
+        self._pending = ""
+        text = "".join(self._reasoning)
+        if complete and self._implicit and self.in_think and not self._closed and not text.lstrip().startswith(THINK_OPEN):
+            # No </think>: the template's block was never used, so this was the answer
+            self._reasoning = []
+            self.in_think = False
+            self._emit(text, out)
+        return "".join(out)
+
+def strip_reasoning(text):
+    """Split a finished completion into (answer, reasoning)."""
+    think = ThinkFilter()
+    think.feed(text or "")
+    think.flush()
+    return think.visible, think.reasoning
+
+class ReasoningTraceStore:
+    """
+    Reasoning Trace Store:
+      - Keeps the most recent <think> spans, out of the conversation history.
+      - Optionally appends them to a JSONL file for debugging.
+    """
+
+    def __init__(self, max_traces=500, path=TRACE_PATH):
+        self.traces = deque(maxlen=max_traces)
+        self.path = path
+        self._lock = threading.Lock()
+
+    def add(self, node, model, reasoning, truncated=False):
+        if not reasoning:
+            return
+        trace = {
+            "time": time.time(),
+            "node": node,
+            "model": model,
+            "reasoning": reasoning,
+            "truncated": truncated,
+        }
+        with self._lock:
+            self.traces.append(trace)
+            if self.path:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(trace, ensure_ascii=False) + "\n")
+
+    def for_node(self, node):
+        return [trace for trace in self.traces if trace["node"] == node]
+
+# Shared store for every node's reasoning
+reasoning_traces = ReasoningTraceStore()
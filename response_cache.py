@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Where the on-disk tier lives (override with LLM_CACHE_PATH)
+CACHE_PATH = os.environ.get("LLM_CACHE_PATH", "./llm_cache.sqlite")
+
+def normalize_messages(messages):
+    """Keep only role/content and collapse whitespace, so cosmetic differences still hit."""
+    return [
+        {"role": msg["role"], "content": " ".join(str(msg.get("content") or "").split())}
+        for msg in messages
+    ]
+
+def cache_key(model, messages, params=None) -> str:
+    payload = json.dumps(
+        {"model": model, "messages": normalize_messages(messages), "params": params or {}},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """
+    Response Cache:
+      - In-memory LRU tier with a time-to-live.
+      - Optional SQLite tier that survives restarts (path=None disables it).
+      - Keyed by model, normalized messages and sampling parameters.
+      - Counts memory hits, disk hits and misses.
+    """
+
+    def __init__(self, path=CACHE_PATH, max_entries=256, ttl=24 * 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, model TEXT, response TEXT, created REAL)"
+            )
+            self._db.commit()
+
+    def _expired(self, created):
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def _remember(self, key, response, created):
+        self._memory[key] = (response, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, model, messages, params=None):
+        """Return the cached response, or None on a miss."""
+        key = cache_key(model, messages, params)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._expired(entry[1]):
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return entry[0]
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT response, created FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    if not self._expired(row[1]):
+                        self._remember(key, row[0], row[1])
+                        self.disk_hits += 1
+                        return row[0]
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self.misses += 1
+            return None
+
+    def put(self, model, messages, response, params=None):
+        key = cache_key(model, messages, params)
+        created = time.time()
+        with self._lock:
+            self._remember(key, response, created)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, model, response, created) VALUES (?, ?, ?, ?)",
+                    (key, model, response, created),
+                )
+                self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+        }
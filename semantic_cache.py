@@ -0,0 +1,85 @@
+import os
+import threading
+
+import numpy as np
+
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Cosine similarity a new conversation needs to reuse a cached question set
+SIMILARITY_THRESHOLD = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", 0.92))
+
+def conversation_text(messages) -> str:
+    """The part of the history that decides which follow-up questions make sense."""
+    return " ".join(msg["content"] for msg in messages if msg["role"] == "user")
+
+class SemanticQuestionCache:
+    """
+    Semantic Question Cache:
+      - Embeds the conversation context with all-MiniLM-L6-v2.
+      - Returns the question set of the nearest cached context if it is similar enough,
+        so the follow-up question generation can be skipped.
+      - Keeps one store per bucket (e.g. question round), oldest entries evicted first.
+      - Reports hit rate and the generation time saved.
+    """
+
+    def __init__(self, embeddings=None, threshold=SIMILARITY_THRESHOLD, max_entries=5000):
+        self._embeddings = embeddings
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._vectors = {}    # bucket -> (n, dim) matrix of normalized context embeddings
+        self._entries = {}    # bucket -> list of (questions, generation_seconds)
+        self.hits = 0
+        self.misses = 0
+        self.latency_saved = 0.0
+
+    @property
+    def embeddings(self):
+        if self._embeddings is None:
+            from langchain_huggingface import HuggingFaceEmbeddings
+            self._embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+        return self._embeddings
+
+    def _embed(self, text):
+        vector = np.asarray(self.embeddings.embed_query(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, context, bucket=0):
+        """Return (questions, vector) on a hit, or (None, vector) on a miss; pass vector on to add()."""
+        vector = self._embed(context)
+        with self._lock:
+            matrix = self._vectors.get(bucket)
+            if matrix is not None and len(matrix):
+                scores = matrix @ vector
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    questions, generation_seconds = self._entries[bucket][best]
+                    self.hits += 1
+                    self.latency_saved += generation_seconds
+                    return list(questions), vector
+            self.misses += 1
+        return None, vector
+
+    def add(self, vector, questions, generation_seconds, bucket=0):
+        """Store a freshly generated question set under its context embedding."""
+        if not questions:
+            return
+        with self._lock:
+            matrix = self._vectors.get(bucket)
+            entries = self._entries.setdefault(bucket, [])
+            matrix = vector[None, :] if matrix is None else np.vstack([matrix, vector])
+            entries.append((tuple(questions), generation_seconds))
+            if len(entries) > self.max_entries:
+                matrix = matrix[-self.max_entries:]
+                del entries[:-self.max_entries]
+            self._vectors[bucket] = matrix
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "latency_saved_seconds": self.latency_saved,
+        }
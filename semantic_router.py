@@ -0,0 +1,252 @@
+import asyncio
+import hashlib
+import json
+import os
+import queue
+import string
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from keyword_matcher import KeywordMatcher
+from semantic_cache import EMBEDDING_MODEL
+
+# Example messages per category; each category is routed by the normalized mean
+# of their embeddings (its centroid)
+CATEGORY_EXAMPLES = {
+    "crisis_intervention": [
+        "I want to end my life",
+        "I don't want to be alive anymore",
+        "I keep thinking about killing myself",
+        "I have been hurting myself on purpose",
+        "everyone would be better off without me",
+        "I can't see any reason to keep living",
+    ],
+    "anxiety_support": [
+        "I'm so anxious I can't think straight",
+        "my heart races and I can't calm down",
+        "I'm constantly worried something bad will happen",
+        "I feel stressed and on edge all the time",
+        "I keep having panic attacks",
+        "I can't stop overthinking everything",
+    ],
+    "depression_support": [
+        "I feel sad and empty most days",
+        "nothing I used to enjoy interests me anymore",
+        "I feel hopeless about the future",
+        "I can barely get out of bed",
+        "I feel worthless and alone",
+        "everything feels grey and pointless",
+    ],
+    "neutral_state": [
+        "I'm doing fine today",
+        "things are pretty good at the moment",
+        "I had a nice day with my friends",
+        "I'm feeling happy and relaxed",
+        "nothing special, just a normal day",
+        "work was okay and I slept well",
+    ],
+}
+
+# Crisis wording that is routed without the model, so crisis latency never
+# depends on it (phrases as substrings, words as whole tokens)
+CRISIS_KEYWORDS = (
+    "kill myself", "end my life", "end it all", "want to die", "hurt myself", "self harm",
+    "suicide", "suicidal", "self-harm",
+)
+
+# Below this cosine similarity to every centroid the message goes to the fallback
+SIMILARITY_THRESHOLD = float(os.environ.get("SEMANTIC_ROUTER_THRESHOLD", 0.3))
+
+# Messages embedded together: the batcher waits at most BATCH_WAIT seconds for
+# other sessions' messages before embedding what it has
+MAX_BATCH = 32
+BATCH_WAIT = 0.005
+
+CENTROIDS_PATH = os.environ.get(
+    "SEMANTIC_ROUTER_CENTROIDS",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "semantic_router_centroids.npz"),
+)
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+class EmbeddingBatcher:
+    """
+    Embedding Batcher:
+      - Collects texts submitted by concurrent sessions and embeds them with one
+        embed_documents() call (up to max_batch texts, waiting at most max_wait).
+      - submit() returns a Future of the normalized vector.
+    """
+
+    def __init__(self, embed_many, max_batch=MAX_BATCH, max_wait=BATCH_WAIT):
+        self._embed_many = embed_many
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.texts = 0
+
+    def submit(self, text) -> Future:
+        future = Future()
+        self._queue.put((text, future))
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                    self._thread.start()
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                vectors = _normalize(np.asarray(self._embed_many([text for text, _ in batch]), dtype=np.float32))
+            except Exception as exc:
+                for _, future in batch:
+                    future.set_exception(exc)
+                continue
+            self.batches += 1
+            self.texts += len(batch)
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+class SemanticRouter:
+    """
+    Semantic Router (drop-in for the keyword decide_category):
+      - One normalized centroid per category, computed from CATEGORY_EXAMPLES
+        once and cached on disk, keyed by a hash of the examples and the model.
+      - classify() embeds the message (batched with other sessions' messages)
+        and picks the category whose centroid has the highest dot product;
+        below threshold it returns fallback.
+      - Crisis keywords are checked first, without the model (normalize maps
+        each token before the word check; default: strip punctuation).
+      - labels renames categories for graphs with other route names.
+    """
+
+    def __init__(self, embeddings=None, examples=CATEGORY_EXAMPLES, crisis_keywords=CRISIS_KEYWORDS,
+                 threshold=SIMILARITY_THRESHOLD, fallback="general_support", labels=None, normalize=None,
+                 path=CENTROIDS_PATH):
+        self._embeddings = embeddings
+        self.examples = examples
+        self.threshold = threshold
+        self.fallback = fallback
+        self.labels = dict(labels or {})
+        self.normalize = normalize
+        self.path = path
+        self.crisis = KeywordMatcher({"crisis_intervention": list(crisis_keywords)})
+        self.batcher = EmbeddingBatcher(self.embed_many)
+        self._centroids = None
+        self._lock = threading.Lock()
+        self.fast_path = 0
+        self.embedded = 0
+
+    @property
+    def embeddings(self):
+        if self._embeddings is None:
+            from langchain_huggingface import HuggingFaceEmbeddings
+            self._embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+        return self._embeddings
+
+    def embed_many(self, texts):
+        return self.embeddings.embed_documents(list(texts))
+
+    def _digest(self) -> str:
+        model = getattr(self._embeddings, "model_name", EMBEDDING_MODEL)
+        payload = json.dumps({"model": model, "examples": self.examples}, sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    @property
+    def centroids(self):
+        """(categories, centroid matrix), loaded from the cache or computed once."""
+        if self._centroids is None:
+            with self._lock:
+                if self._centroids is None:
+                    self._centroids = self._load_centroids()
+        return self._centroids
+
+    def _load_centroids(self):
+        digest = self._digest()
+        try:
+            with np.load(self.path) as cached:
+                if str(cached["digest"]) == digest:
+                    return tuple(cached["categories"].tolist()), cached["centroids"]
+        except (OSError, KeyError, ValueError):
+            pass
+        categories = tuple(self.examples)
+        centroids = np.stack([
+            _normalize(_normalize(np.asarray(self.embed_many(self.examples[category]), dtype=np.float32)).mean(axis=0))
+            for category in categories
+        ])
+        tmp = f"{self.path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp, digest=digest, categories=np.array(categories), centroids=centroids)
+        os.replace(tmp, self.path)
+        return categories, centroids
+
+    def _crisis(self, lowered):
+        normalize = self.normalize or (lambda word: word.strip(string.punctuation))
+        return self.crisis.classify(lowered, [normalize(word) for word in lowered.split()])
+
+    def _label(self, category):
+        return self.labels.get(category, category)
+
+    def route(self, vector):
+        """The label for one normalized message embedding."""
+        categories, centroids = self.centroids
+        scores = centroids @ vector
+        best = int(np.argmax(scores))
+        return self._label(categories[best]) if scores[best] >= self.threshold else self.fallback
+
+    def classify(self, text: str):
+        lowered = text.lower()
+        if self._crisis(lowered):
+            self.fast_path += 1
+            return self._label("crisis_intervention")
+        self.embedded += 1
+        return self.route(self.batcher.submit(text).result())
+
+    async def aclassify(self, text: str):
+        lowered = text.lower()
+        if self._crisis(lowered):
+            self.fast_path += 1
+            return self._label("crisis_intervention")
+        if self._centroids is None:
+            await asyncio.to_thread(lambda: self.centroids)
+        self.embedded += 1
+        return self.route(await asyncio.wrap_future(self.batcher.submit(text)))
+
+    def classify_many(self, texts) -> list:
+        """Offline batches: one embed_documents() call for every non-crisis text."""
+        texts = list(texts)
+        labels = [self._label("crisis_intervention") if self._crisis(text.lower()) else None for text in texts]
+        pending = [i for i, label in enumerate(labels) if label is None]
+        if pending:
+            vectors = _normalize(np.asarray(self.embed_many([texts[i] for i in pending]), dtype=np.float32))
+            categories, centroids = self.centroids
+            scores = vectors @ centroids.T
+            best = scores.argmax(axis=1)
+            for i, row, column in zip(pending, scores, best):
+                labels[i] = self._label(categories[column]) if row[column] >= self.threshold else self.fallback
+        return labels
+
+    def stats(self) -> dict:
+        return {
+            "fast_path": self.fast_path,
+            "embedded": self.embedded,
+            "batches": self.batcher.batches,
+            "mean_batch": self.batcher.texts / self.batcher.batches if self.batcher.batches else 0.0,
+        }
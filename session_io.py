@@ -0,0 +1,378 @@
+import asyncio
+import base64
+import threading
+import uuid
+from dataclasses import dataclass, field
+
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.errors import GraphInterrupt
+from langgraph.store.memory import InMemoryStore
+from langgraph.types import Command, interrupt
+
+# --- Turn I/O Adapters ---
+# Nodes never call input()/print() directly; they ask the adapter found in
+# config["configurable"]["io"] (see get_io), so the same graph can run on a
+# console, in a batch job, or as stored sessions inside a server.
+
+class ConsoleIO:
+    """
+    Console Adapter:
+      - Today's interactive behaviour: input() for questions, print() for output.
+    """
+    session_id = None
+
+    def bind(self, config):
+        return self
+
+    def ask(self, prompt="You: ") -> str:
+        return input(prompt)
+
+    async def aask(self, prompt="You: ") -> str:
+        # Keep the event loop free while the user types
+        return await asyncio.to_thread(input, prompt)
+
+    def say(self, *parts):
+        print(*parts)
+
+    def write(self, text):
+        """Raw output such as streamed tokens (no newline added)."""
+        print(text, end="", flush=True)
+
+    def memo(self, fn, *args, **kwargs):
+        return fn(*args, **kwargs)
+
+    async def amemo(self, fn, *args, **kwargs):
+        return await fn(*args, **kwargs)
+
+    def begin(self, node=None):
+        pass
+
+    def end(self):
+        pass
+
+class ScriptedIO(ConsoleIO):
+    """
+    Scripted Adapter:
+      - Answers questions from a list, for batch jobs and benchmarks.
+      - Collects everything the agents say in transcript; answers "exit" when the script runs out.
+    """
+
+    def __init__(self, answers, echo=False):
+        self.answers = list(answers)
+        self.echo = echo
+        self.transcript = []
+
+    def ask(self, prompt="You: ") -> str:
+        answer = self.answers.pop(0) if self.answers else "exit"
+        self.transcript.append(prompt + answer + "\n")
+        return answer
+
+    async def aask(self, prompt="You: ") -> str:
+        return self.ask(prompt)
+
+    def say(self, *parts):
+        self.write(" ".join(str(part) for part in parts) + "\n")
+
+    def write(self, text):
+        self.transcript.append(text)
+        if self.echo:
+            print(text, end="", flush=True)
+
+class EffectLog:
+    """
+    Effect Log:
+      - A HeadlessSession's replayable effects, kept in the LangGraph store the
+        graph is compiled with, next to its checkpoints: one item per
+        (thread, node, call index).
+      - Values are encoded with the checkpointer's serializer, so a store that
+        persists the checkpoints' threads can persist these too.
+    """
+    NAMESPACE = "effects"
+    PAGE = 100
+
+    def __init__(self, store, serde):
+        self.store = store
+        self.serde = serde
+
+    def _namespace(self, session_id, node):
+        return (self.NAMESPACE, session_id, node)
+
+    def _items(self, namespace):
+        offset = 0
+        while True:
+            page = self.store.search(namespace, limit=self.PAGE, offset=offset)
+            yield from page
+            if len(page) < self.PAGE:
+                return
+            offset += len(page)
+
+    def load(self, session_id, node) -> list:
+        """The node's recorded effects in call order (up to the first missing index)."""
+        values = {}
+        for item in self._items(self._namespace(session_id, node)):
+            values[int(item.key)] = self.serde.loads_typed((item.value["type"], base64.b64decode(item.value["data"])))
+        effects = []
+        while len(effects) in values:
+            effects.append(values[len(effects)])
+        return effects
+
+    def put(self, session_id, node, index, value):
+        kind, data = self.serde.dumps_typed(value)
+        self.store.put(self._namespace(session_id, node), str(index),
+                       {"type": kind, "data": base64.b64encode(data).decode("ascii")})
+
+    def clear(self, session_id, node=None):
+        """Forget one node's effects, or (node=None) all of the session's."""
+        if node is None:
+            namespaces = self.store.list_namespaces(prefix=(self.NAMESPACE, session_id))
+        else:
+            namespaces = [self._namespace(session_id, node)]
+        for namespace in namespaces:
+            for item in list(self._items(namespace)):
+                self.store.delete(namespace, item.key)
+
+class HeadlessSession:
+    """
+    Headless Session (one per thread_id):
+      - ask() suspends the graph with a LangGraph interrupt carrying the pending output.
+      - LangGraph re-runs an interrupted node from the top when it resumes, so
+        say()/write() already delivered and memo()ised calls (model calls,
+        retrieval) are replayed from the effect log instead of being repeated.
+      - Effects are keyed by (node, call index) in an EffectLog, so a thread
+        resumed by another process replays the same way.
+    """
+
+    def __init__(self, session_id, log=None):
+        self.session_id = session_id
+        self.log = log or EffectLog(InMemoryStore(), JsonPlusSerializer())
+        self.listener = None  # optional callable fed every piece of output as it is produced
+        self._node = None
+        self._effects = []
+        self._cursor = 0
+        self._memo_depth = 0  # output inside a memo() is replayed with it, not on its own
+        self._outbox = []
+        self._lock = threading.Lock()
+
+    def _replaying(self):
+        return self._cursor < len(self._effects)
+
+    def begin(self, node=None):
+        self._node = node or "node"
+        self._effects = self.log.load(self.session_id, self._node)
+        self._cursor = 0
+
+    def end(self):
+        # The node finished; nothing left to replay
+        self.log.clear(self.session_id, self._node)
+        self._effects = []
+        self._cursor = 0
+
+    def write(self, text):
+        if self._memo_depth == 0:
+            if self._replaying():
+                self._cursor += 1
+                return
+            self._effects.append(None)
+            self.log.put(self.session_id, self._node, self._cursor, None)
+            self._cursor += 1
+        with self._lock:
+            self._outbox.append(text)
+        if self.listener is not None:
+            self.listener(text)
+
+    def say(self, *parts):
+        self.write(" ".join(str(part) for part in parts) + "\n")
+
+    def drain(self) -> str:
+        """Return and clear the output produced since the last drain."""
+        with self._lock:
+            text = "".join(self._outbox)
+            self._outbox.clear()
+        return text
+
+    def ask(self, prompt="You: ") -> str:
+        return interrupt({"prompt": prompt, "output": self.drain()})
+
+    async def aask(self, prompt="You: ") -> str:
+        return self.ask(prompt)
+
+    def _reserve(self):
+        self._effects.append(None)
+        self._cursor += 1
+        self._memo_depth += 1
+        return len(self._effects) - 1
+
+    def memo(self, fn, *args, **kwargs):
+        """Run fn once per node run; on a replay return its recorded result."""
+        if self._replaying():
+            result = self._effects[self._cursor]
+            self._cursor += 1
+            return result
+        index = self._reserve()
+        try:
+            result = fn(*args, **kwargs)
+        finally:
+            self._memo_depth -= 1
+        self._effects[index] = result
+        self.log.put(self.session_id, self._node, index, result)
+        return result
+
+    async def amemo(self, fn, *args, **kwargs):
+        if self._replaying():
+            result = self._effects[self._cursor]
+            self._cursor += 1
+            return result
+        index = self._reserve()
+        try:
+            result = await fn(*args, **kwargs)
+        finally:
+            self._memo_depth -= 1
+        self._effects[index] = result
+        self.log.put(self.session_id, self._node, index, result)
+        return result
+
+class InterruptIO:
+    """Adapter for SessionEngine: hands each session its HeadlessSession."""
+
+    def __init__(self, log=None):
+        self.log = log or EffectLog(InMemoryStore(), JsonPlusSerializer())
+        self.sessions = {}
+        self._lock = threading.Lock()
+
+    def bind(self, config):
+        session_id = config["configurable"]["thread_id"]
+        with self._lock:
+            session = self.sessions.get(session_id)
+            if session is None:
+                session = self.sessions[session_id] = HeadlessSession(session_id, self.log)
+        return session
+
+    def close(self, session_id):
+        with self._lock:
+            self.sessions.pop(session_id, None)
+        self.log.clear(session_id)
+
+_console = ConsoleIO()
+
+def get_io(config):
+    """The turn adapter for this run (the console when none was configured)."""
+    io = (config or {}).get("configurable", {}).get("io", _console)
+    return io.bind(config)
+
+def session_node(fn):
+    """
+    Wrap a graph node that uses get_io(), marking where each (re)run begins and ends
+    so a headless session knows what to replay.
+    """
+    def name(config):
+        return ((config or {}).get("metadata") or {}).get("langgraph_node", fn.__name__)
+
+    if asyncio.iscoroutinefunction(fn):
+        async def anode(state, config):
+            io = get_io(config)
+            io.begin(name(config))
+            try:
+                result = await fn(state, config)
+            except GraphInterrupt:
+                raise  # keep the effect log for the resume
+            except BaseException:
+                io.end()
+                raise
+            io.end()
+            return result
+        anode.__name__ = fn.__name__
+        return anode
+
+    def node(state, config):
+        io = get_io(config)
+        io.begin(name(config))
+        try:
+            result = fn(state, config)
+        except GraphInterrupt:
+            raise  # keep the effect log for the resume
+        except BaseException:
+            io.end()
+            raise
+        io.end()
+        return result
+    node.__name__ = fn.__name__
+    return node
+
+def sync_node(node):
+    """
+    Sync adapter for an async node, for app.invoke: runs it to completion on an
+    event loop of its own. The loop's task inherits the run's context, so
+    interrupt() and get_io() work there. Under app.ainvoke the node is used as is.
+    """
+    def run(state, config):
+        return asyncio.run(node(state, config))
+    run.__name__ = f"{node.__name__}_sync"
+    return run
+
+# --- Session Engine ---
+
+@dataclass
+class Turn:
+    session_id: str
+    output: str                 # everything the agents said since the last turn
+    prompt: str = None          # what the session is waiting for, None once finished
+    done: bool = False
+    state: dict = field(default=None, repr=False)
+
+class SessionEngine:
+    """
+    Session Engine:
+      - Compiles a StateGraph with a checkpointer; a waiting session is a stored
+        checkpoint plus its interrupt, not a blocked thread.
+      - start() runs a new session to its first question; send() resumes it with
+        the user's next message.
+      - The sessions' effect logs live in the graph's store (an InMemoryStore
+        unless one is given), beside the checkpoints.
+    """
+
+    def __init__(self, graph, checkpointer=None, store=None):
+        self.app = graph.compile(checkpointer=checkpointer or MemorySaver(), store=store or InMemoryStore())
+        self.io = InterruptIO(EffectLog(self.app.store, self.app.checkpointer.serde))
+
+    def _config(self, session_id):
+        return {"configurable": {"thread_id": session_id, "io": self.io}}
+
+    def _turn(self, session_id, result):
+        config = self._config(session_id)
+        interrupts = result.get("__interrupt__") if isinstance(result, dict) else None
+        session = self.io.bind(config)
+        if interrupts:
+            payload = interrupts[0].value
+            return Turn(session_id, payload["output"], prompt=payload["prompt"])
+        output = session.drain()
+        self.io.close(session_id)
+        return Turn(session_id, output, done=True, state=result)
+
+    def start(self, state, session_id=None) -> Turn:
+        session_id = session_id or uuid.uuid4().hex
+        return self._turn(session_id, self.app.invoke(state, self._config(session_id)))
+
+    def send(self, session_id, message) -> Turn:
+        return self._turn(session_id, self.app.invoke(Command(resume=message), self._config(session_id)))
+
+    async def astart(self, state, session_id=None) -> Turn:
+        session_id = session_id or uuid.uuid4().hex
+        return self._turn(session_id, await self.app.ainvoke(state, self._config(session_id)))
+
+    async def asend(self, session_id, message) -> Turn:
+        return self._turn(session_id, await self.app.ainvoke(Command(resume=message), self._config(session_id)))
+
+    def waiting(self, session_id) -> bool:
+        return bool(self.app.get_state(self._config(session_id)).interrupts)
+
+    def listen(self, session_id, listener):
+        """Feed the session's output to listener as it is produced; returns the session."""
+        session = self.io.bind(self._config(session_id))
+        session.listener = listener
+        return session
+
+    def close(self, session_id):
+        """Forget a session: its effect log and its stored checkpoints."""
+        self.io.close(session_id)
+        self.app.checkpointer.delete_thread(session_id)
@@ -0,0 +1,109 @@
+import json
+import re
+
+from llm_gateway import SMALL_MODEL
+
+# JSON schema for a round of follow-up questions; LM Studio turns it into a
+# grammar, so the model can only produce a matching object.
+QUESTIONS_SCHEMA = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "followup_questions",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "questions": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "minItems": 2,
+                    "maxItems": 2,
+                }
+            },
+            "required": ["questions"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+QUESTIONS_INSTRUCTIONS = 'Respond only with JSON of the form {"questions": ["<question 1>", "<question 2>"]}.'
+
+REPAIR_PROMPT = """Rewrite the text below as JSON of the form {{"questions": ["<question 1>", "<question 2>"]}}.
+Keep the questions' wording. Text:
+{text}"""
+
+# Small output budgets: two short questions do not need more
+QUESTIONS_MAX_TOKENS = 200
+REPAIR_MAX_TOKENS = 150
+
+_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$")
+# A question sentence: the text since the last sentence end, colon, line break or JSON punctuation, up to a "?"
+_QUESTION = re.compile(r'[^.?!:\n"\[\]{}]*\?')
+
+def parse_questions(text, count=2):
+    """Strictly validate a {"questions": [...]} answer; raise ValueError if it does not match."""
+    data = json.loads(_FENCE.sub("", (text or "").strip()))
+    if not isinstance(data, dict) or set(data) != {"questions"}:
+        raise ValueError("expected an object with only a 'questions' key")
+    questions = data["questions"]
+    if not isinstance(questions, list) or not questions:
+        raise ValueError("'questions' must be a non-empty list")
+    if not all(isinstance(q, str) and q.strip() for q in questions):
+        raise ValueError("every question must be a non-empty string")
+    return [q.strip() for q in questions[:count]]
+
+def parse_question_sentences(text, count=2):
+    """
+    The last resort: the sentences ending in "?" in free text. The prompts ask
+    for JSON, so a failed answer is as likely to be prose or broken JSON as a
+    numbered list; list markers ("1.", "-") are dropped either way.
+    """
+    questions = []
+    for match in _QUESTION.finditer(text or ""):
+        question = match.group().strip(" \t-*")
+        if len(question) > 1:
+            questions.append(question)
+    return questions[:count]
+
+def _question_messages(messages, prompt):
+    return messages + [{"role": "user", "content": f"{prompt}\n{QUESTIONS_INSTRUCTIONS}"}]
+
+def _repair_messages(text):
+    return [{"role": "user", "content": REPAIR_PROMPT.format(text=text)}]
+
+def generate_questions(gateway, model, messages, prompt, node="analysis", count=2):
+    """
+    Structured Question Generation:
+      - Asks the server for a schema-constrained {"questions": [...]} answer.
+      - Validates it strictly; on failure runs one cheap repair pass on the small model.
+      - Falls back to the question sentences of the first answer so a round is never wasted.
+    """
+    text = gateway.chat(model, _question_messages(messages, prompt), node=node,
+                        response_format=QUESTIONS_SCHEMA, max_tokens=QUESTIONS_MAX_TOKENS)
+    try:
+        return parse_questions(text, count)
+    except ValueError:
+        pass
+
+    repaired = gateway.chat(SMALL_MODEL, _repair_messages(text), node=node,
+                            response_format=QUESTIONS_SCHEMA, max_tokens=REPAIR_MAX_TOKENS)
+    try:
+        return parse_questions(repaired, count)
+    except ValueError:
+        return parse_question_sentences(text, count)
+
+async def agenerate_questions(gateway, model, messages, prompt, node="analysis", count=2):
+    """Async variant of generate_questions."""
+    text = await gateway.achat(model, _question_messages(messages, prompt), node=node,
+                               response_format=QUESTIONS_SCHEMA, max_tokens=QUESTIONS_MAX_TOKENS)
+    try:
+        return parse_questions(text, count)
+    except ValueError:
+        pass
+
+    repaired = await gateway.achat(SMALL_MODEL, _repair_messages(text), node=node,
+                                   response_format=QUESTIONS_SCHEMA, max_tokens=REPAIR_MAX_TOKENS)
+    try:
+        return parse_questions(repaired, count)
+    except ValueError:
+        return parse_question_sentences(text, count)
@@ -1,34 +1,42 @@
-from openai import OpenAI
+from llm_gateway import gateway, SMALL_MODEL
+from session_io import ConsoleIO
+from mood_tracker import MoodTracker
 
-client = OpenAI(base_url="http://localhost:1234/v1", api_key="not-needed")
+# Print conclusions and recommendations token by token as they are generated
+STREAM_RESPONSES = True
 
-def reception_agent(messages):
+# Feelings the assignment agent has tailored questions for
+FEELINGS = ("anxious", "depressed", "suicidal", "happy")
+
+def reception_agent(messages, io=None):
     """
     Reception Agent:
       - Greets the user.
       - Asks for a brief introduction about themselves and their day.
     """
+    io = io or ConsoleIO()
     greeting = "Hello, welcome to our mental health chat!"
     prompt = f"{greeting}\nCan you tell me a bit about yourself and how your day is going?"
-    print("\nReception Agent:", prompt)
+    io.say("\nReception Agent:", prompt)
     
-    user_input = input("You: ")
+    user_input = io.ask("You: ")
     if user_input.lower() == "exit":
         return None
 
     messages.append({"role": "user", "content": user_input})
     return messages
 
-def analysis_agent(messages):
+def analysis_agent(messages, io=None):
     """
     Analysis Agent:
       - Asks additional questions to understand the user’s emotional state.
       - If the user expresses negative emotions, it dives deeper.
     """
+    io = io or ConsoleIO()
     analysis_prompt = "How are you feeling right now? (e.g., anxious, depressed, suicidal, happy, etc.)"
-    print("\nAnalysis Agent:", analysis_prompt)
+    io.say("\nAnalysis Agent:", analysis_prompt)
     
-    feeling = input("You: ")
+    feeling = io.ask("You: ")
     if feeling.lower() == "exit":
         return None
 
@@ -37,45 +45,34 @@ def analysis_agent(messages):
     # If negative feelings are detected, ask for further details.
     if feeling.lower() in ["anxious", "depressed", "suicidal"]:
         followup_prompt = "Can you share more about why you're feeling this way?"
-        print("Analysis Agent:", followup_prompt)
-        reason = input("You: ")
+        io.say("Analysis Agent:", followup_prompt)
+        reason = io.ask("You: ")
         if reason.lower() == "exit":
             return None
         messages.append({"role": "user", "content": reason})
     
     return messages
 
-def assignment_agent(messages):
+def assignment_agent(messages, io=None, tracker=None):
     """
     Assignment Agent:
       - Analyzes previous responses.
       - Dynamically asks follow-up questions based on the user's emotional state.
       - Provides a conclusion and recommendations based on the entire conversation.
     """
-    print("\nAssignment Agent:")
-
-    # Determine the user's emotional state from the conversation history.
-    user_feeling = None
-    for msg in messages:
-        if msg["role"] == "user":
-            content = msg["content"].lower()
-            if any(feeling in content for feeling in ["anxious", "depressed", "suicidal", "happy"]):
-                # We assume the first instance of one of these keywords represents the primary state.
-                if "anxious" in content:
-                    user_feeling = "anxious"
-                elif "depressed" in content:
-                    user_feeling = "depressed"
-                elif "suicidal" in content:
-                    user_feeling = "suicidal"
-                elif "happy" in content:
-                    user_feeling = "happy"
-                break
+    io = io or ConsoleIO()
+    io.say("\nAssignment Agent:")
+
+    # Determine the user's emotional state from the conversation history
+    # (the tracker only reads messages it has not seen yet).
+    tracker = (tracker or MoodTracker()).update(messages)
+    user_feeling = tracker.first_mood(FEELINGS)
 
     # If no clear emotional state is detected, ask the user explicitly.
     if user_feeling is None:
         clarification = "I'm here to help. Could you clarify how you're feeling right now?"
-        print("Assignment Agent:", clarification)
-        user_feeling = input("You: ").lower()
+        io.say("Assignment Agent:", clarification)
+        user_feeling = io.ask("You: ").lower()
         if user_feeling == "exit":
             return None
         messages.append({"role": "user", "content": clarification + " " + user_feeling})
@@ -98,14 +95,14 @@ def assignment_agent(messages):
         q2 = "Have you noticed any patterns in your emotions recently?"
 
     # Ask the tailored follow-up questions.
-    print("Assignment Agent:", q1)
-    answer1 = input("You: ")
+    io.say("Assignment Agent:", q1)
+    answer1 = io.ask("You: ")
     if answer1.lower() == "exit":
         return None
     messages.append({"role": "user", "content": q1 + " " + answer1})
 
-    print("Assignment Agent:", q2)
-    answer2 = input("You: ")
+    io.say("Assignment Agent:", q2)
+    answer2 = io.ask("You: ")
     if answer2.lower() == "exit":
         return None
     messages.append({"role": "user", "content": q2 + " " + answer2})
@@ -115,34 +112,36 @@ def assignment_agent(messages):
                          "tailored recommendations and actionable self-care or professional advice.")
     messages.append({"role": "user", "content": conclusion_prompt})
 
-    response = client.chat.completions.create(
-        model="llama-3.2-1b-instruct",
-        messages=messages
-    )
-
-    conclusion = response.choices[0].message.content
-    print("\nAssignment Agent Conclusion:", conclusion)
+    conclusion = gateway.stream(
+        SMALL_MODEL,
+        messages,
+        prefix="\nAssignment Agent Conclusion: ",
+        stream=STREAM_RESPONSES,
+        node="assignment",
+        write=io.write
+    ).content
     messages.append({"role": "assistant", "content": conclusion})
     return messages
 
-def support_agent(messages):
+def support_agent(messages, io=None):
     """
     Support Agent:
       - After the conclusion, checks if the user needs any additional support.
       - If the user requires more support, further questions are asked and additional AI-generated advice is provided.
     """
-    print("\nSupport Agent:")
+    io = io or ConsoleIO()
+    io.say("\nSupport Agent:")
     support_query = "Do you feel that you need any additional support or guidance at this moment? (yes/no)"
-    print("Support Agent:", support_query)
-    answer = input("You: ")
+    io.say("Support Agent:", support_query)
+    answer = io.ask("You: ")
     if answer.lower() == "exit":
         return None
     messages.append({"role": "user", "content": support_query + " " + answer})
     
     if answer.strip().lower() in ["yes", "y"]:
         followup_support = "Could you please elaborate on what kind of support you need or what you're currently struggling with?"
-        print("Support Agent:", followup_support)
-        support_details = input("You: ")
+        io.say("Support Agent:", followup_support)
+        support_details = io.ask("You: ")
         if support_details.lower() == "exit":
             return None
         messages.append({"role": "user", "content": followup_support + " " + support_details})
@@ -152,52 +151,57 @@ def support_agent(messages):
                                      "please provide further guidance, self-care tips, or suggestions to help address the issues mentioned.")
         messages.append({"role": "user", "content": additional_support_prompt})
         
-        response = client.chat.completions.create(
-            model="llama-3.2-1b-instruct",
-            messages=messages
-        )
-        additional_recommendation = response.choices[0].message.content
-        print("\nSupport Agent Additional Recommendations:", additional_recommendation)
+        additional_recommendation = gateway.stream(
+            SMALL_MODEL,
+            messages,
+            prefix="\nSupport Agent Additional Recommendations: ",
+            stream=STREAM_RESPONSES,
+            node="support",
+            write=io.write
+        ).content
         messages.append({"role": "assistant", "content": additional_recommendation})
     else:
-        print("Support Agent: Alright. Remember, if you ever feel like you need more help, please don't hesitate to reach out.")
+        io.say("Support Agent: Alright. Remember, if you ever feel like you need more help, please don't hesitate to reach out.")
 
-    print("\nThank you for chatting today. Take care!")
+    io.say("\nThank you for chatting today. Take care!")
     return messages
 
-def run_workflow():
+def run_workflow(io=None):
     """
     Runs the multi-agent workflow:
       1. Reception Agent collects an initial message.
       2. Analysis Agent probes deeper into the user's feelings.
       3. Assignment Agent asks tailored follow-up questions and provides a conclusion.
       4. Support Agent checks if further support is needed and, if so, provides additional recommendations.
+    io selects where questions are asked and answers shown (the console by default).
     """
+    io = io or ConsoleIO()
+    tracker = MoodTracker()  # this session's running mood scores
     messages = []
-    print("Chatbot started! Type 'exit' at any prompt to end the conversation.\n")
+    io.say("Chatbot started! Type 'exit' at any prompt to end the conversation.\n")
     
     # Reception Agent
-    messages = reception_agent(messages)
+    messages = reception_agent(messages, io)
     if messages is None:
-        print("Ending chat. Goodbye!")
+        io.say("Ending chat. Goodbye!")
         return
     
     # Analysis Agent
-    messages = analysis_agent(messages)
+    messages = analysis_agent(messages, io)
     if messages is None:
-        print("Ending chat. Goodbye!")
+        io.say("Ending chat. Goodbye!")
         return
     
     # Assignment Agent
-    messages = assignment_agent(messages)
+    messages = assignment_agent(messages, io, tracker)
     if messages is None:
-        print("Ending chat. Goodbye!")
+        io.say("Ending chat. Goodbye!")
         return
 
     # Support Agent
-    messages = support_agent(messages)
+    messages = support_agent(messages, io)
     if messages is None:
-        print("Ending chat. Goodbye!")
+        io.say("Ending chat. Goodbye!")
         return
 
 if __name__ == "__main__":
@@ -1,94 +1,99 @@
 from langgraph.graph import StateGraph, START, END
-from openai import OpenAI
 from IPython.display import Image, display
-from pydantic import BaseModel
+import operator
+from typing import Annotated
+from typing_extensions import TypedDict
+from llm_gateway import gateway, SMALL_MODEL
+from model_router import router
+from session_io import ConsoleIO, get_io, session_node, sync_node
+from graph_registry import graphs
+from mood_tracker import MoodTracker
 
-# Initialize the OpenAI client.
-client = OpenAI(base_url="http://localhost:1234/v1", api_key="not-needed")
+# Print conclusions and recommendations token by token as they are generated
+STREAM_RESPONSES = True
 
-# Define the state schema using Pydantic
-class ChatState(BaseModel):
-    messages: list = []
-    exit: bool = False
-    mood: str = ""
+# Feelings the assignment agent has tailored questions for
+FEELINGS = ("anxious", "depressed", "suicidal", "happy")
+
+# Define the state schema (plain dict; LangGraph neither validates nor copies it)
+class ChatState(TypedDict, total=False):
+    messages: Annotated[list, operator.add]  # append-only: nodes return just their new messages
+    exit: bool
+    mood: str
+    mood_tracker: dict  # MoodTracker.dump(); catches up on new messages only
+
+def new_chat_state() -> ChatState:
+    return {"messages": [], "exit": False, "mood": "", "mood_tracker": {}}
 
 # --- Define the Agent Functions (Graph Nodes) ---
 
-def reception_agent_node(state: ChatState) -> ChatState:
+@session_node
+async def reception_agent_node(state: ChatState, config=None) -> ChatState:
     """
     Reception Agent:
       - Greets the user.
       - Asks for a brief introduction about themselves and their day.
     """
-    print("\n[Reception Agent]: Hello, welcome to our mental health chat!")
-    print("[Reception Agent]: Can you tell me a bit about yourself and how your day is going?")
+    io = get_io(config)
+    new = []  # messages this node adds; the reducer appends them to the history
+    io.say("\n[Reception Agent]: Hello, welcome to our mental health chat!")
+    io.say("[Reception Agent]: Can you tell me a bit about yourself and how your day is going?")
     
-    user_input = input("You: ")
+    user_input = await io.aask("You: ")
     if user_input.lower() == "exit":
-        state.exit = True
-        return state
+        return {"messages": new, "exit": True}
     
-    state.messages.append({"role": "user", "content": user_input})
-    return state
+    new.append({"role": "user", "content": user_input})
+    return {"messages": new}
 
-def analysis_agent_node(state: ChatState) -> ChatState:
+@session_node
+async def analysis_agent_node(state: ChatState, config=None) -> ChatState:
     """
     Analysis Agent:
       - Asks the user how they are feeling.
       - If the user expresses negative emotions, asks for further details.
     """
-    print("\n[Analysis Agent]: How are you feeling right now? (e.g., anxious, depressed, suicidal, happy, etc.)")
-    feeling = input("You: ")
+    io = get_io(config)
+    new = []  # messages this node adds; the reducer appends them to the history
+    io.say("\n[Analysis Agent]: How are you feeling right now? (e.g., anxious, depressed, suicidal, happy, etc.)")
+    feeling = await io.aask("You: ")
     if feeling.lower() == "exit":
-        state.exit = True
-        return state
-    state.messages.append({"role": "user", "content": feeling})
+        return {"messages": new, "exit": True}
+    new.append({"role": "user", "content": feeling})
     
     if feeling.lower() in ["anxious", "depressed", "suicidal"]:
-        print("[Analysis Agent]: Can you share more about why you're feeling this way?")
-        reason = input("You: ")
+        io.say("[Analysis Agent]: Can you share more about why you're feeling this way?")
+        reason = await io.aask("You: ")
         if reason.lower() == "exit":
-            state.exit = True
-            return state
-        state.messages.append({"role": "user", "content": reason})
+            return {"messages": new, "exit": True}
+        new.append({"role": "user", "content": reason})
     
-    return state
+    return {"messages": new}
 
-def assignment_agent_node(state: ChatState) -> ChatState:
+@session_node
+async def assignment_agent_node(state: ChatState, config=None) -> ChatState:
     """
     Assignment Agent:
       - Reviews the conversation history to determine the user's emotional state.
       - Asks tailored follow-up questions based on that state.
       - Uses the conversation history to prompt the AI for a conclusion and recommendations.
     """
-    print("\n[Assignment Agent]:")
-    messages = state.messages
-    user_feeling = None
-
-    # Try to determine the user's emotional state from prior inputs.
-    for msg in messages:
-        if msg["role"] == "user":
-            content = msg["content"].lower()
-            if any(feeling in content for feeling in ["anxious", "depressed", "suicidal", "happy"]):
-                if "anxious" in content:
-                    user_feeling = "anxious"
-                elif "depressed" in content:
-                    user_feeling = "depressed"
-                elif "suicidal" in content:
-                    user_feeling = "suicidal"
-                elif "happy" in content:
-                    user_feeling = "happy"
-                break
+    io = get_io(config)
+    new = []  # messages this node adds; the reducer appends them to the history
+    io.say("\n[Assignment Agent]:")
+
+    # Try to determine the user's emotional state from prior inputs (the first message naming a feeling).
+    tracker = MoodTracker.load(state.get("mood_tracker")).update(state["messages"])
+    user_feeling = tracker.first_mood(FEELINGS)
 
     # Store the detected mood in the state.
     if user_feeling is None:
-        print("[Assignment Agent]: I'm here to help. Could you clarify how you're feeling right now?")
-        user_feeling = input("You: ").lower()
+        io.say("[Assignment Agent]: I'm here to help. Could you clarify how you're feeling right now?")
+        user_feeling = (await io.aask("You: ")).lower()
         if user_feeling == "exit":
-            state.exit = True
-            return state
-        messages.append({"role": "user", "content": "Clarified feeling: " + user_feeling})
-    state.mood = user_feeling
+            return {"messages": new, "exit": True}
+        new.append({"role": "user", "content": "Clarified feeling: " + user_feeling})
+    mood = user_feeling
 
     # Set tailored follow-up questions.
     if user_feeling == "anxious":
@@ -108,102 +113,119 @@ def assignment_agent_node(state: ChatState) -> ChatState:
         q2 = "Have you noticed any patterns in your emotions recently?"
     
     # Ask the tailored follow-up questions.
-    print("[Assignment Agent]:", q1)
-    answer1 = input("You: ")
+    io.say("[Assignment Agent]:", q1)
+    answer1 = await io.aask("You: ")
     if answer1.lower() == "exit":
-        state.exit = True
-        return state
-    messages.append({"role": "user", "content": q1 + " " + answer1})
+        return {"messages": new, "mood": mood, "exit": True}
+    new.append({"role": "user", "content": q1 + " " + answer1})
     
-    print("[Assignment Agent]:", q2)
-    answer2 = input("You: ")
+    io.say("[Assignment Agent]:", q2)
+    answer2 = await io.aask("You: ")
     if answer2.lower() == "exit":
-        state.exit = True
-        return state
-    messages.append({"role": "user", "content": q2 + " " + answer2})
+        return {"messages": new, "mood": mood, "exit": True}
+    new.append({"role": "user", "content": q2 + " " + answer2})
     
     # Append a prompt to generate a conclusion.
     conclusion_prompt = ("Based on our conversation so far, please provide a thoughtful conclusion along with "
                          "tailored recommendations and actionable self-care or professional advice.")
-    messages.append({"role": "user", "content": conclusion_prompt})
+    new.append({"role": "user", "content": conclusion_prompt})
     
-    response = client.chat.completions.create(
-        model="deepseek-r1-distill-qwen-7b",
-        messages=messages
-    )
-    conclusion = response.choices[0].message.content
-    print("\n[Assignment Agent Conclusion]:", conclusion)
-    messages.append({"role": "assistant", "content": conclusion})
+    async def conclude():
+        return (await gateway.astream(
+            router.route("conclusion"),
+            state["messages"] + new,
+            prefix="\n[Assignment Agent Conclusion]: ",
+            stream=STREAM_RESPONSES,
+            node="assignment",
+            write=io.write
+        )).content
+
+    conclusion = await io.amemo(conclude)
+    new.append({"role": "assistant", "content": conclusion})
     
-    return state
+    return {"messages": new, "mood": mood, "mood_tracker": tracker.dump()}
 
-def support_agent_node(state: ChatState) -> ChatState:
+@session_node
+async def support_agent_node(state: ChatState, config=None) -> ChatState:
     """
     Support Agent:
       - Asks if the user needs any additional support.
       - If yes, collects further details and prompts the AI for extra recommendations.
     """
-    print("\n[Support Agent]:")
+    io = get_io(config)
+    new = []  # messages this node adds; the reducer appends them to the history
+    io.say("\n[Support Agent]:")
     support_query = "Do you feel that you need any additional support or guidance at this moment? (yes/no)"
-    print("[Support Agent]:", support_query)
-    answer = input("You: ")
+    io.say("[Support Agent]:", support_query)
+    answer = await io.aask("You: ")
     if answer.lower() == "exit":
-        state.exit = True
-        return state
-    state.messages.append({"role": "user", "content": support_query + " " + answer})
+        return {"messages": new, "exit": True}
+    new.append({"role": "user", "content": support_query + " " + answer})
     
     if answer.strip().lower() in ["yes", "y"]:
         followup_support = "Could you please elaborate on what kind of support you need or what you're currently struggling with?"
-        print("[Support Agent]:", followup_support)
-        support_details = input("You: ")
+        io.say("[Support Agent]:", followup_support)
+        support_details = await io.aask("You: ")
         if support_details.lower() == "exit":
-            state.exit = True
-            return state
-        state.messages.append({"role": "user", "content": followup_support + " " + support_details})
+            return {"messages": new, "exit": True}
+        new.append({"role": "user", "content": followup_support + " " + support_details})
         
         additional_support_prompt = ("Based on our entire conversation, including your recent input about needing additional support, "
                                      "please provide further guidance, self-care tips, or suggestions to help address the issues mentioned.")
-        state.messages.append({"role": "user", "content": additional_support_prompt})
+        new.append({"role": "user", "content": additional_support_prompt})
         
-        response = client.chat.completions.create(
-            model="llama-3.2-1b-instruct",
-            messages=state.messages
-        )
-        additional_recommendation = response.choices[0].message.content
-        print("\n[Support Agent Additional Recommendations]:", additional_recommendation)
-        state.messages.append({"role": "assistant", "content": additional_recommendation})
+        # This graph has always answered follow-up support on the small model
+        async def recommend():
+            return (await gateway.astream(
+                SMALL_MODEL,
+                state["messages"] + new,
+                prefix="\n[Support Agent Additional Recommendations]: ",
+                stream=STREAM_RESPONSES,
+                node="support",
+                write=io.write
+            )).content
+
+        additional_recommendation = await io.amemo(recommend)
+        new.append({"role": "assistant", "content": additional_recommendation})
     else:
-        print("[Support Agent]: Alright. Remember, if you ever feel like you need more help, please don't hesitate to reach out.")
+        io.say("[Support Agent]: Alright. Remember, if you ever feel like you need more help, please don't hesitate to reach out.")
     
-    print("\nThank you for chatting today. Take care!")
-    return state
+    io.say("\nThank you for chatting today. Take care!")
+    return {"messages": new}
 
-def counselor_recommendation_node(state: ChatState) -> ChatState:
+@session_node
+async def counselor_recommendation_node(state: ChatState, config=None) -> ChatState:
     """
     Counselor Recommendation Agent:
       - Provides a counselor recommendation if the user's mood is serious (suicidal).
     """
-    print("\n[Counselor Recommendation]:")
+    io = get_io(config)
+    new = []  # messages this node adds; the reducer appends them to the history
+    io.say("\n[Counselor Recommendation]:")
     rec = "It might be helpful to talk to a professional. I strongly recommend contacting a counselor immediately."
-    print("[Counselor Recommendation]:", rec)
-    state.messages.append({"role": "assistant", "content": rec})
-    return state
+    io.say("[Counselor Recommendation]:", rec)
+    new.append({"role": "assistant", "content": rec})
+    return {"messages": new}
 
 # --- Build and Run the StateGraph Workflow ---
 
-def run_workflow():
-    # Initialize state with default values
-    state = ChatState()
-    
-    # Create a StateGraph with our Pydantic state schema
+def build_graph(use_async: bool = False) -> StateGraph:
+    """
+    Workflow graph:
+      - Uncompiled, so the caller picks the checkpointer (SessionEngine) or none (console).
+      - The agents are async (AsyncOpenAI through the gateway), for app.ainvoke;
+        without use_async each is wrapped to run on its own event loop under app.invoke.
+    """
+    # Create a StateGraph with our state schema
     graph = StateGraph(ChatState)
+    wrap = (lambda node: node) if use_async else sync_node
     
     # Define nodes and transitions
-    graph.add_node("reception", reception_agent_node)
-    graph.add_node("analysis", analysis_agent_node)
-    graph.add_node("assignment", assignment_agent_node)
-    graph.add_node("support", support_agent_node)
-    graph.add_node("counselor_recommendation", counselor_recommendation_node)
+    graph.add_node("reception", wrap(reception_agent_node))
+    graph.add_node("analysis", wrap(analysis_agent_node))
+    graph.add_node("assignment", wrap(assignment_agent_node))
+    graph.add_node("support", wrap(support_agent_node))
+    graph.add_node("counselor_recommendation", wrap(counselor_recommendation_node))
 
     # Set up the workflow
     graph.add_edge(START, "reception")
@@ -212,21 +234,40 @@ def run_workflow():
     graph.add_edge("assignment", "support")
     graph.add_conditional_edges(
         "support",
-        lambda state: "counselor_recommendation" if state.mood == "suicidal" else END
+        lambda state: "counselor_recommendation" if state["mood"] == "suicidal" else END
     )
     graph.add_edge("counselor_recommendation", END)
+    return graph
 
-    # Compile and run the graph
-    app = graph.compile()
-    final_state = app.invoke(state)
+def run_workflow(io=None):
+    io = io or ConsoleIO()
 
-    # display(Image(graph.get_graph().draw_mermaid_png()))
+    # Reuse the compiled graph; only the state is new per session
+    app, state = graphs.session("test_2", build_graph, new_chat_state)
+    final_state = app.invoke(state, {"configurable": {"io": io}})
+
+    # display(Image(app.get_graph().draw_mermaid_png()))
 
 
     
-    if final_state.exit:
-        print("Ending chat. Goodbye!")
+    if final_state["exit"]:
+        io.say("Ending chat. Goodbye!")
+
+async def run_workflow_async(state: ChatState = None, io=None) -> ChatState:
+    """
+    Async workflow:
+      - Runs one session with app.ainvoke; the agents await the model server and the user.
+      - Many of these can be gathered on one event loop.
+    """
+    io = io or ConsoleIO()
+    app, new_state = graphs.session("test_2.async", lambda: build_graph(use_async=True), new_chat_state)
+    state = state or new_state
+    final_state = await app.ainvoke(state, {"configurable": {"io": io}})
+
+    if final_state["exit"]:
+        io.say("Ending chat. Goodbye!")
+    return final_state
 
 if __name__ == "__main__":
     print("Chatbot started! Type 'exit' at any prompt to end the conversation.\n")
-    run_workflow()
\ No newline at end of file
+    run_workflow()
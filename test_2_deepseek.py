@@ -1,15 +1,21 @@
 from langgraph.graph import StateGraph, START, END
-from openai import OpenAI
-from pydantic import BaseModel
+import operator
+from typing import Annotated
+from typing_extensions import TypedDict
+from llm_gateway import gateway, SMALL_MODEL
+from graph_registry import graphs
 
-# Initialize the OpenAI client.
-client = OpenAI(base_url="http://localhost:1234/v1", api_key="not-needed")
+# Print conclusions and recommendations token by token as they are generated
+STREAM_RESPONSES = True
 
-# Define the state schema using Pydantic
-class ChatState(BaseModel):
-    messages: list = []
-    exit: bool = False
-    mood: str = ""
+# Define the state schema (plain dict; LangGraph neither validates nor copies it)
+class ChatState(TypedDict, total=False):
+    messages: Annotated[list, operator.add]  # append-only: nodes return just their new messages
+    exit: bool
+    mood: str
+
+def new_chat_state() -> ChatState:
+    return {"messages": [], "exit": False, "mood": ""}
 
 # --- Define the Agent Functions (Graph Nodes) ---
 
@@ -19,16 +25,16 @@ def reception_agent_node(state: ChatState) -> ChatState:
       - Greets the user.
       - Asks for a brief introduction about themselves and their day.
     """
+    new = []  # messages this node adds; the reducer appends them to the history
     print("\n[Reception Agent]: Hello, welcome to our mental health chat!")
     print("[Reception Agent]: Can you tell me a bit about yourself and how your day is going?")
     
     user_input = input("You: ")
     if user_input.lower() == "exit":
-        state.exit = True
-        return state
+        return {"messages": new, "exit": True}
     
-    state.messages.append({"role": "user", "content": user_input})
-    return state
+    new.append({"role": "user", "content": user_input})
+    return {"messages": new}
 
 def analysis_agent_node(state: ChatState) -> ChatState:
     """
@@ -36,22 +42,21 @@ def analysis_agent_node(state: ChatState) -> ChatState:
       - Asks the user how they are feeling.
       - If the user expresses negative emotions, asks for further details.
     """
+    new = []  # messages this node adds; the reducer appends them to the history
     print("\n[Analysis Agent]: How are you feeling right now? (e.g., anxious, depressed, suicidal, happy, etc.)")
     feeling = input("You: ")
     if feeling.lower() == "exit":
-        state.exit = True
-        return state
-    state.messages.append({"role": "user", "content": feeling})
+        return {"messages": new, "exit": True}
+    new.append({"role": "user", "content": feeling})
     
     if feeling.lower() in ["anxious", "depressed", "suicidal"]:
         print("[Analysis Agent]: Can you share more about why you're feeling this way?")
         reason = input("You: ")
         if reason.lower() == "exit":
-            state.exit = True
-            return state
-        state.messages.append({"role": "user", "content": reason})
+            return {"messages": new, "exit": True}
+        new.append({"role": "user", "content": reason})
     
-    return state
+    return {"messages": new}
 
 def assignment_agent_node(state: ChatState) -> ChatState:
     """
@@ -60,12 +65,12 @@ def assignment_agent_node(state: ChatState) -> ChatState:
       - Asks tailored follow-up questions based on that state.
       - Uses the conversation history to prompt the AI for a conclusion and recommendations.
     """
+    new = []  # messages this node adds; the reducer appends them to the history
     print("\n[Assignment Agent]:")
-    messages = state.messages
     user_feeling = None
 
     # Try to determine the user's emotional state from prior inputs.
-    for msg in messages:
+    for msg in state["messages"]:
         if msg["role"] == "user":
             content = msg["content"].lower()
             if any(feeling in content for feeling in ["anxious", "depressed", "suicidal", "happy"]):
@@ -84,10 +89,9 @@ def assignment_agent_node(state: ChatState) -> ChatState:
         print("[Assignment Agent]: I'm here to help. Could you clarify how you're feeling right now?")
         user_feeling = input("You: ").lower()
         if user_feeling == "exit":
-            state.exit = True
-            return state
-        messages.append({"role": "user", "content": "Clarified feeling: " + user_feeling})
-    state.mood = user_feeling
+            return {"messages": new, "exit": True}
+        new.append({"role": "user", "content": "Clarified feeling: " + user_feeling})
+    mood = user_feeling
 
     # Set tailored follow-up questions.
     if user_feeling == "anxious":
@@ -110,31 +114,30 @@ def assignment_agent_node(state: ChatState) -> ChatState:
     print("[Assignment Agent]:", q1)
     answer1 = input("You: ")
     if answer1.lower() == "exit":
-        state.exit = True
-        return state
-    messages.append({"role": "user", "content": q1 + " " + answer1})
+        return {"messages": new, "mood": mood, "exit": True}
+    new.append({"role": "user", "content": q1 + " " + answer1})
     
     print("[Assignment Agent]:", q2)
     answer2 = input("You: ")
     if answer2.lower() == "exit":
-        state.exit = True
-        return state
-    messages.append({"role": "user", "content": q2 + " " + answer2})
+        return {"messages": new, "mood": mood, "exit": True}
+    new.append({"role": "user", "content": q2 + " " + answer2})
     
     # Append a prompt to generate a conclusion.
     conclusion_prompt = ("Based on our conversation so far, please provide a thoughtful conclusion along with "
                          "tailored recommendations and actionable self-care or professional advice.")
-    messages.append({"role": "user", "content": conclusion_prompt})
+    new.append({"role": "user", "content": conclusion_prompt})
     
-    response = client.chat.completions.create(
-        model="llama-3.2-1b-instruct",
-        messages=messages
-    )
-    conclusion = response.choices[0].message.content
-    print("\n[Assignment Agent Conclusion]:", conclusion)
-    messages.append({"role": "assistant", "content": conclusion})
+    conclusion = gateway.stream(
+        SMALL_MODEL,
+        state["messages"] + new,
+        prefix="\n[Assignment Agent Conclusion]: ",
+        stream=STREAM_RESPONSES,
+        node="assignment"
+    ).content
+    new.append({"role": "assistant", "content": conclusion})
     
-    return state
+    return {"messages": new, "mood": mood}
 
 def support_agent_node(state: ChatState) -> ChatState:
     """
@@ -142,59 +145,57 @@ def support_agent_node(state: ChatState) -> ChatState:
       - Asks if the user needs any additional support.
       - If yes, collects further details and prompts the AI for extra recommendations.
     """
+    new = []  # messages this node adds; the reducer appends them to the history
     print("\n[Support Agent]:")
     support_query = "Do you feel that you need any additional support or guidance at this moment? (yes/no)"
     print("[Support Agent]:", support_query)
     answer = input("You: ")
     if answer.lower() == "exit":
-        state.exit = True
-        return state
-    state.messages.append({"role": "user", "content": support_query + " " + answer})
+        return {"messages": new, "exit": True}
+    new.append({"role": "user", "content": support_query + " " + answer})
     
     if answer.strip().lower() in ["yes", "y"]:
         followup_support = "Could you please elaborate on what kind of support you need or what you're currently struggling with?"
         print("[Support Agent]:", followup_support)
         support_details = input("You: ")
         if support_details.lower() == "exit":
-            state.exit = True
-            return state
-        state.messages.append({"role": "user", "content": followup_support + " " + support_details})
+            return {"messages": new, "exit": True}
+        new.append({"role": "user", "content": followup_support + " " + support_details})
         
         additional_support_prompt = ("Based on our entire conversation, including your recent input about needing additional support, "
                                      "please provide further guidance, self-care tips, or suggestions to help address the issues mentioned.")
-        state.messages.append({"role": "user", "content": additional_support_prompt})
+        new.append({"role": "user", "content": additional_support_prompt})
         
-        response = client.chat.completions.create(
-            model="llama-3.2-1b-instruct",
-            messages=state.messages
-        )
-        additional_recommendation = response.choices[0].message.content
-        print("\n[Support Agent Additional Recommendations]:", additional_recommendation)
-        state.messages.append({"role": "assistant", "content": additional_recommendation})
+        additional_recommendation = gateway.stream(
+            SMALL_MODEL,
+            state["messages"] + new,
+            prefix="\n[Support Agent Additional Recommendations]: ",
+            stream=STREAM_RESPONSES,
+            node="support"
+        ).content
+        new.append({"role": "assistant", "content": additional_recommendation})
     else:
         print("[Support Agent]: Alright. Remember, if you ever feel like you need more help, please don't hesitate to reach out.")
     
     print("\nThank you for chatting today. Take care!")
-    return state
+    return {"messages": new}
 
 def counselor_recommendation_node(state: ChatState) -> ChatState:
     """
     Counselor Recommendation Agent:
       - Provides a counselor recommendation if the user's mood is serious (suicidal).
     """
+    new = []  # messages this node adds; the reducer appends them to the history
     print("\n[Counselor Recommendation]:")
     rec = "It might be helpful to talk to a professional. I strongly recommend contacting a counselor immediately."
     print("[Counselor Recommendation]:", rec)
-    state.messages.append({"role": "assistant", "content": rec})
-    return state
+    new.append({"role": "assistant", "content": rec})
+    return {"messages": new}
 
 # --- Build and Run the StateGraph Workflow ---
 
-def run_workflow():
-    # Initialize state with default values
-    state = ChatState()
-    
-    # Create a StateGraph with our Pydantic state schema
+def build_graph() -> StateGraph:
+    # Create a StateGraph with our state schema
     graph = StateGraph(ChatState)
     
     # Define nodes and transitions
@@ -211,15 +212,17 @@ def run_workflow():
     graph.add_edge("assignment", "support")
     graph.add_conditional_edges(
         "support",
-        lambda state: "counselor_recommendation" if state.mood == "suicidal" else END
+        lambda state: "counselor_recommendation" if state["mood"] == "suicidal" else END
     )
     graph.add_edge("counselor_recommendation", END)
+    return graph
 
-    # Compile and run the graph
-    app = graph.compile()
+def run_workflow():
+    # Compiled once per process; each session only gets a fresh state
+    app, state = graphs.session("test_2_deepseek", build_graph, new_chat_state)
     final_state = app.invoke(state)
     
-    if final_state.exit:
+    if final_state["exit"]:
         print("Ending chat. Goodbye!")
 
 if __name__ == "__main__":
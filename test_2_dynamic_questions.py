@@ -1,15 +1,28 @@
+import time
 from langgraph.graph import StateGraph, START, END
-from openai import OpenAI
-from pydantic import BaseModel
-
-# Initialize OpenAI client
-client = OpenAI(base_url="http://localhost:1234/v1", api_key="not-needed")
-
-# Define the state schema
-class ChatState(BaseModel):
-    messages: list = []
-    exit: bool = False
-    mood: str = ""
+import operator
+from typing import Annotated
+from typing_extensions import TypedDict
+from llm_gateway import gateway
+from model_router import router
+from semantic_cache import SemanticQuestionCache, conversation_text
+from structured_output import generate_questions
+from graph_registry import graphs
+
+# Print conclusions and recommendations token by token as they are generated
+STREAM_RESPONSES = True
+
+# Follow-up question sets reused across similar conversations
+question_cache = SemanticQuestionCache()
+
+# Define the state schema (plain dict; LangGraph neither validates nor copies it)
+class ChatState(TypedDict, total=False):
+    messages: Annotated[list, operator.add]  # append-only: nodes return just their new messages
+    exit: bool
+    mood: str
+
+def new_chat_state() -> ChatState:
+    return {"messages": [], "exit": False, "mood": ""}
 
 # --- Analysis Agent (Merged Reception) ---
 def analysis_agent_node(state: ChatState) -> ChatState:
@@ -20,50 +33,46 @@ def analysis_agent_node(state: ChatState) -> ChatState:
       - Deduces mood after all responses.
       - Provides AI-powered conclusions.
     """
+    # The stored history plus this node's own turns; only the latter are returned
+    history = list(state["messages"])
+    start = len(history)
     print("\n[Analysis Agent]: Hello! Welcome to our mental health chat.")
     print("[Analysis Agent]: Could you tell me a bit about yourself and how your day has been?")
 
     user_input = input("You: ")
     if user_input.lower() == "exit":
-        state.exit = True
-        return state
+        return {"messages": history[start:], "exit": True}
 
-    state.messages.append({"role": "user", "content": user_input})
+    history.append({"role": "user", "content": user_input})
 
     # Generate dynamic follow-up questions (4 total)
     for i in range(2):  # Two rounds of 2 questions each
         followup_prompt = """Based on this conversation, generate 2 relevant follow-up questions 
-        to better understand the user's situation. Format as:
-        1. [Question 1]
-        2. [Question 2]"""
-
-        temp_messages = state.messages + [{"role": "user", "content": followup_prompt}]
-        
-        response = client.chat.completions.create(
-            model="deepseek-r1-distill-qwen-7b",
-            messages=temp_messages
-        )
-        generated_questions = response.choices[0].message.content
+        to better understand the user's situation."""
 
-        # Extract and ask questions
-        questions = [line.split('. ', 1)[-1].strip() for line in generated_questions.split('\n') if line.strip().startswith(('1.', '2.', '- '))]
+        # Reuse the questions of a similar earlier conversation when there is one
+        questions, context_vector = question_cache.lookup(conversation_text(history), bucket=i)
+        if questions is None:
+            # Generate the questions as a validated JSON object
+            started = time.perf_counter()
+            questions = generate_questions(gateway, router.route("questions"), history, followup_prompt)
+            question_cache.add(context_vector, questions[:2], time.perf_counter() - started, bucket=i)
 
         for question in questions[:2]:
             print(f"\n[Analysis Agent]: {question}")
             answer = input("You: ")
             if answer.lower() == "exit":
-                state.exit = True
-                return state
-            state.messages.append({"role": "user", "content": f"{question} {answer}"})
+                return {"messages": history[start:], "exit": True}
+            history.append({"role": "user", "content": f"{question} {answer}"})
 
     # Infer mood based on responses
-    full_text = " ".join([msg["content"] for msg in state.messages if msg["role"] == "user"]).lower()
+    full_text = " ".join([msg["content"] for msg in history if msg["role"] == "user"]).lower()
     detected_mood = None
     for emotion in ["anxious", "depressed", "suicidal", "happy", "stressed", "overwhelmed"]:
         if emotion in full_text:
             detected_mood = emotion
             break
-    state.mood = detected_mood or "neutral"
+    mood = detected_mood or "neutral"
 
     # Generate conclusion
     conclusion_prompt = """Based on our conversation, provide:
@@ -71,17 +80,18 @@ def analysis_agent_node(state: ChatState) -> ChatState:
     2. Personalized recommendations
     3. Actionable steps"""
 
-    state.messages.append({"role": "user", "content": conclusion_prompt})
+    history.append({"role": "user", "content": conclusion_prompt})
     
-    response = client.chat.completions.create(
-        model="deepseek-r1-distill-qwen-7b",
-        messages=state.messages
-    )
-    conclusion = response.choices[0].message.content
-    print("\n[Analysis Agent Conclusion]:\n", conclusion)
-    state.messages.append({"role": "assistant", "content": conclusion})
+    conclusion = gateway.stream(
+        router.route("conclusion"),
+        history,
+        prefix="\n[Analysis Agent Conclusion]:\n ",
+        stream=STREAM_RESPONSES,
+        node="analysis"
+    ).content
+    history.append({"role": "assistant", "content": conclusion})
     
-    return state
+    return {"messages": history[start:], "mood": mood}
 
 # --- Support Agent ---
 def support_agent_node(state: ChatState) -> ChatState:
@@ -90,36 +100,36 @@ def support_agent_node(state: ChatState) -> ChatState:
       - Offers additional support options
       - Provides final recommendations
     """
+    new = []  # messages this node adds; the reducer appends them to the history
     print("\n[Support Agent]: Would you like to explore additional support options or resources? (yes/no)")
     answer = input("You: ")
     if answer.lower() == "exit":
-        state.exit = True
-        return state
-    state.messages.append({"role": "user", "content": answer})
+        return {"messages": new, "exit": True}
+    new.append({"role": "user", "content": answer})
 
     if answer.strip().lower() in ["yes", "y"]:
         print("[Support Agent]: What specific type of support are you looking for?")
         support_details = input("You: ")
         if support_details.lower() == "exit":
-            state.exit = True
-            return state
-        state.messages.append({"role": "user", "content": support_details})
+            return {"messages": new, "exit": True}
+        new.append({"role": "user", "content": support_details})
 
         support_prompt = f"""Based on the user's request for {support_details}, 
         provide 3-5 specific recommendations with contact information/resources."""
 
-        response = client.chat.completions.create(
-            model="deepseek-r1-distill-qwen-7b",
-            messages=state.messages
-        )
-        recommendations = response.choices[0].message.content
-        print("\n[Support Agent Recommendations]:\n", recommendations)
-        state.messages.append({"role": "assistant", "content": recommendations})
+        recommendations = gateway.stream(
+            router.route("support"),
+            state["messages"] + new,
+            prefix="\n[Support Agent Recommendations]:\n ",
+            stream=STREAM_RESPONSES,
+            node="support"
+        ).content
+        new.append({"role": "assistant", "content": recommendations})
     else:
         print("[Support Agent]: Remember, help is always available when you need it.")
 
     print("\nThank you for chatting today. Wishing you well!")
-    return state
+    return {"messages": new}
 
 # --- Counselor Recommendation ---
 def counselor_recommendation_node(state: ChatState) -> ChatState:
@@ -127,18 +137,18 @@ def counselor_recommendation_node(state: ChatState) -> ChatState:
     Counselor Recommendation:
       - Triggers emergency support if needed
     """
+    new = []  # messages this node adds; the reducer appends them to the history
     print("\n[Counselor Recommendation]:")
     rec = """Urgent Support Resources:
     - National Suicide Prevention Lifeline: 1-800-273-TALK (8255)
     - Crisis Text Line: Text HOME to 741741
     - Immediate local emergency services: 911"""
     print(rec)
-    state.messages.append({"role": "assistant", "content": rec})
-    return state
+    new.append({"role": "assistant", "content": rec})
+    return {"messages": new}
 
 # --- Build and Run the StateGraph Workflow ---
-def run_workflow():
-    state = ChatState()
+def build_graph() -> StateGraph:
     graph = StateGraph(ChatState)
     
     graph.add_node("analysis", analysis_agent_node)
@@ -149,14 +159,17 @@ def run_workflow():
     graph.add_edge("analysis", "support")
     graph.add_conditional_edges(
         "support",
-        lambda state: "counselor" if state.mood == "suicidal" else END
+        lambda state: "counselor" if state["mood"] == "suicidal" else END
     )
     graph.add_edge("counselor", END)
+    return graph
 
-    app = graph.compile()
+def run_workflow():
+    # Compiled once per process; each session only gets a fresh state
+    app, state = graphs.session("test_2_dynamic_questions", build_graph, new_chat_state)
     final_state = app.invoke(state)
 
-    if final_state.exit:
+    if final_state["exit"]:
         print("Ending chat. Goodbye!")
 
 if __name__ == "__main__":
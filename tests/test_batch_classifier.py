@@ -0,0 +1,69 @@
+import random
+import string
+
+import pytest
+
+from batch_classifier import KeywordClassifier
+
+# The rule sets the workflows route with
+WORKFLOW_RULES = {
+    "workflow": [
+        ("anxiety_support", ["anxious", "stressed"]),
+        ("depression_support", ["sad", "depressed"]),
+        ("crisis_intervention", ["hurt myself", "suicide"]),
+        ("neutral_state", ["happy", "good"]),
+    ],
+    "workflow_2": [
+        ("anxiety", ["anxious", "stressed"]),
+        ("depression", ["sad", "depressed"]),
+        ("neutral", ["fine", "okay"]),
+        ("cheerful", ["good", "okay"]),
+    ],
+    "workflow_1": [
+        ("crisis_intervention", ["suicide", "kill myself", "end it all", "die", "want to die"]),
+        ("anxiety_support", ["anxiety", "panic attack", "worried", "racing thoughts"]),
+        ("depression_support", ["depression", "sad", "can't go on", "lonely"]),
+    ],
+}
+
+FILLER = ["i", "feel", "so", "today", "at", "work", "goodbye", "sadness", "unhappy", "okayish", "myself", "want"]
+
+def corpus(rules, size=3000, seed=0):
+    rng = random.Random(seed)
+    vocabulary = FILLER + [kw for _, keywords in rules for kw in keywords]
+    return [" ".join(rng.choice(vocabulary).upper() if rng.random() < 0.1 else rng.choice(vocabulary)
+                     for _ in range(rng.randint(0, 10))) + rng.choice(("", ".", "!"))
+            for _ in range(size)]
+
+@pytest.mark.parametrize("workflow", sorted(WORKFLOW_RULES))
+@pytest.mark.parametrize("normalize", [None, lambda word: word.strip(string.punctuation)])
+@pytest.mark.parametrize("sparse", [None, True])
+def test_classify_many_matches_classify(workflow, normalize, sparse):
+    classifier = KeywordClassifier(WORKFLOW_RULES[workflow], default="general_support", normalize=normalize)
+    texts = corpus(classifier.rules)
+    assert classifier.classify_many(texts, sparse=sparse) == [classifier.classify(text) for text in texts]
+
+def test_sparse_path_only_where_it_wins():
+    import batch_classifier
+
+    assert not KeywordClassifier(WORKFLOW_RULES["workflow_2"], default="unknown").sparse
+    assert KeywordClassifier(WORKFLOW_RULES["workflow_2"], default="unknown", normalize=str.strip).sparse
+    many = [("rule", [f"keyword{i}" for i in range(batch_classifier.SCALAR_MAX_KEYWORDS + 1)])]
+    assert KeywordClassifier(many, default="unknown").sparse
+
+def test_classify_many_across_chunks_and_vocabulary_resets(monkeypatch):
+    import batch_classifier
+
+    monkeypatch.setattr(batch_classifier, "CHUNK_SIZE", 64)
+    classifier = KeywordClassifier(WORKFLOW_RULES["workflow_2"], default="unknown", max_vocabulary=20)
+    texts = corpus(classifier.rules, size=1000, seed=1)
+    assert classifier.classify_many(texts, sparse=True) == [classifier.classify(text) for text in texts]
+
+def test_classify_many_empty():
+    assert KeywordClassifier(WORKFLOW_RULES["workflow"], default="general_support").classify_many([]) == []
+
+def test_first_rule_wins():
+    classifier = KeywordClassifier(WORKFLOW_RULES["workflow_2"], default="unknown")
+    assert classifier.classify("I'm okay") == "neutral"  # "okay" is in two rules
+    assert classifier.classify("Not GOOD, just stressed") == "anxiety"
+    assert classifier.classify("nothing to report") == "unknown"
@@ -0,0 +1,67 @@
+import random
+import string
+
+import pytest
+
+from keyword_matcher import KeywordMatcher, PhraseAutomaton
+from lexicon import CATEGORY_ENHANCEMENTS, CATEGORY_SEEDS
+
+PRIORITY = ("crisis_intervention", "anxiety_support", "depression_support")
+
+# The seeds and enhancements without the WordNet expansion, so no corpus is needed
+KEYWORDS = {category: CATEGORY_SEEDS[category] + CATEGORY_ENHANCEMENTS[category] for category in PRIORITY}
+
+def normalize(word):
+    return word.strip(string.punctuation)
+
+def decide_category(user_input, keywords=KEYWORDS):
+    """workflow_1's decide_category before the matcher, up to the general_support fallback."""
+    user_input = user_input.lower()
+    words = [normalize(word) for word in user_input.split()]
+    for category in PRIORITY:
+        if any(phrase in user_input for phrase in keywords[category] if ' ' in phrase):
+            return category
+        if any(word in [w for w in keywords[category] if ' ' not in w] for word in words):
+            return category
+    return None
+
+def classify(matcher, user_input):
+    user_input = user_input.lower()
+    return matcher.classify(user_input, [normalize(word) for word in user_input.split()])
+
+@pytest.fixture(scope="module")
+def matcher():
+    return KeywordMatcher(KEYWORDS, PRIORITY)
+
+@pytest.mark.parametrize("text, category", [
+    ("I want to end it all", "crisis_intervention"),
+    ("Panic attack again, I feel sad", "anxiety_support"),       # anxiety outranks depression
+    ("so worried I could kill myself", "crisis_intervention"),  # crisis outranks anxiety
+    ("feeling empty and numb", "depression_support"),
+    ("I can't go on like this", "depression_support"),           # phrase with punctuation
+    ("Stressed!", "anxiety_support"),                             # word stripped of punctuation
+    ("panicky", None),                                            # words match whole tokens only
+    ("a lovely day", None),
+])
+def test_classify_examples(matcher, text, category):
+    assert classify(matcher, text) == category == decide_category(text)
+
+def test_classify_matches_decide_category(matcher):
+    rng = random.Random(0)
+    vocabulary = [kw for keywords in KEYWORDS.values() for kw in keywords]
+    vocabulary += ["i", "feel", "today", "work", "so", "kill-", "dying", "attack", "panicky", "go"]
+    for _ in range(5000):
+        words = [rng.choice(vocabulary) for _ in range(rng.randint(0, 8))]
+        text = " ".join(word.upper() if rng.random() < 0.1 else word + rng.choice(("", "", ",", "!"))
+                        for word in words)
+        assert classify(matcher, text) == decide_category(text), text
+
+def test_match_lists_every_category_in_priority_order(matcher):
+    text = "sad and anxious, i want to die"
+    assert matcher.match(text, text.replace(",", "").split()) == list(PRIORITY)
+
+def test_phrase_automaton_is_substring_search():
+    automaton = PhraseAutomaton({"he": 1, "she": 2, "hers": 4, "his": 8})
+    assert automaton.search("ushers") == 1 | 2 | 4
+    assert automaton.search("this") == 8
+    assert automaton.search("") == 0
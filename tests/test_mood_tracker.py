@@ -0,0 +1,27 @@
+from mood_tracker import MoodTracker, user_text
+
+FEELINGS = ("anxious", "depressed", "suicidal", "happy")
+
+def user(text):
+    return {"role": "user", "content": text}
+
+def test_first_mood_keeps_the_first_feeling():
+    messages = [user("I was happy this morning"), {"role": "assistant", "content": "Good."}, user("now anxious")]
+    tracker = MoodTracker().update(messages)
+    assert tracker.first_mood(FEELINGS) == "happy"
+    assert tracker.mood(FEELINGS) == "anxious"
+
+def test_first_mood_survives_a_checkpoint():
+    messages = [user("fine"), user("anxious and happy")]
+    tracker = MoodTracker.load(MoodTracker().update(messages[:1]).dump()).update(messages)
+    assert tracker.first_mood(FEELINGS) == "anxious"
+    assert tracker.first_mood(("happy", "depressed")) == "happy"
+
+def test_dump_holds_no_message_text():
+    messages = [user("a long day at work, I feel anxious " * 50)]
+    data = MoodTracker().update(messages).dump()
+    assert set(data) == {"scores", "seen", "first_seen"}
+    assert "work" not in repr(data)
+
+def test_user_text_joins_user_messages():
+    assert user_text([user("one"), {"role": "assistant", "content": "x"}, user("two")]) == "one two"
@@ -0,0 +1,32 @@
+from mood_tracker import MoodTracker
+from prefetch import Prefetcher, mood_inputs
+
+def user(text):
+    return {"role": "user", "content": text}
+
+def test_untaken_drafts_expire():
+    prefetcher = Prefetcher(ttl=0.0)
+    prefetcher.start("closed-session", [], lambda: "draft")
+    prefetcher.start("live-session", [], lambda: "draft")
+    assert prefetcher.stats()["pending"] == 1
+    assert prefetcher.take("closed-session", []) is None
+    assert prefetcher.take("live-session", []) == "draft"
+
+def test_oldest_drafts_go_first_beyond_max_pending():
+    prefetcher = Prefetcher(max_pending=2)
+    for key in ("a", "b", "c"):
+        prefetcher.start(key, [], lambda key=key: key)
+    assert prefetcher.take("a", []) is None
+    assert [prefetcher.take(key, []) for key in ("b", "c")] == ["b", "c"]
+
+def test_mood_inputs_change_only_with_the_emotions():
+    history = [user("I feel anxious about work")]
+    drafted_on = mood_inputs(MoodTracker(), history)
+    prefetcher = Prefetcher()
+    prefetcher.start("calm", history, lambda: "questions", inputs=drafted_on)
+    prefetcher.start("shifted", history, lambda: "questions", inputs=drafted_on)
+
+    calm = history + [user("deadlines, mostly")]
+    assert prefetcher.take("calm", calm, inputs=mood_inputs(MoodTracker(), calm)) == "questions"
+    shifted = history + [user("honestly I am depressed too")]
+    assert prefetcher.take("shifted", shifted, inputs=mood_inputs(MoodTracker(), shifted)) is None
@@ -0,0 +1,77 @@
+from types import SimpleNamespace
+
+from llm_streaming import collect_chat_completion
+from reasoning import ThinkFilter
+
+R1 = "deepseek-r1-distill-qwen-7b"
+
+REASONING = "Okay , the user had a hard day . I should answer gently and suggest one small step . ".split(" ")
+
+class FakeStream:
+    def __init__(self, pieces):
+        self.pieces = pieces
+        self.closed = False
+
+    def __iter__(self):
+        for piece in self.pieces:
+            if self.closed:
+                return
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))])
+
+    def close(self):
+        self.closed = True
+
+class FakeClient:
+    """Streams one scripted completion per create() call."""
+
+    def __init__(self, *completions):
+        self.completions = list(completions)
+        self.requests = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model, messages, stream=False, **params):
+        self.requests.append(messages)
+        return FakeStream(self.completions.pop(0))
+
+def words(text):
+    return [word + " " for word in text.split()]
+
+def test_implicitly_opened_reasoning_is_not_streamed():
+    # The template opened <think>; the model only writes the close tag
+    pieces = [word + " " for word in REASONING] + ["</th", "ink>\n\n"] + words("Take a short walk .")
+    shown = []
+    result = collect_chat_completion(FakeClient(pieces), R1, [], on_token=shown.append)
+    assert "".join(shown) == "Take a short walk . "
+    assert result.content == "Take a short walk ."
+    assert result.reasoning.startswith("Okay , the user had a hard day")
+    assert not result.reasoning_truncated
+
+def test_implicitly_opened_reasoning_counts_toward_the_budget():
+    pieces = [word + " " for word in REASONING * 4] + ["</think>"] + words("never reached")
+    client = FakeClient(pieces, words("Breathe slowly ."))  # the retry continues after a closed block
+    shown = []
+    result = collect_chat_completion(client, R1, [], on_token=shown.append, reasoning_budget=10)
+    assert result.reasoning_truncated
+    assert "".join(shown) == "Breathe slowly . "
+    assert result.content == "Breathe slowly ."
+    assert len(client.requests) == 2
+
+def test_completion_without_close_tag_is_the_answer():
+    shown = []
+    result = collect_chat_completion(FakeClient(words("Just the answer .")), R1, [], on_token=shown.append)
+    assert "".join(shown) == "Just the answer . "
+    assert result.content == "Just the answer ."
+    assert result.reasoning == ""
+
+def test_explicit_open_tag_from_an_implicit_model():
+    think = ThinkFilter(implicit_open=True)
+    out = think.feed("<think>\nhmm </think> Hello") + think.flush()
+    assert out == "Hello"
+    assert think.reasoning == "hmm"
+
+def test_other_models_stream_as_before():
+    shown = []
+    result = collect_chat_completion(FakeClient(["<think>plan</think>"] + words("Hi there")), "llama-3.2-1b-instruct", [],
+                                     on_token=shown.append)
+    assert "".join(shown) == "Hi there "
+    assert result.reasoning == "plan"
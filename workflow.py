@@ -1,9 +1,13 @@
+import os
 import random
 from typing import Literal
 from IPython.display import Image, display
 from typing_extensions import TypedDict
 from langgraph.graph import StateGraph, START, END
 
+from batch_classifier import KeywordClassifier
+from semantic_router import SemanticRouter
+
 # State
 class State(TypedDict):
     user_input: str  # Stores the user's input
@@ -11,19 +15,28 @@ class State(TypedDict):
     response: str    # Stores the bot's response
 
 # Conditional edge
+# Ordered routing rules: the first rule with a keyword in the input wins
+CATEGORY_RULES = [
+    ("anxiety_support", ["anxious", "stressed"]),
+    ("depression_support", ["sad", "depressed"]),
+    ("crisis_intervention", ["hurt myself", "suicide"]),
+    ("neutral_state", ["happy", "good"]),
+]
+CLASSIFIER = KeywordClassifier(CATEGORY_RULES, default="general_support")
+
+# "keyword" (default) or "semantic": route by embedding centroids, which also
+# catches paraphrases (crisis keywords still bypass the model)
+CATEGORY_ROUTER = os.environ.get("CATEGORY_ROUTER", "keyword")
+SEMANTIC_ROUTER = SemanticRouter()
+
 def decide_category(state) -> Literal["anxiety_support", "depression_support", "crisis_intervention","neutral_state"]:
-    user_input = state['user_input'].lower()
-
-    if "anxious" in user_input or "stressed" in user_input:
-        return "anxiety_support"
-    elif "sad" in user_input or "depressed" in user_input:
-        return "depression_support"
-    elif "hurt myself" in user_input or "suicide" in user_input:
-        return "crisis_intervention"
-    elif "happy" in user_input or "good" in user_input:
-        return "neutral_state"
-    else:
-        return "general_support"
+    if CATEGORY_ROUTER == "semantic":
+        return SEMANTIC_ROUTER.classify(state['user_input'])
+    return CLASSIFIER.classify(state['user_input'])
+
+def classify_many(texts) -> list:
+    """decide_category for a batch of messages (offline triage of chat logs)."""
+    return CLASSIFIER.classify_many(texts)
 
 # Nodes
 def reception_agent(state):
@@ -76,10 +89,11 @@ builder.add_edge("general_support_agent", END)
 # Compile graph
 graph = builder.compile()
 
-# Visualize the graph
-display(Image(graph.get_graph().draw_mermaid_png()))
+if __name__ == "__main__":
+    # Visualize the graph
+    display(Image(graph.get_graph().draw_mermaid_png()))
 
-# Run the graph
-initial_state = {"user_input": "I want to hurt myself, because I keep messing things up.", "category": "", "response": ""}
-result = graph.invoke(initial_state)
-print(result)
\ No newline at end of file
+    # Run the graph
+    initial_state = {"user_input": "I want to hurt myself, because I keep messing things up.", "category": "", "response": ""}
+    result = graph.invoke(initial_state)
+    print(result)
@@ -1,13 +1,15 @@
+import os
 import string
-import nltk
+from functools import lru_cache
 from typing import Literal
 from typing_extensions import TypedDict
 from langgraph.graph import StateGraph, START, END
-from nltk.corpus import wordnet
 from nltk.stem import WordNetLemmatizer
 
-nltk.download('wordnet')
-nltk.download('punkt')
+from batch_classifier import KeywordClassifier
+from keyword_matcher import KeywordMatcher
+from lexicon import load_lexicon
+from semantic_router import SemanticRouter
 
 # State
 class State(TypedDict):
@@ -15,6 +17,7 @@ class State(TypedDict):
     category: str
     response: str
     follow_up: bool = False # New state to track if follow up is needed
+    words: list  # user_input tokenized, stripped and lemmatized once per turn
 
 # Initialize lemmatizer
 lemmatizer = WordNetLemmatizer()
@@ -33,112 +36,75 @@ STOP_WORDS = {"i", "me", "my", "myself", "we", "our", "ours", "ourselves", "you"
               "most", "other", "some", "such", "no", "nor", "not", "only", "own", "same", "so", 
               "than", "too", "very", "s", "t", "can", "will", "just", "don", "should", "now","want"}
 
-# Enhanced synonym generator with phrase support
-def get_synonyms(word):
-    synonyms = set()
-    for syn in wordnet.synsets(word):
-        for lemma in syn.lemmas():
-            synonym = lemma.name().lower().replace('_', ' ')
-            synonyms.add(synonym)
-    return list(synonyms)
-
-# Seed words with multi-word support
-CATEGORY_SEEDS = {
-    "crisis_intervention": ["suicide", "self-harm"],
-    "anxiety_support": ["anxiety", "panic attack"],
-    "depression_support": ["depression", "hopelessness"]
-}
-
-# Generate keywords with manual enhancements
-CATEGORY_KEYWORDS = {}
-ALL_KEYWORDS = set()
-
-for category, seeds in CATEGORY_SEEDS.items():
-    category_keywords = []
-    for seed in seeds:
-        # Get synonyms and add as both phrases and individual words
-        synonyms = get_synonyms(seed)
-        category_keywords.extend(synonyms)
-        
-        # Split multi-word seeds into components
-        if ' ' in seed:
-            category_keywords.extend(seed.split())
-    
-    # Manual enhancements
-    if category == "crisis_intervention":
-        category_keywords += [
-            "kill myself", "end it all", "suicidal", "self harm",
-            "kill", "myself", "die", "want to die", "cutting"
-        ]
-    elif category == "anxiety_support":
-        category_keywords += [
-            "stressed", "worried", "overwhelmed", "nervous",
-            "panic", "racing thoughts", "anxious"
-        ]
-    elif category == "depression_support":
-        category_keywords += [
-            "sad", "empty", "numb", "lonely", "can't go on",
-            "worthless", "depressed"
-        ]
-    
-    # Normalize and deduplicate
-    normalized_keywords = set()
-    for kw in category_keywords:
-        # Handle multi-word phrases
-        if ' ' in kw:
-            normalized_keywords.add(kw)
-        # Add lemmatized versions for single words
-        else:
-            normalized_keywords.add(kw)  # Keep original word
-            normalized_keywords.add(lemmatizer.lemmatize(kw, pos='v'))  # Verb form
-            normalized_keywords.add(lemmatizer.lemmatize(kw, pos='n'))  # Noun form
-    
-    CATEGORY_KEYWORDS[category] = list(normalized_keywords)
-    ALL_KEYWORDS.update(normalized_keywords)
+# Distinct lemma lookups remembered; users repeat a small vocabulary, so the
+# WordNet lemmatizer runs once per word instead of once per occurrence
+LEMMA_CACHE_SIZE = 8192
+
+@lru_cache(maxsize=LEMMA_CACHE_SIZE)
+def lemmatize(word: str) -> str:
+    return lemmatizer.lemmatize(word, pos='v')
+
+def normalize_word(word: str) -> str:
+    return lemmatize(word.strip(string.punctuation))
+
+def tokenize(user_input: str) -> list:
+    """The turn's token pipeline: lowercase, split, strip punctuation, lemmatize."""
+    return [normalize_word(word) for word in user_input.lower().split()]
+
+def all_recognized(words) -> bool:
+    """Every word is in the support vocabulary and none is a stop word."""
+    return all(word in ALL_KEYWORDS for word in words) and not any(word in STOP_WORDS for word in words)
+
+def unrecognized_terms(words) -> list:
+    return [w for w in words if w not in ALL_KEYWORDS and w not in STOP_WORDS]
+
+# Keywords expanded from CATEGORY_SEEDS through WordNet, prebuilt by lexicon.py
+# (rebuilt here only when the seeds change)
+CATEGORY_KEYWORDS, ALL_KEYWORDS = load_lexicon()
+
+# Most urgent first: a message that matches several categories goes to the first
+CATEGORY_PRIORITY = ("crisis_intervention", "anxiety_support", "depression_support")
+
+# Compiled once: one automaton for every phrase, one hash lookup per word
+MATCHER = KeywordMatcher(CATEGORY_KEYWORDS, CATEGORY_PRIORITY)
+
+# Same rules for batches of messages (offline triage of chat logs)
+CLASSIFIER = KeywordClassifier(
+    [(category, CATEGORY_KEYWORDS[category]) for category in CATEGORY_PRIORITY],
+    default="general_support",
+    normalize=normalize_word,
+)
+
+def classify_many(texts) -> list:
+    """The category decide_category would route each of a batch of messages to."""
+    return CLASSIFIER.classify_many(texts)
+
+# "keyword" (default) or "semantic": route by embedding centroids, which also
+# catches paraphrases; the crisis lexicon still bypasses the model
+CATEGORY_ROUTER = os.environ.get("CATEGORY_ROUTER", "keyword")
+SEMANTIC_ROUTER = SemanticRouter(
+    crisis_keywords=CATEGORY_KEYWORDS["crisis_intervention"],
+    labels={"neutral_state": "general_support"},
+    normalize=normalize_word,
+)
 
 # Enhanced decision logic
 def decide_category(state) -> Literal["anxiety_support", "depression_support", "crisis_intervention", "general_support"]:
     user_input = state['user_input'].lower()
+    words = state.get('words')
+    if words is None:
+        words = tokenize(user_input)
     
-    # Check for crisis phrases first
-    crisis_phrases = [p for p in CATEGORY_KEYWORDS["crisis_intervention"] if ' ' in p]
-    for phrase in crisis_phrases:
-        if phrase in user_input:
-            return "crisis_intervention"
-    
-    # Process individual words with lemmatization
-    words = [
-        lemmatizer.lemmatize(word.strip(string.punctuation), pos='v')
-        for word in user_input.split()
-    ]
-    
-    # Check crisis words
-    crisis_words = [w for w in CATEGORY_KEYWORDS["crisis_intervention"] if ' ' not in w]
-    if any(word in crisis_words for word in words):
-        return "crisis_intervention"
-    
-    # Check anxiety phrases/words
-    anxiety_phrases = [p for p in CATEGORY_KEYWORDS["anxiety_support"] if ' ' in p]
-    for phrase in anxiety_phrases:
-        if phrase in user_input:
-            return "anxiety_support"
-    
-    anxiety_words = [w for w in CATEGORY_KEYWORDS["anxiety_support"] if ' ' not in w]
-    if any(word in anxiety_words for word in words):
-        return "anxiety_support"
-    
-    # Check depression phrases/words
-    depression_phrases = [p for p in CATEGORY_KEYWORDS["depression_support"] if ' ' in p]
-    for phrase in depression_phrases:
-        if phrase in user_input:
-            return "depression_support"
-    
-    depression_words = [w for w in CATEGORY_KEYWORDS["depression_support"] if ' ' not in w]
-    if any(word in depression_words for word in words):
-        return "depression_support"
+    if CATEGORY_ROUTER == "semantic":
+        category = SEMANTIC_ROUTER.classify(user_input)
+    else:
+        # Phrases and words of every category in one pass, crisis before anxiety before depression
+        category = MATCHER.classify(user_input, words)
+    if category and category != "general_support":
+        return category
     
     # If none of the above, check for positive feelings
-    if all(word in ALL_KEYWORDS for word in words) and not any(word in STOP_WORDS for word in words):
+    if all_recognized(words):
         print("What would you like to discuss or explore further?")
         return "general_support"
     
@@ -153,6 +119,7 @@ def reception_agent(state):
     return {
         "response": response,
         "follow_up": True,
+        "words": tokenize(state['user_input']),
     }
 
 def anxiety_support_agent(state):
@@ -221,34 +188,32 @@ builder.add_edge("anxiety_support_agent", END)
 graph = builder.compile()
 
 # Enhanced interaction flow
-while True:
-    print("\n" + "="*40)
-    user_input = input("How are you feeling today? (Type 'exit' to quit)\n> ").lower()
+if __name__ == "__main__":
+    while True:
+        print("\n" + "="*40)
+        user_input = input("How are you feeling today? (Type 'exit' to quit)\n> ").lower()
     
-    if user_input == 'exit':
-        break
+        if user_input == 'exit':
+            break
         
-    result = graph.invoke({"user_input": user_input, "category": "", "response": ""})
+        result = graph.invoke({"user_input": user_input, "category": "", "response": ""})
     
-    print("\n" + "-"*20)
-    print(result["response"])
+        print("\n" + "-"*20)
+        print(result["response"])
     
-    # Show unrecognized terms analysis (ignoring stop words)
-    input_words = [
-        lemmatizer.lemmatize(word.strip(string.punctuation), pos='v')
-        for word in user_input.split()
-    ]
-    unrecognized = [w for w in input_words if w not in ALL_KEYWORDS and w not in STOP_WORDS]
+        # Show unrecognized terms analysis (ignoring stop words), on the words the classifier used
+        input_words = result["words"]
+        unrecognized = unrecognized_terms(input_words)
     
-    # If positive feeling detected, prompt follow-up
-    if all(word in ALL_KEYWORDS for word in input_words) and not any(word in STOP_WORDS for word in input_words):
-        print("\nI notice you're feeling joyous. What would you like to discuss or explore further?")
-        continue
+        # If positive feeling detected, prompt follow-up
+        if all_recognized(input_words):
+            print("\nI notice you're feeling joyous. What would you like to discuss or explore further?")
+            continue
     
-    if unrecognized:
-        print("\n/System Note: These terms weren't recognized in our support vocabulary]")
-        print(f"Unrecognized: {', '.join(unrecognized)}")
-        print("[Consider adding these to our training data]")
+        if unrecognized:
+            print("\n/System Note: These terms weren't recognized in our support vocabulary]")
+            print(f"Unrecognized: {', '.join(unrecognized)}")
+            print("[Consider adding these to our training data]")
 
-# If loop ended, provide final thank you message
-print("\nThank you for sharing your feelings. Have a wonderful day!")
+    # If loop ended, provide final thank you message
+    print("\nThank you for sharing your feelings. Have a wonderful day!")
@@ -1,6 +1,8 @@
 from typing import Literal
 from langgraph.graph import StateGraph, START, END
 from typing_extensions import TypedDict
+from batch_classifier import KeywordClassifier
+from session_io import ConsoleIO, get_io, session_node
 
 # State
 class State(TypedDict):
@@ -9,25 +11,37 @@ class State(TypedDict):
     response: str    # Bot's response
 
 # Nodes
-def reception_agent(state):
+@session_node
+def reception_agent(state, config=None):
     """Ask the user how they are feeling today."""
-    user_input = input("Hi! How are you feeling today? ")
+    user_input = get_io(config).ask("Hi! How are you feeling today? ")
     return {"user_input": user_input, "mood": "", "response": f"User says: {user_input}"}
 
+# Ordered mood rules: the first rule with a keyword in the input wins
+MOOD_RULES = [
+    ("anxiety", ["anxious", "stressed"]),
+    ("depression", ["sad", "depressed"]),
+    ("neutral", ["fine", "okay"]),
+    ("cheerful", ["good", "okay"]),
+]
+CLASSIFIER = KeywordClassifier(MOOD_RULES, default="unknown")
+
+MOOD_RESPONSES = {
+    "anxiety": "It sounds like you're feeling anxious.",
+    "depression": "It sounds like you're feeling down.",
+    "neutral": "I'm glad to hear you're feeling fine.",
+    "cheerful": "I'm glad to hear you're feeling so good!",
+    "unknown": "Could you tell me more about how you're feeling?",
+}
+
 def mood_assessment_agent(state):
     """Assess the user's mood based on input."""
-    user_input = state["user_input"].lower()
+    mood = CLASSIFIER.classify(state["user_input"])
+    return {"mood": mood, "response": MOOD_RESPONSES[mood]}
 
-    if "anxious" in user_input or "stressed" in user_input:
-        return {"mood": "anxiety", "response": "It sounds like you're feeling anxious."}
-    elif "sad" in user_input or "depressed" in user_input:
-        return {"mood": "depression", "response": "It sounds like you're feeling down."}
-    elif "fine" in user_input or "okay" in user_input:
-        return {"mood": "neutral", "response": "I'm glad to hear you're feeling fine."}
-    elif "good" in user_input or "okay" in user_input:
-        return {"mood": "cheerful", "response": "I'm glad to hear you're feeling so good!"}
-    else:
-        return {"mood": "unknown", "response": "Could you tell me more about how you're feeling?"}
+def classify_many(texts) -> list:
+    """The mood mood_assessment_agent would assign to each of a batch of messages."""
+    return CLASSIFIER.classify_many(texts)
 
 def recommendation_agent(state):
     """Recommend an activity or task based on mood."""
@@ -60,19 +74,21 @@ builder.add_edge("mood_assessment_agent", "recommendation_agent")
 builder.add_conditional_edges("recommendation_agent", lambda state: "counselor_recommendation" if state["mood"] == "unknown" else END)
 builder.add_edge("counselor_recommendation", END)
 
-# Compile graph
+# Compile graph (SessionEngine(builder) compiles its own copy with a checkpointer)
 graph = builder.compile()
 
 # Running the graph with custom input
-def run_graph():
+def run_graph(io=None):
+    io = io or ConsoleIO()
     initial_state = {"user_input": "", "mood": "", "response": ""}
     while True:
-        result = graph.invoke(initial_state)
-        print(result["response"])
+        result = graph.invoke(initial_state, {"configurable": {"io": io}})
+        io.say(result["response"])
 
         # Break the loop if the conversation ends
         if "Would you like to speak to a counselor?" in result["response"]:
             break
 
 # Start the conversation
-run_graph()
+if __name__ == "__main__":
+    run_graph()
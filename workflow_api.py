@@ -3,6 +3,8 @@ from langgraph.graph import StateGraph, START, END
 from typing_extensions import TypedDict
 from transformers import LlamaForCausalLM, LlamaTokenizer
 
+from batch_classifier import KeywordClassifier
+
 # State definition for tracking user input, mood, and response
 class State(TypedDict):
     user_input: str
@@ -14,18 +16,21 @@ model_path = r"C:/Users/gurjy/.lmstudio/models/hugging-quants/Llama-3.2-1B-Instr
 model = LlamaForCausalLM.from_pretrained(model_path)
 tokenizer = LlamaTokenizer.from_pretrained(model_path)
 
+# Ordered mood rules: the first rule with a keyword in the input wins
+MOOD_RULES = [
+    ("anxiety_support", ["anxious", "stressed"]),
+    ("depression_support", ["sad", "depressed"]),
+    ("cheerful_support", ["happy", "cheerful"]),
+]
+CLASSIFIER = KeywordClassifier(MOOD_RULES, default="general_support")
+
 # Function to decide category based on user input
 def decide_mood(state) -> str:
-    user_input = state['user_input'].lower()
+    return CLASSIFIER.classify(state['user_input'])
 
-    if "anxious" in user_input or "stressed" in user_input:
-        return "anxiety_support"
-    elif "sad" in user_input or "depressed" in user_input:
-        return "depression_support"
-    elif "happy" in user_input or "cheerful" in user_input:
-        return "cheerful_support"
-    else:
-        return "general_support"
+def classify_many(texts) -> list:
+    """decide_mood for a batch of messages (offline triage of chat logs)."""
+    return CLASSIFIER.classify_many(texts)
 
 # Function to generate a response using Llama model
 def generate_response(user_input: str) -> str:
@@ -82,12 +87,13 @@ graph = builder.compile()
 # Visualize the graph (optional)
 # display(Image(graph.get_graph().draw_mermaid_png()))
 
-# Example state and interaction
-initial_state = {"user_input": "I am feeling anxious", "mood": "", "response": ""}
-result = graph.invoke(initial_state)
-print(result)
+if __name__ == "__main__":
+    # Example state and interaction
+    initial_state = {"user_input": "I am feeling anxious", "mood": "", "response": ""}
+    result = graph.invoke(initial_state)
+    print(result)
 
-# Optionally: Using Llama for generating intelligent responses
-user_input = "I'm feeling good today!"
-generated_response = generate_response(user_input)
-print("Llama's Response:", generated_response)
+    # Optionally: Using Llama for generating intelligent responses
+    user_input = "I'm feeling good today!"
+    generated_response = generate_response(user_input)
+    print("Llama's Response:", generated_response)